@@ -1,21 +1,46 @@
-from apify_client import ApifyClient
-from dotenv import load_dotenv
 import os
 import json
+import asyncio
 
-load_dotenv("../.env")
+from API_services.clients import get_apify_async_client, get_apify_client
+from API_services.config import load_config
+from API_services.linkedin_urls import canonical_profile_url
+from API_services.metrics import observe_stage
+from API_services.profile_cache import get_profile_cache
+from API_services.rate_limiter import get_limiter
+from API_services.single_flight import AsyncSingleFlight, SingleFlight
+from API_services.tracing import url_hash
 
+load_config()
 
-def APIFY_LinkedIn_WebScrape(url: str) -> str:
+_apify_flight = SingleFlight("apify")
+_apify_async_flight = AsyncSingleFlight("apify_async")
+
+
+def APIFY_LinkedIn_WebScrape(url: str, refresh=False) -> str:
+    cache = get_profile_cache()
+    cached = cache.lookup("apify", url, refresh)
+    if cached is not None:
+        print(f"Serving APIFY profile from cache for URL: {url}")
+        return json.dumps(cached, indent=2)
+
+    # Concurrent requests for the same profile share a single actor run
+    canonical_url = canonical_profile_url(url)
+    return _apify_flight.do(
+        canonical_url, lambda: _scrape_single_profile(canonical_url, cache)
+    )
+
+
+def _scrape_single_profile(url: str, cache) -> str:
     API_TOKEN = os.getenv("APIFY_API_TOKEN")
     print(
         f"APIFY_API_TOKEN: {API_TOKEN[:5]}...{API_TOKEN[-5:] if API_TOKEN else 'None'}"
     )
-    client = ApifyClient(API_TOKEN)
+    client = get_apify_client(API_TOKEN)
 
     if API_TOKEN is None:
         print("ERROR: No APIFY API token found!")
-        return json.dumps({"error": "No API token found"})
+        return json.dumps({"error": "No API token found", "status": 401})
 
     print(f"Preparing APIFY Actor input for URL: {url}")
     # Prepare the Actor input .
@@ -24,13 +49,19 @@ def APIFY_LinkedIn_WebScrape(url: str) -> str:
     # Max: The "2SyF0bVxmgGr8IVCZ" is just the ID for Apify ,DONT be stupid and touch it, I got it from the Docs
     try:
         print("Calling APIFY Actor...")
-        run = client.actor("2SyF0bVxmgGr8IVCZ").call(run_input=run_input)
+        with get_limiter("apify").slot(), observe_stage(
+            "apify_call", url_hash=url_hash(url), profiles=1
+        ) as span:
+            run = client.actor("2SyF0bVxmgGr8IVCZ").call(run_input=run_input)
+            span.set_attributes(**_run_attributes(run))
         print(
             f"APIFY run completed with defaultDatasetId: {run.get('defaultDatasetId', 'none')}"
         )
     except Exception as e:
         print(f"APIFY Actor call failed: {str(e)}")
-        return json.dumps({"error": f"APIFY Actor call failed: {str(e)}"})
+        return json.dumps(
+            {"error": f"APIFY Actor call failed: {str(e)}", "status": _status(e)}
+        )
 
     """ Max:
     If you are asking why tf this works w "next", imagine vibe coding for a project to semi-work, then going back to fix it
@@ -49,26 +80,244 @@ def APIFY_LinkedIn_WebScrape(url: str) -> str:
     """
     try:
         print("Getting data from APIFY dataset...")
-        item = next(client.dataset(run["defaultDatasetId"]).iterate_items())
+        with observe_stage("dataset_fetch", url_hash=url_hash(url)) as span:
+            item = next(client.dataset(run["defaultDatasetId"]).iterate_items(), None)
+            span.set_attributes(items=int(item is not None))
         print(f"Successfully retrieved data item: {str(item)[:200]}...")
     except Exception as e:
         print(f"Error retrieving data from APIFY: {str(e)}")
-        return json.dumps({"error": f"Error retrieving data from APIFY: {str(e)}"})
+        return json.dumps(
+            {
+                "error": f"Error retrieving data from APIFY: {str(e)}",
+                "status": _status(e),
+            }
+        )
+    missing = _missing_profile(item)
+    if missing:
+        return json.dumps(missing)
     """
     TOUCHING CODE BELOW THIS POINT IS OK
     -----
     """
+    result = _profile_fields(item)
+    cache.set("apify", url, result)
+
+    return json.dumps(result, indent=2)
+
+
+def _status(error: Exception) -> int:
+    # ApifyApiError carries the HTTP status; transport errors have none
+    return getattr(error, "status_code", None)
+
+
+def _missing_profile(item: dict) -> dict:
+    """Error for an actor run that did not return the requested profile"""
+    if item is None:
+        return {"error": "Profile not returned by APIFY Actor", "status": 404}
+    if item.get("error"):
+        return {"error": str(item["error"]), "status": 404}
+    return None
+
+
+def _run_attributes(run: dict) -> dict:
+    run = run or {}
+    return {"run_id": run.get("id"), "run_status": run.get("status")}
+
+
+def _profile_fields(item: dict) -> dict:
     # Ensure keys exist before accessing them
     about = item.get("about", "")
     headline = item.get("headline", "")
     email = item.get("email", "")
     fullName = item.get("fullName", "")
 
-    result = {
+    return {
         "about": about,
         "headline": headline,
         "email": email,
         "fullName": fullName,
     }
 
+
+def _item_keys(item: dict):
+    # A legacy /pub input may come back under its /in URL, so every field is
+    # a candidate rather than only the first one present
+    for field in ("inputUrl", "linkedinUrl", "profileUrl", "url"):
+        if item.get(field):
+            yield canonical_profile_url(item[field])
+    if item.get("publicIdentifier"):
+        yield canonical_profile_url(f"linkedin.com/in/{item['publicIdentifier']}")
+
+
+def _match_item(item: dict, pending: dict) -> list:
+    for key in _item_keys(item):
+        if key in pending:
+            return pending.pop(key)
+    return None
+
+
+def APIFY_LinkedIn_WebScrape_Batch(
+    urls: list, batch_size: int = None, refresh=False
+) -> str:
+    """
+    Scrape many LinkedIn profiles with as few actor runs as possible
+
+    URLs are packed into runs of `batch_size` (APIFY_BATCH_SIZE, default 100)
+    and every dataset item is streamed back and matched to its input URL.
+
+    Args:
+        urls (list): LinkedIn profile URLs
+        batch_size (int): Maximum URLs per actor run
+        refresh (bool | str): Skip cached profiles and scrape every URL
+            again, or "stale" to re-check only snapshots past their
+            staleness window
+
+    Returns:
+        str: JSON with "results" (url -> profile fields) and "errors"
+        (url -> message) for URLs the actor did not return
+    """
+    cache = get_profile_cache()
+
+    # Drop duplicates while keeping the caller's order
+    unique_urls = list(dict.fromkeys(url.strip() for url in urls if url.strip()))
+    results = {}
+    errors = {}
+
+    for url in unique_urls:
+        cached = cache.lookup("apify", url, refresh)
+        if cached is not None:
+            results[url] = cached
+    unique_urls = [url for url in unique_urls if url not in results]
+    if results:
+        print(f"Serving {len(results)} APIFY profiles from cache")
+
+    if not unique_urls:
+        return json.dumps({"results": results, "errors": errors}, indent=2)
+
+    API_TOKEN = os.getenv("APIFY_API_TOKEN")
+    if API_TOKEN is None:
+        print("ERROR: No APIFY API token found!")
+        return json.dumps({"error": "No API token found", "status": 401})
+
+    batch_size = batch_size or int(os.getenv("APIFY_BATCH_SIZE", "100"))
+    client = get_apify_client(API_TOKEN)
+
+    for start in range(0, len(unique_urls), batch_size):
+        chunk = unique_urls[start : start + batch_size]
+        pending = {}
+        for url in chunk:
+            pending.setdefault(canonical_profile_url(url), []).append(url)
+        print(f"Calling APIFY Actor for {len(chunk)} profiles...")
+
+        try:
+            with get_limiter("apify").slot(), observe_stage(
+                "apify_call", profiles=len(chunk)
+            ) as span:
+                run = client.actor("2SyF0bVxmgGr8IVCZ").call(
+                    run_input={"profileUrls": chunk}
+                )
+                span.set_attributes(**_run_attributes(run))
+        except Exception as e:
+            print(f"APIFY Actor call failed: {str(e)}")
+            for url in chunk:
+                errors[url] = f"APIFY Actor call failed: {str(e)}"
+            continue
+
+        try:
+            # Items are matched as they stream in rather than collected first
+            with observe_stage("dataset_fetch") as span:
+                count = 0
+                for item in client.dataset(run["defaultDatasetId"]).iterate_items():
+                    count += 1
+                    matched = _match_item(item, pending)
+                    if matched is None:
+                        print("Skipping APIFY item with no matching input URL")
+                        continue
+                    for url in matched:
+                        if item.get("error"):
+                            errors[url] = str(item["error"])
+                        else:
+                            results[url] = _profile_fields(item)
+                            cache.set("apify", url, results[url])
+                span.set_attributes(items=count)
+        except Exception as e:
+            print(f"Error retrieving data from APIFY: {str(e)}")
+            for matched in pending.values():
+                for url in matched:
+                    errors[url] = f"Error retrieving data from APIFY: {str(e)}"
+            continue
+
+        for matched in pending.values():
+            for url in matched:
+                errors[url] = "Profile not returned by APIFY Actor"
+
+    print(f"APIFY batch finished: {len(results)} profiles, {len(errors)} failures")
+    return json.dumps({"results": results, "errors": errors}, indent=2)
+
+
+async def APIFY_LinkedIn_WebScrape_Async(url: str, refresh=False) -> str:
+    """
+    asyncio variant of APIFY_LinkedIn_WebScrape built on ApifyClientAsync
+
+    Waiting on the actor run does not hold a thread, so the ASGI app can keep
+    many scrapes in flight at once. Returns the same JSON string contract.
+    """
+    cache = get_profile_cache()
+    # The cache may query SQLite under its lock; keep that off the event loop
+    cached = await asyncio.to_thread(cache.lookup, "apify", url, refresh)
+    if cached is not None:
+        print(f"Serving APIFY profile from cache for URL: {url}")
+        return json.dumps(cached, indent=2)
+
+    canonical_url = canonical_profile_url(url)
+    return await _apify_async_flight.do(
+        canonical_url, lambda: _scrape_single_profile_async(canonical_url, cache)
+    )
+
+
+async def _scrape_single_profile_async(url: str, cache) -> str:
+    API_TOKEN = os.getenv("APIFY_API_TOKEN")
+    if API_TOKEN is None:
+        print("ERROR: No APIFY API token found!")
+        return json.dumps({"error": "No API token found", "status": 401})
+
+    client = get_apify_async_client(API_TOKEN)
+
+    try:
+        print(f"Calling APIFY Actor for URL: {url}")
+        async with get_limiter("apify").aslot():
+            with observe_stage(
+                "apify_call", url_hash=url_hash(url), profiles=1
+            ) as span:
+                run = await client.actor("2SyF0bVxmgGr8IVCZ").call(
+                    run_input={"profileUrls": [url]}
+                )
+                span.set_attributes(**_run_attributes(run))
+    except Exception as e:
+        print(f"APIFY Actor call failed: {str(e)}")
+        return json.dumps(
+            {"error": f"APIFY Actor call failed: {str(e)}", "status": _status(e)}
+        )
+
+    try:
+        item = None
+        with observe_stage("dataset_fetch", url_hash=url_hash(url)) as span:
+            async for item in client.dataset(run["defaultDatasetId"]).iterate_items():
+                break
+            span.set_attributes(items=int(item is not None))
+    except Exception as e:
+        print(f"Error retrieving data from APIFY: {str(e)}")
+        return json.dumps(
+            {
+                "error": f"Error retrieving data from APIFY: {str(e)}",
+                "status": _status(e),
+            }
+        )
+    missing = _missing_profile(item)
+    if missing:
+        return json.dumps(missing)
+
+    result = _profile_fields(item)
+    await asyncio.to_thread(cache.set, "apify", url, result)
+
     return json.dumps(result, indent=2)
@@ -0,0 +1,143 @@
+from API_services import metrics
+from API_services.process_memory import is_running
+import atexit
+import os
+import logging
+import shutil
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Chrome user-data directories are created here as <owner pid>-<random>, so
+# directories left behind by a killed process can be recognised and swept
+PROFILE_ROOT = os.getenv(
+    "LINKEDIN_PROFILE_ROOT", os.path.join(tempfile.gettempdir(), "workly-chrome")
+)
+
+# path -> cleanup callable (quits the browser still using it), or None
+_live = {}
+_lock = threading.Lock()
+
+
+def _owner(name: str) -> int:
+    try:
+        return int(name.split("-", 1)[0])
+    except ValueError:
+        return None
+
+
+def dir_size(path: str) -> int:
+    """Bytes on disk under `path`"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def new_profile_dir(cleanup=None) -> str:
+    """
+    Create a user-data directory owned by this process
+
+    Args:
+        cleanup (callable): Stops whatever still uses the directory; run
+            before it is deleted at interpreter exit
+
+    Returns:
+        str: Path of the new directory
+    """
+    os.makedirs(PROFILE_ROOT, exist_ok=True)
+    with _lock:
+        path = tempfile.mkdtemp(prefix=f"{os.getpid()}-", dir=PROFILE_ROOT)
+        _live[path] = cleanup
+    return path
+
+
+def set_cleanup(path: str, cleanup):
+    with _lock:
+        if path in _live:
+            _live[path] = cleanup
+
+
+def remove_profile_dir(path: str, reason: str = "closed") -> int:
+    """
+    Delete a user-data directory, retrying while Chrome is still exiting
+
+    Returns:
+        int: Bytes the directory held
+    """
+    with _lock:
+        _live.pop(path, None)
+    size = dir_size(path)
+    for attempt in range(5):
+        shutil.rmtree(path, ignore_errors=True)
+        if not os.path.exists(path):
+            break
+        # Chrome can write lock and journal files for a moment after quit
+        time.sleep(0.2 * (attempt + 1))
+    else:
+        logger.warning(f"Could not remove Chrome profile directory {path}")
+    metrics.BROWSER_PROFILE_DIRS_REMOVED.inc(reason)
+    metrics.BROWSER_PROFILE_DIR_BYTES.observe(size)
+    return size
+
+
+def sweep_profile_dirs() -> int:
+    """
+    Delete directories whose owning process is gone
+
+    Covers workers that were killed (SIGKILL, OOM) before they could clean
+    up. Directories of this process that are no longer in use go as well.
+
+    Returns:
+        int: Number of directories removed
+    """
+    try:
+        names = os.listdir(PROFILE_ROOT)
+    except OSError:
+        return 0
+    removed = 0
+    for name in names:
+        path = os.path.join(PROFILE_ROOT, name)
+        owner = _owner(name)
+        if owner is None:
+            continue
+        with _lock:
+            in_use = path in _live
+        if in_use or (owner != os.getpid() and is_running(owner)):
+            continue
+        remove_profile_dir(path, reason="swept")
+        removed += 1
+    if removed:
+        logger.info(f"Swept {removed} orphaned Chrome profile directories")
+    return removed
+
+
+def _remove_all():
+    # Browsers still leased at exit are quit first so nothing holds the files
+    with _lock:
+        live = list(_live.items())
+    for path, cleanup in live:
+        if cleanup is not None:
+            try:
+                cleanup()
+            except Exception:
+                pass
+        remove_profile_dir(path, reason="exit")
+
+
+def _reset_after_fork():
+    # The parent's browsers and directories are not the child's to delete
+    global _lock
+    _lock = threading.Lock()
+    _live.clear()
+
+
+atexit.register(_remove_all)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
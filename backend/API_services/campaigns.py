@@ -0,0 +1,388 @@
+from API_services.apify import APIFY_LinkedIn_WebScrape_Batch
+from API_services.email_generation import (
+    generate_cold_email,
+    generate_cold_emails,
+    plan_packs,
+)
+from API_services.lead_store import LeadStore
+from API_services.leads import iter_leads
+from API_services.rate_limiter import rate_limit_caller
+from API_services import tracing
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import logging
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, runs are not guarded
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+CAMPAIGNS_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "campaigns"
+)
+
+# Where campaign profiles come from: Apify actor runs, or the Selenium
+# scrape farm (one browser per worker process)
+SCRAPE_SOURCES = ("apify", "selenium")
+
+
+def _no_report(stage: str):
+    pass
+
+
+def _trace_fields() -> dict:
+    # Lets a slow or failed lead be looked up in the trace export
+    span = tracing.current_span()
+    return {"trace_id": span.trace_id, "span_id": span.span_id} if span else {}
+
+
+def _load_checkpoint(checkpoint_path: str) -> set:
+    if not os.path.exists(checkpoint_path):
+        return set()
+    with open(checkpoint_path, encoding="utf-8") as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+class CampaignRunningError(RuntimeError):
+    """Another run is already writing this campaign's results"""
+
+
+def _compact_results(output_path: str):
+    """Keep only the latest row per lead, in the order leads first appeared"""
+    rows = {}
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                key = json.loads(line)["linkedin_url"]
+            except (ValueError, KeyError, TypeError):
+                key = line
+            rows[key] = line
+    temp_path = f"{output_path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.writelines(rows.values())
+    os.replace(temp_path, output_path)
+
+
+class _ResultWriter:
+    """
+    Appends one JSON line per lead and checkpoints finished leads
+
+    Only successful leads are checkpointed, so failures (rate limits, actor
+    errors) are retried when the campaign is resumed; when the run closes,
+    the output is compacted to one row per lead, the latest outcome. The
+    checkpoint is held under an exclusive lock for the whole run, so a
+    second run of the same campaign fails instead of interleaving writes.
+    """
+
+    def __init__(self, output_path: str, checkpoint_path: str):
+        self._lock = threading.Lock()
+        self._output_path = output_path
+        self._checkpoint = open(checkpoint_path, "a", encoding="utf-8")
+        if fcntl is not None:
+            try:
+                fcntl.flock(self._checkpoint, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                self._checkpoint.close()
+                raise CampaignRunningError(
+                    f"Campaign {output_path} is already running"
+                ) from None
+        self._output = open(output_path, "a", encoding="utf-8")
+        self.counts = {"succeeded": 0, "failed": 0}
+
+    def success(self, lead: dict, result: dict):
+        with self._lock:
+            self._output.write(
+                json.dumps({"status": "done", **lead, **result, **_trace_fields()})
+                + "\n"
+            )
+            self._output.flush()
+            self._checkpoint.write(lead["linkedin_url"] + "\n")
+            self._checkpoint.flush()
+            self.counts["succeeded"] += 1
+
+    def fail(self, lead: dict, error: str):
+        logger.warning(f"Campaign lead failed {lead['linkedin_url']}: {error}")
+        with self._lock:
+            self._output.write(
+                json.dumps(
+                    {"status": "failed", **lead, "error": error, **_trace_fields()}
+                )
+                + "\n"
+            )
+            self._output.flush()
+            self.counts["failed"] += 1
+
+    def close(self):
+        try:
+            self._output.close()
+            _compact_results(self._output_path)
+        except OSError as e:
+            logger.warning(f"Could not compact campaign results: {str(e)}")
+        finally:
+            # Closing releases the lock
+            self._checkpoint.close()
+
+
+def _scrape_batch(urls: list, source: str) -> dict:
+    if source == "selenium":
+        from API_services.profile_sources import selenium_profile_fields
+        from API_services.scrape_farm import get_scrape_farm
+
+        result = get_scrape_farm().scrape_many(urls)
+        result["results"] = {
+            url: selenium_profile_fields(profile)
+            for url, profile in result["results"].items()
+        }
+        return result
+    return json.loads(APIFY_LinkedIn_WebScrape_Batch(urls, batch_size=len(urls)))
+
+
+def _batches(leads, size: int):
+    batch = []
+    for lead in leads:
+        batch.append(lead)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def run_campaign(
+    client,
+    prompt: str,
+    output_path: str,
+    csv_path: str = None,
+    scrape_concurrency: int = None,
+    generate_concurrency: int = None,
+    scrape_batch_size: int = None,
+    limit: int = None,
+    top_k: int = None,
+    scrape_source: str = None,
+    pack_leads: bool = None,
+    report=_no_report,
+) -> dict:
+    """
+    Scrape and write an email for every founder in the leads CSV
+
+    Leads are streamed from the CSV, deduplicated, and scraped in Apify
+    batches while generation runs on its own worker pool, so each stage has
+    a separate concurrency limit. Results are appended to `output_path` as
+    JSON lines; `<output_path>.checkpoint` records finished leads so a
+    crashed or rate-limited run picks up where it stopped.
+
+    Args:
+        client (genai.Client): Gemini client
+        prompt (str): Campaign prompt
+        output_path (str): JSONL results file
+        csv_path (str): Leads CSV, defaults to yc.csv
+        scrape_concurrency (int): Apify batches in flight
+        generate_concurrency (int): Gemini generations in flight
+        scrape_batch_size (int): Profiles per Apify actor run
+        limit (int): Process at most this many new leads
+        top_k (int): Only run founders of the k companies most relevant to
+            the prompt, best first
+        scrape_source (str): "apify" (default, CAMPAIGN_SCRAPE_SOURCE) or
+            "selenium" to scrape through the multi-process browser farm
+        pack_leads (bool): Write the emails of several leads per Gemini
+            request (default, CAMPAIGN_PACK_LEADS); False sends one request
+            per lead
+        report (callable): Called with stage names for job progress
+
+    Returns:
+        dict: Counts of succeeded, failed and skipped leads
+
+    Raises:
+        CampaignRunningError: If another run holds this output's checkpoint
+    """
+    scrape_concurrency = scrape_concurrency or int(
+        os.getenv("CAMPAIGN_SCRAPE_CONCURRENCY", "2")
+    )
+    generate_concurrency = generate_concurrency or int(
+        os.getenv("CAMPAIGN_GENERATE_CONCURRENCY", "8")
+    )
+    scrape_batch_size = scrape_batch_size or int(
+        os.getenv("CAMPAIGN_SCRAPE_BATCH_SIZE", "25")
+    )
+    scrape_source = scrape_source or os.getenv("CAMPAIGN_SCRAPE_SOURCE", "apify")
+    if scrape_source not in SCRAPE_SOURCES:
+        raise ValueError(f"Unknown scrape source: {scrape_source}")
+    if pack_leads is None:
+        pack_leads = os.getenv("CAMPAIGN_PACK_LEADS", "on").lower() != "off"
+
+    if top_k:
+        # numpy/scipy are only needed for ranked campaigns
+        from API_services.lead_scoring import LeadScorer, get_lead_scorer
+
+        scorer = LeadScorer(LeadStore(csv_path)) if csv_path else get_lead_scorer()
+        leads = scorer.top_leads(prompt, top_k)
+    else:
+        leads = iter_leads(csv_path)
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    checkpoint_path = f"{output_path}.checkpoint"
+    # Lock first, so the checkpoint can't change while it is read
+    writer = _ResultWriter(output_path, checkpoint_path)
+    try:
+        finished = _load_checkpoint(checkpoint_path)
+    except BaseException:
+        writer.close()
+        raise
+
+    counts = {"skipped": 0, "queued": 0}
+
+    def pending_leads():
+        for lead in leads:
+            if lead["linkedin_url"] in finished:
+                counts["skipped"] += 1
+                continue
+            if limit is not None and counts["queued"] >= limit:
+                return
+            counts["queued"] += 1
+            yield lead
+
+    logger.info(f"Campaign starting, {len(finished)} leads already done")
+    report("running")
+    started = time.monotonic()
+
+    scrape_pool = ThreadPoolExecutor(
+        max_workers=scrape_concurrency, thread_name_prefix="campaign-scrape"
+    )
+    generate_pool = ThreadPoolExecutor(
+        max_workers=generate_concurrency, thread_name_prefix="campaign-generate"
+    )
+    # Backpressure: bound the batches and generations waiting in each pool
+    scrape_window = threading.BoundedSemaphore(scrape_concurrency * 2)
+    generate_window = threading.BoundedSemaphore(generate_concurrency * 2)
+
+    def write(lead, profile, json_response):
+        if "error" in json_response:
+            writer.fail(lead, f"Generation failed: {json_response['error']}")
+            return
+        writer.success(
+            lead,
+            {
+                "email": profile.get("email"),
+                "groq_response": json_response["email_output"],
+                "analysis_rationale": json_response["analysis_rationale"],
+            },
+        )
+
+    def generate(lead, profile, queued_at):
+        with tracing.span(
+            "campaign_lead",
+            url_hash=tracing.url_hash(lead["linkedin_url"]),
+            queued_ms=round((time.monotonic() - queued_at) * 1000, 1),
+        ) as span:
+            try:
+                with rate_limit_caller("campaign"):
+                    json_response = generate_cold_email(client, profile, prompt)
+                write(lead, profile, json_response)
+            except Exception as e:
+                span.record_error(e)
+                writer.fail(lead, f"Generation failed: {str(e)}")
+            finally:
+                generate_window.release()
+
+    def generate_pack(pack, queued_at):
+        # pack: linkedin_url -> (lead, profile)
+        with tracing.span(
+            "campaign_pack",
+            leads=len(pack),
+            queued_ms=round((time.monotonic() - queued_at) * 1000, 1),
+        ) as span:
+            try:
+                with rate_limit_caller("campaign"):
+                    responses = generate_cold_emails(
+                        client,
+                        {url: profile for url, (_, profile) in pack.items()},
+                        prompt,
+                    )
+                for url, (lead, profile) in pack.items():
+                    write(lead, profile, responses[url])
+            except Exception as e:
+                span.record_error(e)
+                for lead, _ in pack.values():
+                    writer.fail(lead, f"Generation failed: {str(e)}")
+            finally:
+                generate_window.release()
+
+    def submit_packs(scraped):
+        leads = {lead["linkedin_url"]: lead for lead, _ in scraped}
+        profiles = {lead["linkedin_url"]: profile for lead, profile in scraped}
+        for pack in plan_packs(profiles):
+            generate_window.acquire()
+            generate_pool.submit(
+                tracing.bind_context(generate_pack),
+                {url: (leads[url], profile) for url, profile in pack.items()},
+                time.monotonic(),
+            )
+
+    def scrape(batch):
+        with tracing.span(
+            "campaign_scrape_batch", leads=len(batch), source=scrape_source
+        ):
+            _scrape(batch)
+
+    def _scrape(batch):
+        try:
+            urls = [lead["linkedin_url"] for lead in batch]
+            with rate_limit_caller("campaign"):
+                result = _scrape_batch(urls, scrape_source)
+            scraped = []
+            for lead in batch:
+                url = lead["linkedin_url"]
+                if "error" in result:
+                    writer.fail(lead, result["error"])
+                elif url in result["results"] and pack_leads:
+                    scraped.append((lead, result["results"][url]))
+                elif url in result["results"]:
+                    generate_window.acquire()
+                    generate_pool.submit(
+                        tracing.bind_context(generate),
+                        lead,
+                        result["results"][url],
+                        time.monotonic(),
+                    )
+                else:
+                    writer.fail(lead, result["errors"].get(url, "Scrape failed"))
+            if scraped:
+                submit_packs(scraped)
+        except Exception as e:
+            for lead in batch:
+                writer.fail(lead, f"Scrape failed: {str(e)}")
+        finally:
+            scrape_window.release()
+
+    with tracing.span("campaign", top_k=top_k, limit=limit) as span:
+        try:
+            for batch in _batches(pending_leads(), scrape_batch_size):
+                scrape_window.acquire()
+                scrape_pool.submit(tracing.bind_context(scrape), batch)
+        finally:
+            # Scrapes submit generations, so drain them first
+            scrape_pool.shutdown(wait=True)
+            generate_pool.shutdown(wait=True)
+            writer.close()
+        span.set_attributes(**writer.counts, skipped=counts["skipped"])
+
+    summary = {
+        **writer.counts,
+        "skipped": counts["skipped"],
+        "output_path": output_path,
+        "elapsed_seconds": round(time.monotonic() - started, 2),
+    }
+    logger.info(f"Campaign finished: {summary}")
+    return summary
+
+
+def campaign_output_path(campaign_id: str) -> str:
+    """Results file for a campaign started through the API"""
+    return os.path.join(CAMPAIGNS_DIR, f"{campaign_id}.jsonl")
@@ -0,0 +1,124 @@
+from collections import deque
+import os
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def _percentile(ordered: list, fraction: float) -> float:
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return round(ordered[index], 3)
+
+
+class CircuitBreaker:
+    """
+    Rolling-window circuit breaker for one upstream
+
+    The last `window` calls are kept with their latency. Once at least
+    `min_calls` are recorded and the error rate reaches `error_rate`, the
+    breaker opens and callers fail fast for `open_seconds`. It then lets a
+    single trial call through (half-open); success closes it again, failure
+    re-opens it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: int = None,
+        min_calls: int = None,
+        error_rate: float = None,
+        open_seconds: float = None,
+    ):
+        self.name = name
+        self.window = window or int(os.getenv("BREAKER_WINDOW", "20"))
+        self.min_calls = min_calls or int(os.getenv("BREAKER_MIN_CALLS", "5"))
+        self.error_rate = error_rate or float(os.getenv("BREAKER_ERROR_RATE", "0.5"))
+        self.open_seconds = open_seconds or float(
+            os.getenv("BREAKER_OPEN_SECONDS", "30")
+        )
+        self._calls = deque(maxlen=self.window)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        self._counters = {"rejected": 0, "opened": 0}
+
+    def allow(self) -> bool:
+        """
+        Whether a call may go ahead now
+
+        In the half-open state only one caller gets True until that trial
+        call is recorded.
+        """
+        with self._lock:
+            if self._state == OPEN:
+                if time.monotonic() - self._opened_at < self.open_seconds:
+                    self._counters["rejected"] += 1
+                    return False
+                self._state = HALF_OPEN
+                self._trial_in_flight = False
+            if self._state == HALF_OPEN:
+                if self._trial_in_flight:
+                    self._counters["rejected"] += 1
+                    return False
+                self._trial_in_flight = True
+            return True
+
+    def record(self, ok: bool, latency: float):
+        with self._lock:
+            self._calls.append((ok, latency))
+            if self._state == HALF_OPEN:
+                self._trial_in_flight = False
+                if ok:
+                    logger.info(f"Circuit {self.name} closed after a successful trial")
+                    self._state = CLOSED
+                    self._calls.clear()
+                    self._calls.append((ok, latency))
+                else:
+                    self._open()
+                return
+
+            if self._state == CLOSED and len(self._calls) >= self.min_calls:
+                failures = sum(1 for call_ok, _ in self._calls if not call_ok)
+                if failures / len(self._calls) >= self.error_rate:
+                    self._open()
+
+    def _open(self):
+        logger.warning(f"Circuit {self.name} opened for {self.open_seconds:.0f}s")
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._counters["opened"] += 1
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if (
+                self._state == OPEN
+                and time.monotonic() - self._opened_at >= self.open_seconds
+            ):
+                return HALF_OPEN
+            return self._state
+
+    def stats(self) -> dict:
+        with self._lock:
+            calls = list(self._calls)
+            counters = dict(self._counters)
+        latencies = sorted(latency for _, latency in calls)
+        failures = sum(1 for ok, _ in calls if not ok)
+        return {
+            "state": self.state,
+            "calls": len(calls),
+            "error_rate": round(failures / len(calls), 3) if calls else 0.0,
+            "latency_p50": _percentile(latencies, 0.5),
+            "latency_p95": _percentile(latencies, 0.95),
+            "latency_p99": _percentile(latencies, 0.99),
+            **counters,
+        }
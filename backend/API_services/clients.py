@@ -0,0 +1,201 @@
+from API_services.config import load_config
+from API_services import metrics
+import os
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# (connect timeout, read timeout, pool size) per upstream, overridable with
+# HTTP_<NAME>_CONNECT_TIMEOUT, HTTP_<NAME>_READ_TIMEOUT, HTTP_<NAME>_POOL_SIZE
+# and HTTP_<NAME>_KEEPALIVE. Apify long-polls runs for up to 60s, so its
+# read timeout has to sit above that.
+DEFAULT_HTTP_SETTINGS = {
+    "gemini": (5.0, 120.0, 16),
+    "apify": (5.0, 90.0, 8),
+}
+
+
+class UpstreamHTTPSettings:
+    """Timeouts and pool size for one upstream's HTTP clients"""
+
+    def __init__(self, name: str):
+        default_connect, default_read, default_pool = DEFAULT_HTTP_SETTINGS[name]
+        prefix = f"HTTP_{name.upper()}"
+        self.name = name
+        self.connect_timeout = float(
+            os.getenv(f"{prefix}_CONNECT_TIMEOUT", default_connect)
+        )
+        self.read_timeout = float(os.getenv(f"{prefix}_READ_TIMEOUT", default_read))
+        self.pool_size = int(os.getenv(f"{prefix}_POOL_SIZE", default_pool))
+        self.keepalive = float(os.getenv(f"{prefix}_KEEPALIVE", "60"))
+
+
+class PoolStats:
+    """Requests sent and connections opened by one upstream's pooled clients"""
+
+    def __init__(self, settings: UpstreamHTTPSettings):
+        self.settings = settings
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._connections = 0
+        self._tls_handshakes = 0
+
+    def request(self):
+        with self._lock:
+            self._requests += 1
+        metrics.UPSTREAM_HTTP_REQUESTS.inc(self.settings.name)
+
+    def trace(self, event: str):
+        # httpcore trace events; a reused keep-alive connection emits neither
+        if event == "connection.connect_tcp.complete":
+            with self._lock:
+                self._connections += 1
+            metrics.UPSTREAM_CONNECTIONS.inc(self.settings.name)
+        elif event == "connection.start_tls.complete":
+            with self._lock:
+                self._tls_handshakes += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            requests, connections = self._requests, self._connections
+            tls_handshakes = self._tls_handshakes
+        reused = max(0, requests - connections)
+        return {
+            "pool_size": self.settings.pool_size,
+            "connect_timeout": self.settings.connect_timeout,
+            "read_timeout": self.settings.read_timeout,
+            "requests": requests,
+            "connections_opened": connections,
+            "tls_handshakes": tls_handshakes,
+            "reused": reused,
+            "reuse_ratio": round(reused / requests, 3) if requests else None,
+        }
+
+
+_lock = threading.Lock()
+_pool_stats = {}
+_gemini_client = None
+_apify_clients = {}
+
+
+def _reset_after_fork():
+    # Pooled sockets belong to the parent; a forked worker builds its own
+    global _lock, _gemini_client
+    _lock = threading.Lock()
+    _gemini_client = None
+    _apify_clients.clear()
+    _pool_stats.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _pool(name: str):
+    # Caller holds _lock
+    if name not in _pool_stats:
+        _pool_stats[name] = PoolStats(UpstreamHTTPSettings(name))
+    stats = _pool_stats[name]
+    return stats.settings, stats
+
+
+def gemini_http_options():
+    """Point clients at GEMINI_BASE_URL (e.g. a local stand-in) when it is set"""
+    from google.genai import types
+
+    base_url = os.getenv("GEMINI_BASE_URL")
+    return types.HttpOptions(base_url=base_url) if base_url else None
+
+
+def _install_gemini_transports(client):
+    from API_services.http_pool import pooled_async_client, pooled_client
+
+    api_client = getattr(client, "_api_client", None)
+    if not hasattr(api_client, "_httpx_client"):
+        logger.warning("google-genai internals changed; using its default HTTP client")
+        return
+    settings, stats = _pool("gemini")
+    api_client._httpx_client.close()
+    api_client._httpx_client = pooled_client(settings, stats)
+    # The async client has not opened any connections yet, so dropping it
+    # without aclose() leaks nothing
+    api_client._async_httpx_client = pooled_async_client(settings, stats)
+
+
+def get_gemini_client():
+    """
+    Return the process-wide Gemini client, creating it on first use
+
+    google.genai takes over a second to import, so it is only loaded once a
+    route actually needs the model. Sync and async calls share one pooled,
+    keep-alive transport configuration (see UpstreamHTTPSettings).
+    """
+    global _gemini_client
+    with _lock:
+        if _gemini_client is None:
+            from google import genai
+
+            load_config()
+            client = genai.Client(
+                api_key=os.getenv("GOOGLE_API_KEY"),
+                http_options=gemini_http_options(),
+            )
+            _install_gemini_transports(client)
+            _gemini_client = client
+        return _gemini_client
+
+
+def _apify_client(token: str, is_async: bool):
+    from API_services.http_pool import pooled_async_client, pooled_client
+
+    api_url = os.getenv("APIFY_API_URL")
+    key = (token, api_url, is_async)
+    with _lock:
+        if key in _apify_clients:
+            return _apify_clients[key]
+
+        settings, stats = _pool("apify")
+        if is_async:
+            from apify_client import ApifyClientAsync
+
+            client = ApifyClientAsync(
+                token, api_url=api_url, timeout_secs=settings.read_timeout
+            )
+            http = client.http_client
+            headers = http.httpx_async_client.headers
+            http.httpx_async_client = pooled_async_client(settings, stats, headers)
+        else:
+            from apify_client import ApifyClient
+
+            client = ApifyClient(
+                token, api_url=api_url, timeout_secs=settings.read_timeout
+            )
+            http = client.http_client
+            headers = http.httpx_client.headers
+            http.httpx_client.close()
+            http.httpx_client = pooled_client(settings, stats, headers)
+        _apify_clients[key] = client
+        return client
+
+
+def get_apify_client(token: str):
+    """Shared ApifyClient for `token`, reusing keep-alive connections"""
+    return _apify_client(token, is_async=False)
+
+
+def get_apify_async_client(token: str):
+    """
+    Shared ApifyClientAsync for `token`
+
+    Its connections are bound to the event loop that opened them, which is
+    fine for the single loop asgi.py runs on.
+    """
+    return _apify_client(token, is_async=True)
+
+
+def client_pool_stats() -> dict:
+    """Reuse counters and settings for every upstream pool created so far"""
+    with _lock:
+        pools = dict(_pool_stats)
+    return {name: stats.stats() for name, stats in pools.items()}
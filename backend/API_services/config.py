@@ -0,0 +1,28 @@
+from dotenv import load_dotenv
+import os
+import threading
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(BACKEND_DIR)
+
+_loaded = False
+_lock = threading.Lock()
+
+
+def load_config():
+    """
+    Load .env files into the environment once per process
+
+    backend/.env is read first, then the repository-root .env, which is
+    where the Apify token has historically lived. Variables already set in
+    the environment are never overridden.
+    """
+    global _loaded
+    if _loaded:
+        return
+    with _lock:
+        if _loaded:
+            return
+        load_dotenv(os.path.join(BACKEND_DIR, ".env"))
+        load_dotenv(os.path.join(REPO_DIR, ".env"))
+        _loaded = True
@@ -0,0 +1,461 @@
+from linkedin_scraper import actions
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service as ChromeService
+from webdriver_manager.chrome import ChromeDriverManager
+from API_services.browser_profiles import (
+    new_profile_dir,
+    remove_profile_dir,
+    set_cleanup,
+    sweep_profile_dirs,
+)
+from API_services import metrics
+from API_services.metrics import observe_stage
+from API_services.page_readiness import JitterPolicy, ReadinessEngine
+from API_services.process_memory import kill_tree, tree_rss_mb
+from API_services.rate_limiter import get_limiter
+from API_services import tracing
+from contextlib import contextmanager
+import atexit
+import os
+import logging
+import queue
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Rotate user agents to avoid detection
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36 Edg/119.0.0.0",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.0 Safari/605.1.15",
+]
+
+# "lean" (default) blocks heavy resources and caps renderer memory; "full"
+# loads profiles the way a desktop browser would
+BROWSER_MODE = os.getenv("LINKEDIN_BROWSER_MODE", "lean").lower()
+RENDERER_MEMORY_MB = int(os.getenv("LINKEDIN_RENDERER_MEMORY_MB", "512"))
+
+# Network.setBlockedURLs wildcards applied in lean mode: images, video and
+# fonts (LinkedIn serves profile media from media.licdn.com without file
+# extensions), plus third-party ad and analytics hosts. Page scripts and
+# styles from static.licdn.com are left alone; the profile needs them.
+# LINKEDIN_BLOCKED_URLS adds comma-separated patterns.
+BLOCKED_URL_PATTERNS = [
+    "*media.licdn.com/*",
+    "*dms.licdn.com/*",
+    "*.jpg*",
+    "*.jpeg*",
+    "*.png*",
+    "*.gif*",
+    "*.webp*",
+    "*.avif*",
+    "*.mp4*",
+    "*.webm*",
+    "*.m3u8*",
+    "*.woff*",
+    "*.ttf*",
+    "*.otf*",
+    "*doubleclick.net/*",
+    "*google-analytics.com/*",
+    "*googletagmanager.com/*",
+    "*px.ads.linkedin.com/*",
+    "*snap.licdn.com/*",
+    "*bat.bing.com/*",
+    "*connect.facebook.net/*",
+]
+
+# Sums navigation and resource transfer sizes for the current page
+_TRANSFER_SIZE_SCRIPT = """
+return performance.getEntriesByType('navigation')
+    .concat(performance.getEntriesByType('resource'))
+    .reduce((total, entry) => total + (entry.transferSize || 0), 0);
+"""
+
+_driver_path = None
+_driver_path_lock = threading.Lock()
+
+
+class DriverPoolError(Exception):
+    """Raised when the pool cannot hand out a logged-in driver"""
+
+
+def resolve_driver_path() -> str:
+    """
+    Resolve the chromedriver binary once per process
+
+    ChromeDriverManager().install() hits the network and the disk cache on
+    every call, so the result is memoised for the lifetime of the process.
+    """
+    global _driver_path
+    with _driver_path_lock:
+        if _driver_path is None:
+            _driver_path = os.getenv("CHROMEDRIVER") or ChromeDriverManager().install()
+            logger.info(f"Resolved chromedriver binary: {_driver_path}")
+        return _driver_path
+
+
+def blocked_url_patterns() -> list:
+    extra = [p.strip() for p in os.getenv("LINKEDIN_BLOCKED_URLS", "").split(",")]
+    return BLOCKED_URL_PATTERNS + [p for p in extra if p]
+
+
+def build_chrome_options(user_data_dir: str, mode: str = None) -> Options:
+    """
+    Build the headless Chrome options used by every pooled driver
+
+    Args:
+        user_data_dir (str): Profile directory owned by the driver
+        mode (str): "lean" or "full", defaults to LINKEDIN_BROWSER_MODE
+
+    Returns:
+        Options: Configured Chrome options
+    """
+    mode = mode or BROWSER_MODE
+    chrome_options = Options()
+    chrome_options.add_argument("--headless=new")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--disable-extensions")
+    chrome_options.add_argument("--disable-notifications")
+    chrome_options.add_argument(
+        "--disable-blink-features=AutomationControlled"
+    )  # Helps avoid detection
+    chrome_options.add_argument(f"--user-agent={random.choice(USER_AGENTS)}")
+    chrome_options.add_argument(f"--user-data-dir={user_data_dir}")
+
+    if mode != "lean":
+        chrome_options.add_argument("--window-size=1920,1080")
+        return chrome_options
+
+    # Return once the DOM is parsed; the readiness engine waits for the
+    # profile elements themselves, not for every subresource
+    chrome_options.page_load_strategy = "eager"
+    chrome_options.add_argument("--window-size=1280,800")
+    chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+    chrome_options.add_argument("--mute-audio")
+    chrome_options.add_argument(f"--js-flags=--max-old-space-size={RENDERER_MEMORY_MB}")
+    chrome_options.add_argument("--renderer-process-limit=2")
+    chrome_options.add_argument("--disk-cache-size=33554432")
+    chrome_options.add_argument("--disable-background-networking")
+    chrome_options.add_argument("--disable-component-update")
+    chrome_options.add_argument("--disable-sync")
+    chrome_options.add_argument("--no-first-run")
+    chrome_options.add_argument(
+        "--disable-features=Translate,MediaRouter,OptimizationHints"
+    )
+    return chrome_options
+
+
+def block_heavy_resources(driver, patterns: list = None):
+    """Block URL patterns for the whole session over the DevTools protocol"""
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd(
+            "Network.setBlockedURLs", {"urls": patterns or blocked_url_patterns()}
+        )
+    except Exception as e:
+        logger.warning(f"Could not block resources over DevTools: {str(e)}")
+
+
+class PooledDriver:
+    """A logged-in Chrome session owned by the pool"""
+
+    def __init__(self, driver, user_data_dir: str, mode: str = None):
+        self.driver = driver
+        self.user_data_dir = user_data_dir
+        self.mode = mode or BROWSER_MODE
+        self.uses = 0
+        self.created_at = time.time()
+        self.failed = False
+        set_cleanup(user_data_dir, self._quit)
+
+    def is_healthy(self) -> bool:
+        """Cheap liveness probe: a dead session raises on any command"""
+        try:
+            self.driver.execute_script("return document.readyState;")
+        except Exception as e:
+            logger.warning(f"Pooled driver failed health check: {str(e)}")
+            return False
+
+        title = self.driver.title or ""
+        if "Sign In" in title or "Login" in title:
+            logger.warning("Pooled driver session is no longer logged in")
+            return False
+        return True
+
+    def _browser_pid(self) -> int:
+        process = getattr(getattr(self.driver, "service", None), "process", None)
+        return getattr(process, "pid", None)
+
+    def footprint(self) -> dict:
+        """
+        Bytes transferred for the current page and browser memory
+
+        Both are also recorded in the browser metrics; either is None when
+        it cannot be measured.
+        """
+        try:
+            transfer = self.driver.execute_script(_TRANSFER_SIZE_SCRIPT)
+        except Exception:
+            transfer = None
+        pid = self._browser_pid()
+        rss = tree_rss_mb(pid) if pid else None
+        if isinstance(transfer, (int, float)):
+            metrics.BROWSER_TRANSFER_BYTES.observe(transfer, self.mode)
+        else:
+            transfer = None
+        if rss is not None:
+            metrics.BROWSER_RSS_MB.observe(rss, self.mode)
+        return {"transfer_bytes": transfer, "browser_rss_mb": rss}
+
+    def _quit(self):
+        pid = self._browser_pid()
+        try:
+            self.driver.quit()
+        except Exception:
+            # A wedged chromedriver would otherwise keep Chrome running
+            if pid:
+                kill_tree(pid)
+
+    def close(self):
+        self._quit()
+        size = remove_profile_dir(self.user_data_dir)
+        logger.info(
+            f"Removed Chrome profile after {self.uses} uses "
+            f"({size / (1024 * 1024):.1f} MB)"
+        )
+
+
+def launch_driver(page_load_timeout: int = 45, mode: str = None) -> PooledDriver:
+    """
+    Start a Chrome session that is not logged in yet
+
+    The user-data directory is deleted if the launch fails.
+    """
+    mode = mode or BROWSER_MODE
+    user_data_dir = new_profile_dir()
+    driver = None
+    try:
+        service = ChromeService(resolve_driver_path())
+        driver = webdriver.Chrome(
+            service=service, options=build_chrome_options(user_data_dir, mode)
+        )
+        driver.set_page_load_timeout(page_load_timeout)
+        if mode == "lean":
+            block_heavy_resources(driver)
+    except Exception:
+        if driver:
+            PooledDriver(driver, user_data_dir, mode).close()
+        else:
+            remove_profile_dir(user_data_dir)
+        raise
+    return PooledDriver(driver, user_data_dir, mode)
+
+
+class DriverPool:
+    """
+    Fixed-size pool of pre-authenticated Chrome drivers
+
+    Drivers are created lazily up to `size`, logged in once, and handed out
+    to one request at a time. A driver is recycled after `max_uses` leases,
+    after a failed health check, or when the caller marks its lease failed.
+    """
+
+    def __init__(
+        self,
+        size: int = None,
+        max_uses: int = None,
+        acquire_timeout: float = None,
+        page_load_timeout: int = 45,
+        mode: str = None,
+    ):
+        self.size = size or int(os.getenv("LINKEDIN_DRIVER_POOL_SIZE", "2"))
+        self.max_uses = max_uses or int(os.getenv("LINKEDIN_DRIVER_MAX_USES", "25"))
+        self.acquire_timeout = acquire_timeout or float(
+            os.getenv("LINKEDIN_DRIVER_ACQUIRE_TIMEOUT", "120")
+        )
+        self.page_load_timeout = page_load_timeout
+        self.mode = mode or BROWSER_MODE
+
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._closed = False
+        # Reclaim profiles left by processes that died without cleaning up
+        sweep_profile_dirs()
+
+    def _login(self, driver):
+        email = os.getenv("LINKEDIN_EMAIL")
+        password = os.getenv("LINKEDIN_PASSWORD")
+        if not email or not password:
+            raise DriverPoolError(
+                "LinkedIn credentials not found in environment variables"
+            )
+
+        # Imported here to avoid a circular import with the scraper module
+        from API_services.linkedin_scraper_service import retry_with_backoff
+
+        readiness = ReadinessEngine(driver)
+        logger.info("Logging in to LinkedIn")
+
+        def login_action():
+            with get_limiter("linkedin").slot():
+                actions.login(driver, email, password)
+
+        with observe_stage("selenium_login"):
+            retry_with_backoff(
+                login_action,
+                retries=2,
+                max_elapsed=readiness.budgets["login"],
+            )
+
+            # Wait for the login redirect to finish and cookies to be set
+            if not readiness.wait_for_login():
+                raise DriverPoolError(
+                    "Failed to login to LinkedIn: Still on login page"
+                )
+        JitterPolicy.from_env().pause()
+
+    def _create(self) -> PooledDriver:
+        logger.info("Initializing pooled Chrome driver")
+        pooled = launch_driver(self.page_load_timeout, self.mode)
+        try:
+            self._login(pooled.driver)
+        except Exception:
+            pooled.close()
+            raise
+        return pooled
+
+    def _discard(self, pooled: PooledDriver):
+        pooled.close()
+        with self._lock:
+            self._created -= 1
+
+    def _take(self) -> PooledDriver:
+        deadline = time.monotonic() + self.acquire_timeout
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+
+            with self._lock:
+                if self._created < self.size:
+                    self._created += 1
+                    reserve = True
+                else:
+                    reserve = False
+
+            if reserve:
+                try:
+                    return self._create()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise DriverPoolError("Timed out waiting for a free Chrome driver")
+            try:
+                return self._idle.get(timeout=min(remaining, 1.0))
+            except queue.Empty:
+                continue
+
+    @contextmanager
+    def acquire(self):
+        """
+        Lease a healthy, logged-in driver for the duration of a scrape
+
+        Set `lease.failed = True` if the session should not be reused.
+
+        Yields:
+            PooledDriver: The leased driver
+        """
+        if self._closed:
+            raise DriverPoolError("Driver pool is closed")
+
+        with tracing.span("driver_lease") as span:
+            pooled = self._take()
+            while not pooled.is_healthy():
+                self._discard(pooled)
+                pooled = self._take()
+            span.set_attribute("driver_uses", pooled.uses)
+
+        pooled.failed = False
+        try:
+            yield pooled
+        except Exception:
+            pooled.failed = True
+            raise
+        finally:
+            pooled.uses += 1
+            if self._closed or pooled.failed or pooled.uses >= self.max_uses:
+                logger.info(
+                    f"Recycling Chrome driver after {pooled.uses} uses"
+                    f"{' (failed)' if pooled.failed else ''}"
+                )
+                self._discard(pooled)
+            else:
+                self._idle.put(pooled)
+
+    def warm_up(self):
+        """Create and log in drivers until the pool is full"""
+        warmed = []
+        try:
+            while True:
+                with self._lock:
+                    if self._created >= self.size:
+                        break
+                    self._created += 1
+                try:
+                    warmed.append(self._create())
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+        finally:
+            for pooled in warmed:
+                self._idle.put(pooled)
+
+    def close(self):
+        """
+        Quit every idle driver; leased drivers are quit on release
+
+        Drivers still leased when the interpreter exits are quit and their
+        profiles deleted by browser_profiles' exit hook.
+        """
+        self._closed = True
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "created": self._created,
+            "idle": self._idle.qsize(),
+            "max_uses": self.max_uses,
+            "mode": self.mode,
+        }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_driver_pool() -> DriverPool:
+    """Return the process-wide driver pool, creating it on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = DriverPool()
+            atexit.register(_pool.close)
+        return _pool
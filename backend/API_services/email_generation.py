@@ -0,0 +1,987 @@
+from collections import deque
+from pydantic import BaseModel, ValidationError
+from types import SimpleNamespace
+import json
+import os
+import logging
+import re
+import threading
+
+from API_services.generation_cache import (
+    generation_key,
+    get_generation_cache,
+    get_prefix_cache,
+)
+from API_services.metrics import observe_stage
+from API_services.rate_limiter import get_limiter
+from API_services import tracing
+
+logger = logging.getLogger(__name__)
+
+MODEL = "gemini-2.0-flash"
+
+COLD_EMAIL_INSTRUCTION = 'You\'re a skilled  copywriter who knows how to write cold emails that actually get replies. Your job is to craft short, thoughtful, and personalized emails for enterprise decision-makers based on their LinkedIn profiles and a quick briefing on the product or service being offered.\n\nHere\'s what you\'ll get to work with:\n\n- A snapshot of the person\'s LinkedIn info — things like their name, job title, company, industry, recent posts, achievements, or shared interests.  \n- A campaign prompt that explains the product/service, the value it brings, and what kind of call-to-action we\'re aiming for.\n\n**Your task:**\nWrite only the body of the email (no subject line or extra headers) using the following rules:\n\n- Always start with: **Dear [First Name],**\n- Keep it brief — aim for **4 to 6 sentences total**\n- Make it personal — use **relevant LinkedIn details** to show we\'ve done our homework\n- Focus on **real value** — how does this offering help solve a challenge or make their work easier, faster, or more effective?\n- Use a **natural, conversational tone** — like it was written by a thoughtful human\n- End with a **light, low-pressure CTA** — like asking if they\'d be open to a quick call or if it makes sense to connect\n- Avoid all fluff — skip generic intros like "Hope you\'re well," marketing buzzwords, or long walls of text\n\n**Output format (JSON only):**\n```json\n{\n  "email_output": "The full body of the email starting with \'Dear [First Name],\'",\n  "analysis_rationale": [\n    "Insightful reasoning based on LinkedIn activity or achievements — e.g., recent promotion, project success, or strong content engagement",\n    "What makes this person\'s performance or profile impressive and why it was used in the email",\n    "Any connections between their career performance and the value proposition of the offering"\n  ]\n}\n```\n\n**Never include anything outside this JSON structure. No explanations, no extra text, just valid JSON.**'
+
+# Same rules as COLD_EMAIL_INSTRUCTION, for a request carrying several leads
+PACKED_COLD_EMAIL_INSTRUCTION = (
+    COLD_EMAIL_INSTRUCTION.split("**Output format")[0]
+    + '**Several leads:**\nThe leads come as one JSON object per line, each with a lead_id, followed by nothing else; the campaign prompt applies to all of them. Write a separate email for every lead using only that lead\'s details — never mix information between leads.\n\n**Output format (JSON only):**\n```json\n{\n  "emails": [\n    {\n      "lead_id": "The lead_id exactly as given",\n      "email_output": "The full body of the email starting with \'Dear [First Name],\'",\n      "analysis_rationale": [\n        "Insightful reasoning based on LinkedIn activity or achievements",\n        "What makes this person\'s profile impressive and why it was used in the email",\n        "Any connections between their career and the value proposition of the offering"\n      ]\n    }\n  ]\n}\n```\n\nReturn exactly one entry per lead. **Never include anything outside this JSON structure. No explanations, no extra text, just valid JSON.**'
+)
+
+IMPROVE_EMAIL_INSTRUCTION = 'You\'re a skilled B2B copywriter who knows how to improve cold emails to make them more effective. Your job is to refine and enhance an existing email based on specific improvement instructions.\n\n**Your task:**\nImprove the provided email using the following rules:\n\n- Always start with: **Dear [First Name],**\n- Keep it brief — aim for **4 to 6 sentences total**\n- Make it personal and maintain any personalization from the original email\n- Focus on **real value** — how does this offering help solve a challenge or make their work easier, faster, or more effective?\n- Use a **natural, conversational tone** — like it was written by a thoughtful human\n- End with a **light, low-pressure CTA** — like asking if they\'d be open to a quick call or if it makes sense to connect\n- Avoid all fluff — skip generic intros like "Hope you\'re well," marketing buzzwords, or long walls of text\n\n**Output format (JSON only):**\n```json\n{\n  "email_output": "The full body of the improved email starting with \'Dear [First Name],\'",\n  "improvement_rationale": [\n    "Explanation of key improvements made to the email",\n    "How the improvements address the specific prompt instructions",\n    "Why these changes will make the email more effective"\n  ]\n}\n```\n\n**Never include anything outside this JSON structure. No explanations, no extra text, just valid JSON.**'
+
+
+def cold_email_contents(profile: dict, prompt: str) -> list:
+    """Build the user turn for a cold email from Apify profile fields"""
+    fullName = profile.get("fullName", "")
+    headline = profile.get("headline", "")
+    about = profile.get("about", "")
+    return [
+        f"Their name is {fullName}.\n\n***Important prompt***:[ {prompt} ]. {headline}. {about}."
+    ]
+
+
+def packed_cold_email_contents(profiles: dict, prompt: str) -> list:
+    """
+    Build one user turn for several leads sharing a campaign prompt
+
+    Args:
+        profiles (dict): lead_id -> profile fields (fullName, headline, about)
+        prompt (str): Campaign prompt, sent once for the whole pack
+    """
+    leads = "\n".join(
+        _lead_line(lead_id, profile) for lead_id, profile in profiles.items()
+    )
+    return [f"***Important prompt***:[ {prompt} ].\n\nLeads:\n{leads}"]
+
+
+def _lead_line(lead_id: str, profile: dict) -> str:
+    return json.dumps(
+        {
+            "lead_id": lead_id,
+            "name": profile.get("fullName", ""),
+            "headline": profile.get("headline", ""),
+            "about": profile.get("about", ""),
+        },
+        ensure_ascii=False,
+    )
+
+
+def improve_email_contents(
+    email_content: str, recipient_name: str, prompt: str
+) -> list:
+    """Build the user turn for an email improvement request"""
+    return [
+        f"Here is the original email:\n\n{email_content}\n\nThe recipient's name is {recipient_name}.\n\nImprovement instructions: {prompt}"
+    ]
+
+
+class ColdEmail(BaseModel):
+    """Response schema for cold email generation"""
+
+    email_output: str
+    analysis_rationale: list[str]
+
+
+class PackedColdEmail(ColdEmail):
+    """One lead's email in a packed response"""
+
+    lead_id: str
+
+
+class ColdEmailPack(BaseModel):
+    """Response schema for packed cold email generation"""
+
+    emails: list[PackedColdEmail]
+
+
+class ImprovedEmail(BaseModel):
+    """Response schema for email improvement"""
+
+    email_output: str
+    improvement_rationale: list[str]
+
+
+class StructuredOutputError(Exception):
+    """The model output could not be validated even after repair"""
+
+
+# Bounded recovery budget for malformed output
+MAX_REPAIR_ATTEMPTS = int(os.getenv("GEMINI_REPAIR_ATTEMPTS", "1"))
+MAX_REGENERATIONS = int(os.getenv("GEMINI_MAX_REGENERATIONS", "1"))
+
+REPAIR_INSTRUCTION = "You repair malformed JSON. Return only a JSON object that matches the response schema, keeping the original wording of every field. Do not add commentary."
+
+_stats_lock = threading.Lock()
+_stats = {
+    "generations": 0,
+    "valid_first_pass": 0,
+    "local_repairs": 0,
+    "model_repairs": 0,
+    "regenerations": 0,
+    "successes": 0,
+    "failures": 0,
+    "pack_requests": 0,
+    "packed_leads": 0,
+    "pack_emails": 0,
+    "pack_requeues": 0,
+    "pack_fallbacks": 0,
+}
+
+
+def _count(counter: str, amount: int = 1):
+    with _stats_lock:
+        _stats[counter] += amount
+
+
+def structured_output_stats() -> dict:
+    """Validation and repair counters, including regenerations per success"""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["regenerations_per_success"] = (
+        round(stats["regenerations"] / stats["successes"], 4)
+        if stats["successes"]
+        else 0.0
+    )
+    stats["emails_per_pack"] = (
+        round(stats["pack_emails"] / stats["pack_requests"], 2)
+        if stats["pack_requests"]
+        else 0.0
+    )
+    stats["pack_size_limit"] = _pack_sizer.limit
+    return stats
+
+
+def extract_json(response: str) -> dict:
+    """Parse the JSON object out of a model response"""
+    # Extract JSON from the response
+    if "```json" in response and "```" in response:
+        json_str = response.split("```json")[1].split("```")[0].strip()
+    else:
+        json_str = response
+
+    return json.loads(json_str)
+
+
+def _validate_locally(text: str, schema):
+    """
+    Single validation pass over raw model text
+
+    Tries the text as-is, then with code fences or surrounding prose removed.
+
+    Returns:
+        tuple: (validated model or None, repaired locally, last error)
+    """
+    with observe_stage("json_extract", **{"json.chars": len(text)}) as span:
+        result, repaired, error = _validate_candidates(text, schema)
+        span.set_attributes(
+            **{"json.valid": result is not None, "json.repaired": repaired}
+        )
+        return result, repaired, error
+
+
+def _validate_candidates(text: str, schema):
+    try:
+        return schema.model_validate_json(text), False, None
+    except ValidationError as e:
+        error = e
+
+    candidates = []
+    if "```" in text:
+        try:
+            candidates.append(json.dumps(extract_json(text)))
+        except (ValueError, IndexError):
+            pass
+    start, end = text.find("{"), text.rfind("}")
+    if start != -1 and end > start:
+        candidates.append(text[start : end + 1])
+
+    for candidate in candidates:
+        try:
+            return schema.model_validate_json(candidate), True, None
+        except ValidationError as e:
+            error = e
+    return None, False, error
+
+
+def _repair_contents(text: str, error) -> list:
+    return [
+        f"Validation error:\n{error}\n\nMalformed output:\n{text}\n\nReturn the corrected JSON object."
+    ]
+
+
+def _request_attributes(config, contents: list) -> dict:
+    return {
+        "gemini.model": MODEL,
+        "gemini.prompt_chars": sum(len(str(part)) for part in contents),
+        "gemini.cached_prefix": bool(getattr(config, "cached_content", None)),
+    }
+
+
+def _response_attributes(text: str, usage) -> dict:
+    return {
+        "gemini.response_chars": len(text or ""),
+        "gemini.prompt_tokens": getattr(usage, "prompt_token_count", None),
+        "gemini.output_tokens": getattr(usage, "candidates_token_count", None),
+        "gemini.cached_tokens": getattr(usage, "cached_content_token_count", None),
+    }
+
+
+def _generate(client, config, contents: list):
+    with get_limiter("gemini").slot(), observe_stage(
+        "gemini_generate", **_request_attributes(config, contents)
+    ) as span:
+        message = client.models.generate_content(
+            model=MODEL, config=config, contents=contents
+        )
+        span.set_attributes(
+            **_response_attributes(message.text, message.usage_metadata)
+        )
+        return message
+
+
+async def _agenerate(client, config, contents: list):
+    async with get_limiter("gemini").aslot():
+        with observe_stage(
+            "gemini_generate", **_request_attributes(config, contents)
+        ) as span:
+            message = await client.aio.models.generate_content(
+                model=MODEL, config=config, contents=contents
+            )
+            span.set_attributes(
+                **_response_attributes(message.text, message.usage_metadata)
+            )
+            return message
+
+
+def parse_structured(client, text: str, schema):
+    """
+    Validate model text against `schema`, repairing it if needed
+
+    Local fixes are tried first; after that up to MAX_REPAIR_ATTEMPTS small
+    repair calls are made, which are much cheaper than regenerating the email.
+
+    Returns:
+        BaseModel: The validated output, or None if it could not be repaired
+    """
+    result, repaired, error = _validate_locally(text, schema)
+    if result is not None:
+        _count("local_repairs" if repaired else "valid_first_pass")
+        return result
+
+    from google.genai import types
+
+    for attempt in range(MAX_REPAIR_ATTEMPTS):
+        logger.warning(f"Repairing malformed model output (attempt {attempt + 1})")
+        with tracing.span("structured_repair", attempt=attempt + 1):
+            message = _generate(
+                client,
+                config=types.GenerateContentConfig(
+                    system_instruction=REPAIR_INSTRUCTION,
+                    response_mime_type="application/json",
+                    response_schema=schema,
+                ),
+                contents=_repair_contents(text, error),
+            )
+            text = message.text or ""
+            result, _, error = _validate_locally(text, schema)
+        if result is not None:
+            _count("model_repairs")
+            return result
+    return None
+
+
+async def aparse_structured(client, text: str, schema):
+    """Async variant of parse_structured using client.aio"""
+    result, repaired, error = _validate_locally(text, schema)
+    if result is not None:
+        _count("local_repairs" if repaired else "valid_first_pass")
+        return result
+
+    from google.genai import types
+
+    for attempt in range(MAX_REPAIR_ATTEMPTS):
+        logger.warning(f"Repairing malformed model output (attempt {attempt + 1})")
+        with tracing.span("structured_repair", attempt=attempt + 1):
+            message = await _agenerate(
+                client,
+                config=types.GenerateContentConfig(
+                    system_instruction=REPAIR_INSTRUCTION,
+                    response_mime_type="application/json",
+                    response_schema=schema,
+                ),
+                contents=_repair_contents(text, error),
+            )
+            text = message.text or ""
+            result, _, error = _validate_locally(text, schema)
+        if result is not None:
+            _count("model_repairs")
+            return result
+    return None
+
+
+def _schema_config(schema) -> dict:
+    return {"response_mime_type": "application/json", "response_schema": schema}
+
+
+def _is_stale_prefix_error(config, error: Exception) -> bool:
+    # A cached prefix that expired or was deleted server-side surfaces as a
+    # client error; retry once with the instruction inline
+    return bool(config.cached_content) and getattr(error, "code", None) in (
+        400,
+        403,
+        404,
+    )
+
+
+def _inline_config(instruction: str, schema):
+    """Request config carrying the instruction itself instead of a cached prefix"""
+    from google.genai import types
+
+    return types.GenerateContentConfig(
+        system_instruction=instruction, **_schema_config(schema)
+    )
+
+
+def _call_model(client, instruction: str, contents: list, schema):
+    prefix_cache = get_prefix_cache()
+    config = prefix_cache.config_for(
+        client, MODEL, instruction, **_schema_config(schema)
+    )
+    try:
+        message = _generate(client, config=config, contents=contents)
+    except Exception as e:
+        if not _is_stale_prefix_error(config, e):
+            raise
+        prefix_cache.invalidate(MODEL, instruction, e)
+        message = _generate(
+            client, config=_inline_config(instruction, schema), contents=contents
+        )
+    prefix_cache.record_usage(message.usage_metadata)
+    return message
+
+
+async def _acall_model(client, instruction: str, contents: list, schema):
+    prefix_cache = get_prefix_cache()
+    config = await prefix_cache.aconfig_for(
+        client, MODEL, instruction, **_schema_config(schema)
+    )
+    try:
+        message = await _agenerate(client, config=config, contents=contents)
+    except Exception as e:
+        if not _is_stale_prefix_error(config, e):
+            raise
+        prefix_cache.invalidate(MODEL, instruction, e)
+        message = await _agenerate(
+            client, config=_inline_config(instruction, schema), contents=contents
+        )
+    prefix_cache.record_usage(message.usage_metadata)
+    return message
+
+
+def generate_structured(
+    client, instruction: str, contents: list, schema, use_cache=True
+) -> dict:
+    """
+    Run one schema-enforced generation through the caches
+
+    The model is asked for `schema` as JSON and the output is validated in a
+    single pass. Malformed output goes through a bounded repair step; only if
+    that fails is the email regenerated, at most MAX_REGENERATIONS times.
+
+    Args:
+        client (genai.Client): Gemini client
+        instruction (str): Static system instruction
+        contents (list): User turn
+        schema (type): Pydantic response model
+        use_cache (bool): Set to False to force a fresh generation
+
+    Returns:
+        dict: The validated output
+
+    Raises:
+        StructuredOutputError: If no valid output could be produced
+    """
+    cache = get_generation_cache()
+    key = generation_key(MODEL, instruction, contents)
+    if use_cache:
+        cached = cache.get(key)
+        if cached is not None:
+            logger.info("Serving generation from cache")
+            return schema.model_validate_json(cached).model_dump()
+
+    for attempt in range(MAX_REGENERATIONS + 1):
+        if attempt:
+            _count("regenerations")
+            logger.warning(f"Regenerating after unrepairable output ({attempt})")
+        _count("generations")
+        message = _call_model(client, instruction, contents, schema)
+        result = parse_structured(client, message.text or "", schema)
+        if result is not None:
+            _count("successes")
+            cache.set(key, result.model_dump_json(), message.usage_metadata)
+            return result.model_dump()
+
+    _count("failures")
+    raise StructuredOutputError("Model output did not match the response schema")
+
+
+async def agenerate_structured(
+    client, instruction: str, contents: list, schema, use_cache=True
+) -> dict:
+    """Async variant of generate_structured using client.aio"""
+    cache = get_generation_cache()
+    key = generation_key(MODEL, instruction, contents)
+    if use_cache:
+        cached = cache.get(key)
+        if cached is not None:
+            logger.info("Serving generation from cache")
+            return schema.model_validate_json(cached).model_dump()
+
+    for attempt in range(MAX_REGENERATIONS + 1):
+        if attempt:
+            _count("regenerations")
+            logger.warning(f"Regenerating after unrepairable output ({attempt})")
+        _count("generations")
+        message = await _acall_model(client, instruction, contents, schema)
+        result = await aparse_structured(client, message.text or "", schema)
+        if result is not None:
+            _count("successes")
+            cache.set(key, result.model_dump_json(), message.usage_metadata)
+            return result.model_dump()
+
+    _count("failures")
+    raise StructuredOutputError("Model output did not match the response schema")
+
+
+def generate_cold_email(client, profile: dict, prompt: str, use_cache=True) -> dict:
+    """
+    Generate a personalised cold email for a scraped profile
+
+    Args:
+        client (genai.Client): Gemini client
+        profile (dict): Profile fields (fullName, headline, about)
+        prompt (str): Campaign prompt
+        use_cache (bool): Set to False to force a fresh generation
+
+    Returns:
+        dict: Validated output with email_output and analysis_rationale
+    """
+    return generate_structured(
+        client,
+        COLD_EMAIL_INSTRUCTION,
+        cold_email_contents(profile, prompt),
+        ColdEmail,
+        use_cache=use_cache,
+    )
+
+
+def improve_email(
+    client, email_content: str, recipient_name: str, prompt: str, use_cache=True
+) -> dict:
+    """
+    Rewrite an existing email according to improvement instructions
+
+    Returns:
+        dict: Validated output with email_output and improvement_rationale
+    """
+    return generate_structured(
+        client,
+        IMPROVE_EMAIL_INSTRUCTION,
+        improve_email_contents(email_content, recipient_name, prompt),
+        ImprovedEmail,
+        use_cache=use_cache,
+    )
+
+
+async def agenerate_cold_email(
+    client, profile: dict, prompt: str, use_cache=True
+) -> dict:
+    """Async variant of generate_cold_email using client.aio"""
+    return await agenerate_structured(
+        client,
+        COLD_EMAIL_INSTRUCTION,
+        cold_email_contents(profile, prompt),
+        ColdEmail,
+        use_cache=use_cache,
+    )
+
+
+async def aimprove_email(
+    client, email_content: str, recipient_name: str, prompt: str, use_cache=True
+) -> dict:
+    """Async variant of improve_email using client.aio"""
+    return await agenerate_structured(
+        client,
+        IMPROVE_EMAIL_INSTRUCTION,
+        improve_email_contents(email_content, recipient_name, prompt),
+        ImprovedEmail,
+        use_cache=use_cache,
+    )
+
+
+# Packed generation: several leads share one request, so the system
+# instruction and the campaign prompt are paid once per pack, not per lead
+PACK_MAX_LEADS = int(os.getenv("GEMINI_PACK_MAX_LEADS", "8"))
+# Lead data (name, headline, about) allowed in one pack
+PACK_INPUT_TOKENS = int(os.getenv("GEMINI_PACK_INPUT_TOKENS", "6000"))
+# Output allowed for one pack; gemini-2.0-flash stops at 8192 tokens
+PACK_OUTPUT_TOKENS = int(os.getenv("GEMINI_PACK_OUTPUT_TOKENS", "6000"))
+# Packs a lead may go through before it gets a request of its own
+PACK_ATTEMPTS = int(os.getenv("GEMINI_PACK_ATTEMPTS", "2"))
+
+
+def _estimate_tokens(text: str) -> int:
+    # Roughly four characters per token for English prose
+    return len(text) // 4 + 1
+
+
+class PackSizer:
+    """
+    Chooses how many leads go into one packed request
+
+    A pack holds as many leads as fit both the input budget and the output
+    budget at the output tokens per email observed so far. Packs that come
+    back with leads missing halve the lead limit; complete packs grow it by
+    one, up to PACK_MAX_LEADS.
+    """
+
+    def __init__(
+        self, max_leads: int = None, input_tokens: int = None, output_tokens: int = None
+    ):
+        self.max_leads = max(1, max_leads or PACK_MAX_LEADS)
+        self.input_tokens = input_tokens or PACK_INPUT_TOKENS
+        self.output_tokens = output_tokens or PACK_OUTPUT_TOKENS
+        self.limit = self.max_leads
+        self.tokens_per_email = float(os.getenv("GEMINI_PACK_TOKENS_PER_EMAIL", "400"))
+        self._lock = threading.Lock()
+
+    def _cap(self) -> int:
+        with self._lock:
+            by_output = int(self.output_tokens // self.tokens_per_email)
+            return max(1, min(self.limit, by_output))
+
+    def take(self, pending: deque) -> list:
+        """Pop the next pack of (key, profile, ...) entries off `pending`"""
+        cap = self._cap()
+        pack, tokens = [], 0
+        while pending and len(pack) < cap:
+            cost = _estimate_tokens(_lead_line("00", pending[0][1]))
+            if pack and tokens + cost > self.input_tokens:
+                break
+            pack.append(pending.popleft())
+            tokens += cost
+        return pack
+
+    def plan(self, profiles: dict) -> list:
+        """Split key -> profile into the packs take() would form"""
+        pending = deque(profiles.items())
+        packs = []
+        while pending:
+            packs.append(dict(self.take(pending)))
+        return packs
+
+    def record(self, size: int, returned: int, output_tokens: int):
+        with self._lock:
+            if returned and output_tokens:
+                self.tokens_per_email = (
+                    0.8 * self.tokens_per_email + 0.2 * output_tokens / returned
+                )
+            if returned < size:
+                self.limit = max(1, size // 2)
+            elif size >= self.limit:
+                self.limit = min(self.max_leads, self.limit + 1)
+
+
+_pack_sizer = PackSizer()
+
+
+def plan_packs(profiles: dict) -> list:
+    """
+    Group profiles the way generate_cold_emails would pack them
+
+    Lets callers run packs concurrently, one generate_cold_emails call each.
+
+    Args:
+        profiles (dict): Caller's key -> profile fields
+
+    Returns:
+        list: key -> profile dicts, one per pack
+    """
+    return _pack_sizer.plan(profiles)
+
+
+def _first_name(profile: dict) -> str:
+    parts = (profile.get("fullName") or "").split()
+    return parts[0].lower() if parts else ""
+
+
+def _split_pack(text: str, profiles: dict) -> dict:
+    """
+    Per-lead emails from a packed response
+
+    Entries are matched to leads by lead_id. Entries that fail validation,
+    repeat a lead_id or name an unknown one are dropped, so only those
+    leads are re-queued instead of the whole pack.
+
+    Returns:
+        dict: lead_id -> ColdEmail
+    """
+    pack, _, _ = _validate_locally(text, ColdEmailPack)
+    if pack is not None:
+        entries = [entry.model_dump() for entry in pack.emails]
+    else:
+        try:
+            entries = json.loads(text[text.find("{") : text.rfind("}") + 1])["emails"]
+        except (ValueError, KeyError, TypeError):
+            return {}
+        if not isinstance(entries, list):
+            return {}
+
+    emails = {}
+    for entry in entries:
+        try:
+            email = PackedColdEmail.model_validate(entry)
+        except ValidationError:
+            continue
+        profile = profiles.get(email.lead_id)
+        if profile is None or email.lead_id in emails or not email.email_output:
+            continue
+        name = _first_name(profile)
+        if name and name not in email.email_output[:120].lower():
+            # Greetings may use a title, nickname or last name; only flag it
+            logger.warning(
+                f"Packed email for lead {email.lead_id} does not greet {name}"
+            )
+        emails[email.lead_id] = ColdEmail(
+            email_output=email.email_output,
+            analysis_rationale=email.analysis_rationale,
+        )
+    return emails
+
+
+def _usage_share(usage, leads: int):
+    # Per-lead share of a pack's tokens, recorded with each cache entry
+    if usage is None or not leads:
+        return None
+    return SimpleNamespace(
+        prompt_token_count=(usage.prompt_token_count or 0) // leads,
+        candidates_token_count=(usage.candidates_token_count or 0) // leads,
+    )
+
+
+def _generate_pack(client, pack: list, prompt: str) -> tuple:
+    profiles = {str(index): entry[1] for index, entry in enumerate(pack)}
+    _count("pack_requests")
+    _count("packed_leads", len(pack))
+    with tracing.span("cold_email_pack", leads=len(pack)) as span:
+        try:
+            message = _call_model(
+                client,
+                PACKED_COLD_EMAIL_INSTRUCTION,
+                packed_cold_email_contents(profiles, prompt),
+                ColdEmailPack,
+            )
+        except Exception as e:
+            span.record_error(e)
+            logger.warning(f"Packed generation of {len(pack)} leads failed: {str(e)}")
+            return {}, None
+        emails = _split_pack(message.text or "", profiles)
+        span.set_attributes(returned=len(emails))
+    usage = message.usage_metadata
+    _count("pack_emails", len(emails))
+    _pack_sizer.record(
+        len(pack), len(emails), getattr(usage, "candidates_token_count", None)
+    )
+    return emails, usage
+
+
+def generate_cold_emails(client, profiles: dict, prompt: str, use_cache=True) -> dict:
+    """
+    Generate cold emails for several profiles, packing leads per request
+
+    Each request carries as many leads as the token budget allows and asks
+    for one keyed entry per lead. Leads missing from a response, or whose
+    entry is malformed, are re-queued into a later pack; after
+    PACK_ATTEMPTS packs a lead falls back to generate_cold_email. Results
+    share the single-lead generation cache, so either path serves the other.
+
+    Args:
+        client (genai.Client): Gemini client
+        profiles (dict): Caller's key -> profile fields (fullName,
+            headline, about)
+        prompt (str): Campaign prompt
+        use_cache (bool): Set to False to force fresh generations
+
+    Returns:
+        dict: key -> validated output with email_output and
+        analysis_rationale, or {"error": ...} for leads that failed
+    """
+    cache = get_generation_cache()
+    results = {}
+    pending = deque()
+    for key, profile in profiles.items():
+        cache_key = generation_key(
+            MODEL, COLD_EMAIL_INSTRUCTION, cold_email_contents(profile, prompt)
+        )
+        cached = cache.get(cache_key) if use_cache else None
+        if cached is not None:
+            results[key] = ColdEmail.model_validate_json(cached).model_dump()
+        else:
+            pending.append((key, profile, cache_key, 0))
+
+    while pending:
+        pack = _pack_sizer.take(pending)
+        if len(pack) == 1:
+            # Nothing to share a request with
+            key, profile, _, _ = pack[0]
+            results[key] = _generate_single(client, profile, prompt)
+            continue
+
+        emails, usage = _generate_pack(client, pack, prompt)
+        share = _usage_share(usage, len(emails))
+        requeue = []
+        for index, (key, profile, cache_key, attempts) in enumerate(pack):
+            email = emails.get(str(index))
+            if email is not None:
+                results[key] = email.model_dump()
+                cache.set(cache_key, email.model_dump_json(), share)
+            elif attempts + 1 < PACK_ATTEMPTS:
+                _count("pack_requeues")
+                requeue.append((key, profile, cache_key, attempts + 1))
+            else:
+                _count("pack_fallbacks")
+                results[key] = _generate_single(client, profile, prompt)
+        pending.extendleft(reversed(requeue))
+    return results
+
+
+def _generate_single(client, profile: dict, prompt: str) -> dict:
+    try:
+        # The cache was already checked for this lead
+        return generate_cold_email(client, profile, prompt, use_cache=False)
+    except Exception as e:
+        return {"error": str(e)}
+
+
+class EmailStreamParser:
+    """
+    Incrementally decode one string field out of a streamed JSON response
+
+    Feed raw model text as it arrives; `feed` returns the newly decoded part
+    of the field's value (escapes resolved) so it can be forwarded to the
+    client before the JSON object is complete.
+    """
+
+    def __init__(self, field: str = "email_output"):
+        self.text = ""
+        self.complete = False
+        self._key = re.compile(r'"%s"\s*:\s*"' % re.escape(field))
+        self._pos = None
+
+    def feed(self, chunk: str) -> str:
+        self.text += chunk
+        if self.complete:
+            return ""
+
+        if self._pos is None:
+            match = self._key.search(self.text)
+            if match is None:
+                return ""
+            self._pos = match.end()
+
+        end, closed = self._scan(self._pos)
+        delta = json.loads(f'"{self.text[self._pos:end]}"')
+        self._pos = end
+        self.complete = closed
+        return delta
+
+    def _scan(self, start: int):
+        """Return the end of the decodable run from `start` and whether the string closed"""
+        text = self.text
+        i = start
+        while i < len(text):
+            char = text[i]
+            if char == '"':
+                return i, True
+            if char != "\\":
+                i += 1
+                continue
+            if i + 1 >= len(text):
+                break
+            if text[i + 1] != "u":
+                i += 2
+                continue
+            if i + 6 > len(text):
+                break
+            # Hold back a high surrogate until its low half has arrived
+            if 0xD800 <= int(text[i + 2 : i + 6], 16) <= 0xDBFF and i + 12 > len(text):
+                break
+            i += 6
+        return i, False
+
+
+def stream_structured(client, instruction: str, contents: list, schema, use_cache=True):
+    """
+    Stream one schema-enforced generation
+
+    Yields ("delta", text) for each new piece of email_output as it arrives,
+    then ("result", dict) with the validated output. A cache hit yields the
+    whole email as one delta. Streamed output is repaired but not
+    regenerated, since the client has already seen it.
+    """
+    cache = get_generation_cache()
+    key = generation_key(MODEL, instruction, contents)
+    if use_cache:
+        cached = cache.get(key)
+        if cached is not None:
+            result = schema.model_validate_json(cached).model_dump()
+            yield "delta", result["email_output"]
+            yield "result", result
+            return
+
+    prefix_cache = get_prefix_cache()
+    config = prefix_cache.config_for(
+        client, MODEL, instruction, **_schema_config(schema)
+    )
+    _count("generations")
+    while True:
+        parser = EmailStreamParser("email_output")
+        usage = None
+        streamed = False
+        try:
+            with get_limiter("gemini").slot(), observe_stage(
+                "gemini_generate", stream=True, **_request_attributes(config, contents)
+            ) as span:
+                for chunk in client.models.generate_content_stream(
+                    model=MODEL, config=config, contents=contents
+                ):
+                    usage = chunk.usage_metadata or usage
+                    if chunk.text:
+                        delta = parser.feed(chunk.text)
+                        if delta:
+                            streamed = True
+                            yield "delta", delta
+                span.set_attributes(**_response_attributes(parser.text, usage))
+            break
+        except Exception as e:
+            # Retry without the prefix only while the client has seen nothing
+            if streamed or not _is_stale_prefix_error(config, e):
+                raise
+            prefix_cache.invalidate(MODEL, instruction, e)
+            config = _inline_config(instruction, schema)
+
+    prefix_cache.record_usage(usage)
+    result = parse_structured(client, parser.text, schema)
+    if result is None:
+        _count("failures")
+        raise StructuredOutputError("Model output did not match the response schema")
+    _count("successes")
+    cache.set(key, result.model_dump_json(), usage)
+    yield "result", result.model_dump()
+
+
+async def astream_structured(
+    client, instruction: str, contents: list, schema, use_cache=True
+):
+    """Async variant of stream_structured using client.aio"""
+    cache = get_generation_cache()
+    key = generation_key(MODEL, instruction, contents)
+    if use_cache:
+        cached = cache.get(key)
+        if cached is not None:
+            result = schema.model_validate_json(cached).model_dump()
+            yield "delta", result["email_output"]
+            yield "result", result
+            return
+
+    prefix_cache = get_prefix_cache()
+    config = await prefix_cache.aconfig_for(
+        client, MODEL, instruction, **_schema_config(schema)
+    )
+    _count("generations")
+    while True:
+        parser = EmailStreamParser("email_output")
+        usage = None
+        streamed = False
+        try:
+            async with get_limiter("gemini").aslot():
+                with observe_stage(
+                    "gemini_generate",
+                    stream=True,
+                    **_request_attributes(config, contents),
+                ) as span:
+                    async for chunk in await client.aio.models.generate_content_stream(
+                        model=MODEL, config=config, contents=contents
+                    ):
+                        usage = chunk.usage_metadata or usage
+                        if chunk.text:
+                            delta = parser.feed(chunk.text)
+                            if delta:
+                                streamed = True
+                                yield "delta", delta
+                    span.set_attributes(**_response_attributes(parser.text, usage))
+            break
+        except Exception as e:
+            # Retry without the prefix only while the client has seen nothing
+            if streamed or not _is_stale_prefix_error(config, e):
+                raise
+            prefix_cache.invalidate(MODEL, instruction, e)
+            config = _inline_config(instruction, schema)
+
+    prefix_cache.record_usage(usage)
+    result = await aparse_structured(client, parser.text, schema)
+    if result is None:
+        _count("failures")
+        raise StructuredOutputError("Model output did not match the response schema")
+    _count("successes")
+    cache.set(key, result.model_dump_json(), usage)
+    yield "result", result.model_dump()
+
+
+def stream_cold_email(client, profile: dict, prompt: str, use_cache=True):
+    """Stream a cold email generation, see stream_structured"""
+    return stream_structured(
+        client,
+        COLD_EMAIL_INSTRUCTION,
+        cold_email_contents(profile, prompt),
+        ColdEmail,
+        use_cache=use_cache,
+    )
+
+
+def stream_improve_email(
+    client, email_content: str, recipient_name: str, prompt: str, use_cache=True
+):
+    """Stream an email improvement, see stream_structured"""
+    return stream_structured(
+        client,
+        IMPROVE_EMAIL_INSTRUCTION,
+        improve_email_contents(email_content, recipient_name, prompt),
+        ImprovedEmail,
+        use_cache=use_cache,
+    )
+
+
+def astream_cold_email(client, profile: dict, prompt: str, use_cache=True):
+    """Async variant of stream_cold_email using client.aio"""
+    return astream_structured(
+        client,
+        COLD_EMAIL_INSTRUCTION,
+        cold_email_contents(profile, prompt),
+        ColdEmail,
+        use_cache=use_cache,
+    )
+
+
+def astream_improve_email(
+    client, email_content: str, recipient_name: str, prompt: str, use_cache=True
+):
+    """Async variant of stream_improve_email using client.aio"""
+    return astream_structured(
+        client,
+        IMPROVE_EMAIL_INSTRUCTION,
+        improve_email_contents(email_content, recipient_name, prompt),
+        ImprovedEmail,
+        use_cache=use_cache,
+    )
@@ -0,0 +1,266 @@
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+import hashlib
+import json
+import os
+import logging
+import threading
+import time
+
+if TYPE_CHECKING:
+    from google.genai import types
+
+logger = logging.getLogger(__name__)
+
+
+def instruction_version(instruction: str) -> str:
+    """Short content hash identifying a system instruction revision"""
+    return hashlib.sha256(instruction.encode("utf-8")).hexdigest()[:12]
+
+
+def generation_key(model: str, instruction: str, contents: list) -> str:
+    """
+    Cache key for one generation
+
+    `contents` already carries the profile fields and the user prompt, so
+    hashing it together with the model and instruction version identifies
+    the request completely.
+    """
+    payload = json.dumps(
+        [model, instruction_version(instruction), contents], sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _usage_tokens(usage) -> tuple:
+    if usage is None:
+        return 0, 0
+    return (usage.prompt_token_count or 0, usage.candidates_token_count or 0)
+
+
+class GenerationCache:
+    """
+    Size-bounded LRU of raw model responses with a TTL
+
+    Each entry remembers the tokens its original generation used so hits can
+    be reported as input/output tokens saved.
+    """
+
+    def __init__(self, max_entries: int = None, ttl: int = None):
+        self.max_entries = max_entries or int(
+            os.getenv("GENERATION_CACHE_SIZE", "1024")
+        )
+        self.ttl = ttl or int(os.getenv("GENERATION_CACHE_TTL", str(24 * 3600)))
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "saved_input_tokens": 0,
+            "saved_output_tokens": 0,
+        }
+
+    def get(self, key: str) -> str:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry["expires_at"] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            self._counters["saved_input_tokens"] += entry["input_tokens"]
+            self._counters["saved_output_tokens"] += entry["output_tokens"]
+            return entry["text"]
+
+    def set(self, key: str, text: str, usage=None):
+        input_tokens, output_tokens = _usage_tokens(usage)
+        with self._lock:
+            self._entries[key] = {
+                "text": text,
+                "expires_at": time.time() + self.ttl,
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+class PromptPrefixCache:
+    """
+    Model-side cached contexts for the static system instructions
+
+    A cached content resource is created once per instruction revision and
+    renewed before it expires. Only one caller creates it at a time; the
+    others keep using the previous prefix, or send the instruction inline,
+    meanwhile. If the API refuses (for example because the instruction is
+    below the model's minimum cacheable size) the instruction is sent inline
+    and creation is not retried for `retry_after` seconds.
+    """
+
+    def __init__(self, ttl: int = None, retry_after: int = None):
+        self.enabled = os.getenv("GEMINI_PREFIX_CACHE", "on").lower() != "off"
+        self.ttl = ttl or int(os.getenv("GEMINI_PREFIX_CACHE_TTL", "3600"))
+        self.retry_after = retry_after or int(
+            os.getenv("GEMINI_PREFIX_CACHE_RETRY", "1800")
+        )
+        self._names = {}
+        self._disabled_until = {}
+        self._creating = set()
+        self._lock = threading.Lock()
+        self._counters = {"created": 0, "failures": 0, "cached_prefix_tokens": 0}
+
+    def _cached_name(self, key: str):
+        """
+        Return (name, needs_create) for a cache key
+
+        needs_create is True for one caller at a time, which must call
+        _created once its attempt finishes.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._names.get(key)
+            # Renew a little before the server-side TTL runs out
+            if entry and entry[1] - 60 > now:
+                return entry[0], False
+            if key in self._creating:
+                return (entry[0] if entry and entry[1] > now else None), False
+            if self._disabled_until.get(key, 0) > now:
+                return None, False
+            self._creating.add(key)
+            return None, True
+
+    def _created(self, key: str):
+        with self._lock:
+            self._creating.discard(key)
+
+    def _store(self, key: str, name: str):
+        with self._lock:
+            self._names[key] = (name, time.time() + self.ttl)
+            self._counters["created"] += 1
+
+    def _fail(self, key: str, error: Exception):
+        logger.warning(f"Prompt prefix caching unavailable, sending inline: {error}")
+        with self._lock:
+            self._names.pop(key, None)
+            self._disabled_until[key] = time.time() + self.retry_after
+            self._counters["failures"] += 1
+
+    def _create_config(self, instruction: str):
+        from google.genai import types
+
+        return types.CreateCachedContentConfig(
+            system_instruction=instruction,
+            ttl=f"{self.ttl}s",
+            display_name=f"workly-{instruction_version(instruction)}",
+        )
+
+    def config_for(
+        self, client, model: str, instruction: str, **config
+    ) -> "types.GenerateContentConfig":
+        """GenerateContentConfig that uses the cached prefix when available"""
+        from google.genai import types
+
+        if not self.enabled:
+            return types.GenerateContentConfig(system_instruction=instruction, **config)
+
+        key = f"{model}:{instruction_version(instruction)}"
+        name, needs_create = self._cached_name(key)
+        if needs_create:
+            try:
+                cache = client.caches.create(
+                    model=model, config=self._create_config(instruction)
+                )
+                self._store(key, cache.name)
+                name = cache.name
+            except Exception as e:
+                self._fail(key, e)
+            finally:
+                self._created(key)
+
+        if name:
+            return types.GenerateContentConfig(cached_content=name, **config)
+        return types.GenerateContentConfig(system_instruction=instruction, **config)
+
+    async def aconfig_for(
+        self, client, model: str, instruction: str, **config
+    ) -> "types.GenerateContentConfig":
+        """Async variant of config_for using client.aio"""
+        from google.genai import types
+
+        if not self.enabled:
+            return types.GenerateContentConfig(system_instruction=instruction, **config)
+
+        key = f"{model}:{instruction_version(instruction)}"
+        name, needs_create = self._cached_name(key)
+        if needs_create:
+            try:
+                cache = await client.aio.caches.create(
+                    model=model, config=self._create_config(instruction)
+                )
+                self._store(key, cache.name)
+                name = cache.name
+            except Exception as e:
+                self._fail(key, e)
+            finally:
+                self._created(key)
+
+        if name:
+            return types.GenerateContentConfig(cached_content=name, **config)
+        return types.GenerateContentConfig(system_instruction=instruction, **config)
+
+    def invalidate(self, model: str, instruction: str, error: Exception):
+        """Forget a cached prefix the API no longer accepts so it is recreated"""
+        logger.warning(f"Dropping stale prompt prefix cache: {error}")
+        with self._lock:
+            self._names.pop(f"{model}:{instruction_version(instruction)}", None)
+
+    def record_usage(self, usage):
+        if usage is not None and usage.cached_content_token_count:
+            with self._lock:
+                self._counters[
+                    "cached_prefix_tokens"
+                ] += usage.cached_content_token_count
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["enabled"] = self.enabled
+            stats["active"] = len(self._names)
+        return stats
+
+
+_generation_cache = None
+_prefix_cache = None
+_singleton_lock = threading.Lock()
+
+
+def get_generation_cache() -> GenerationCache:
+    """Return the process-wide generation cache, creating it on first use"""
+    global _generation_cache
+    with _singleton_lock:
+        if _generation_cache is None:
+            _generation_cache = GenerationCache()
+        return _generation_cache
+
+
+def get_prefix_cache() -> PromptPrefixCache:
+    """Return the process-wide prompt prefix cache, creating it on first use"""
+    global _prefix_cache
+    with _singleton_lock:
+        if _prefix_cache is None:
+            _prefix_cache = PromptPrefixCache()
+        return _prefix_cache
@@ -0,0 +1,88 @@
+import httpx
+
+
+def _timeouts(requested: dict, settings) -> dict:
+    # Callers may pass no timeout at all (google-genai sends None unless
+    # HttpOptions.timeout is set); fill unset phases from the upstream's
+    # settings and never wait longer than its connect timeout for a socket
+    timeouts = dict(requested or {})
+    for phase in ("read", "write", "pool"):
+        if timeouts.get(phase) is None:
+            timeouts[phase] = settings.read_timeout
+    connect = timeouts.get("connect")
+    timeouts["connect"] = (
+        settings.connect_timeout
+        if connect is None
+        else min(connect, settings.connect_timeout)
+    )
+    return timeouts
+
+
+class PooledTransport(httpx.HTTPTransport):
+    """Keep-alive transport that applies upstream timeouts and counts reuse"""
+
+    def __init__(self, settings, stats):
+        super().__init__(limits=_limits(settings))
+        self._settings = settings
+        self._stats = stats
+
+    def _trace(self, event: str, info: dict):
+        self._stats.trace(event)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        self._stats.request()
+        request.extensions["timeout"] = _timeouts(
+            request.extensions.get("timeout"), self._settings
+        )
+        request.extensions["trace"] = self._trace
+        return super().handle_request(request)
+
+
+class AsyncPooledTransport(httpx.AsyncHTTPTransport):
+    """asyncio variant of PooledTransport"""
+
+    def __init__(self, settings, stats):
+        super().__init__(limits=_limits(settings))
+        self._settings = settings
+        self._stats = stats
+
+    async def _trace(self, event: str, info: dict):
+        self._stats.trace(event)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self._stats.request()
+        request.extensions["timeout"] = _timeouts(
+            request.extensions.get("timeout"), self._settings
+        )
+        request.extensions["trace"] = self._trace
+        return await super().handle_async_request(request)
+
+
+def _limits(settings) -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.pool_size,
+        max_keepalive_connections=settings.pool_size,
+        keepalive_expiry=settings.keepalive,
+    )
+
+
+def _timeout(settings) -> httpx.Timeout:
+    return httpx.Timeout(settings.read_timeout, connect=settings.connect_timeout)
+
+
+def pooled_client(settings, stats, headers=None) -> httpx.Client:
+    return httpx.Client(
+        headers=headers,
+        follow_redirects=True,
+        timeout=_timeout(settings),
+        transport=PooledTransport(settings, stats),
+    )
+
+
+def pooled_async_client(settings, stats, headers=None) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        headers=headers,
+        follow_redirects=True,
+        timeout=_timeout(settings),
+        transport=AsyncPooledTransport(settings, stats),
+    )
@@ -0,0 +1,216 @@
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import os
+import logging
+import threading
+import time
+import traceback
+import uuid
+
+from API_services import tracing
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("done", "failed")
+
+
+class Job:
+    """A unit of background work and the stage transitions it went through"""
+
+    def __init__(self, kind: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = "queued"
+        self.stage = "queued"
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.events = [{"stage": "queued", "at": self.created_at}]
+        self.changed = threading.Condition()
+        # (loop, future) pairs of coroutines in await_event, woken by advance
+        self._async_waiters = []
+        # Trace of the request that submitted the job; the job's spans join it
+        self.trace_id = tracing.current_trace_id()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+    def advance(self, stage: str, status: str = "running"):
+        with self.changed:
+            self.stage = stage
+            self.status = status
+            self.updated_at = time.time()
+            self.events.append({"stage": stage, "at": self.updated_at})
+            self.changed.notify_all()
+            waiters, self._async_waiters = self._async_waiters, []
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, future)
+            except RuntimeError:
+                # The loop was closed; its waiter is gone with it
+                pass
+
+    def wait_for_event(self, seen: int, timeout: float) -> list:
+        """Block until there are more than `seen` events or `timeout` elapses"""
+        with self.changed:
+            self.changed.wait_for(lambda: len(self.events) > seen, timeout=timeout)
+            return self.events[seen:]
+
+    async def await_event(self, seen: int, timeout: float) -> list:
+        """Async variant of wait_for_event; waits on the loop, not in a thread"""
+        loop = asyncio.get_running_loop()
+        waiter = (loop, loop.create_future())
+        with self.changed:
+            if len(self.events) > seen:
+                return self.events[seen:]
+            self._async_waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter[1], timeout)
+        except asyncio.TimeoutError:
+            pass
+        with self.changed:
+            if waiter in self._async_waiters:
+                self._async_waiters.remove(waiter)
+            return self.events[seen:]
+
+    def to_dict(self) -> dict:
+        job = {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "stage": self.stage,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "trace_id": self.trace_id,
+        }
+        if self.status == "done":
+            job["result"] = self.result
+        if self.status == "failed":
+            job["error"] = self.error
+        return job
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class JobQueue:
+    """
+    In-process job queue backed by bounded worker pools
+
+    Campaign jobs run for hours, so they get their own pool of
+    `campaign_workers` and never hold up interactive jobs. Finished jobs are
+    kept for `retention` seconds so clients can collect their results, then
+    dropped.
+    """
+
+    def __init__(
+        self, workers: int = None, retention: int = None, campaign_workers: int = None
+    ):
+        self.workers = workers or int(os.getenv("JOB_WORKERS", "4"))
+        self.campaign_workers = campaign_workers or int(
+            os.getenv("CAMPAIGN_WORKERS", "2")
+        )
+        self.retention = retention or int(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="job-worker"
+        )
+        self._campaign_executor = ThreadPoolExecutor(
+            max_workers=self.campaign_workers, thread_name_prefix="campaign-worker"
+        )
+        self._jobs = {}
+        # submit_unique key -> the last job submitted under it
+        self._keys = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, func, *args, **kwargs) -> Job:
+        """
+        Enqueue `func(*args, report=..., **kwargs)` and return its job
+
+        `func` receives a `report(stage)` callback to publish stage changes.
+        """
+        job = Job(kind)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        self._start(job, func, args, kwargs)
+        return job
+
+    def submit_unique(self, key: str, kind: str, func, *args, **kwargs) -> Job:
+        """
+        Like submit, unless the last job submitted under `key` is unfinished
+
+        Returns:
+            Job: The new job, or None if one for `key` is queued or running
+        """
+        with self._lock:
+            active = self._keys.get(key)
+            if active is not None and not active.finished:
+                return None
+            self._prune()
+            job = Job(kind)
+            self._jobs[job.id] = job
+            self._keys[key] = job
+        self._start(job, func, args, kwargs)
+        return job
+
+    def _start(self, job: Job, func, args, kwargs):
+        executor = self._campaign_executor if job.kind == "campaign" else self._executor
+        executor.submit(tracing.bind_context(self._run), job, func, args, kwargs)
+        logger.info(f"Queued {job.kind} job {job.id}")
+
+    def _run(self, job: Job, func, args, kwargs):
+        try:
+            with tracing.span("job", job_id=job.id, kind=job.kind):
+                result = func(*args, report=job.advance, **kwargs)
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {str(e)}")
+            logger.error(traceback.format_exc())
+            job.error = str(e)
+            job.advance("failed", status="failed")
+            return
+        job.result = result
+        job.advance("done", status="done")
+
+    def get(self, job_id: str) -> Job:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _prune(self):
+        cutoff = time.time() - self.retention
+        expired = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.finished and job.updated_at < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+        for key in [key for key, job in self._keys.items() if job.id in expired]:
+            del self._keys[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            statuses = {}
+            for job in self._jobs.values():
+                statuses[job.status] = statuses.get(job.status, 0) + 1
+        return {
+            "workers": self.workers,
+            "campaign_workers": self.campaign_workers,
+            "jobs": statuses,
+        }
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """Return the process-wide job queue, creating it on first use"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+        return _queue
@@ -0,0 +1,154 @@
+from API_services.lead_store import get_lead_store
+from scipy import sparse
+import numpy as np
+import re
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Industry tags are short and precise, so they count more than description words
+INDUSTRY_WEIGHT = 2.0
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> list:
+    return _TOKEN.findall((text or "").lower())
+
+
+def _company_terms(row: dict) -> dict:
+    terms = {}
+    for token in tokenize(row["description"]):
+        terms[token] = terms.get(token, 0.0) + 1.0
+    for tag in row["industry"]:
+        # "generative-ai" contributes both the whole tag and its words
+        for token in {tag, *tokenize(tag)}:
+            terms[token] = terms.get(token, 0.0) + INDUSTRY_WEIGHT
+    return terms
+
+
+class LeadScorer:
+    """
+    TF-IDF relevance of yc.csv companies to a campaign prompt
+
+    The company x term matrix is built once (and again only when the lead
+    store reloads) as a row-normalized CSR matrix, so scoring a prompt is a
+    single sparse matrix-vector product followed by a partial sort.
+    """
+
+    def __init__(self, store=None):
+        self.store = store or get_lead_store()
+        self._lock = threading.Lock()
+        self._version = None
+        self._rows = []
+        self._vocabulary = {}
+        self._idf = np.zeros(0)
+        self._matrix = sparse.csr_matrix((0, 0))
+
+    def _build(self, rows: list):
+        vocabulary = {}
+        data, indices, indptr = [], [], [0]
+        for row in rows:
+            for term, count in _company_terms(row).items():
+                indices.append(vocabulary.setdefault(term, len(vocabulary)))
+                # Sublinear tf keeps long descriptions from dominating
+                data.append(1.0 + np.log(count))
+            indptr.append(len(indices))
+
+        matrix = sparse.csr_matrix(
+            (np.array(data), np.array(indices, dtype=np.int32), np.array(indptr)),
+            shape=(len(rows), len(vocabulary)),
+        )
+        document_frequency = np.bincount(matrix.indices, minlength=len(vocabulary))
+        idf = np.log((1 + len(rows)) / (1 + document_frequency)) + 1.0
+
+        matrix = matrix.multiply(idf).tocsr()
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        matrix = sparse.diags(1.0 / norms) @ matrix
+
+        self._rows = rows
+        self._vocabulary = vocabulary
+        self._idf = idf
+        self._matrix = matrix.tocsr()
+        logger.info(
+            f"Built relevance matrix: {matrix.shape[0]} companies x {matrix.shape[1]} terms"
+        )
+
+    def _ensure_fresh(self):
+        version, rows = self.store.companies()
+        with self._lock:
+            if version != self._version:
+                self._build(rows)
+                self._version = version
+            return self._rows, self._vocabulary, self._idf, self._matrix
+
+    def _query_vector(self, prompt: str, vocabulary: dict, idf) -> np.ndarray:
+        vector = np.zeros(len(vocabulary))
+        for token in tokenize(prompt):
+            column = vocabulary.get(token)
+            if column is not None:
+                vector[column] += 1.0
+        nonzero = vector > 0
+        vector[nonzero] = (1.0 + np.log(vector[nonzero])) * idf[nonzero]
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def top_k(self, prompt: str, k: int = 25) -> list:
+        """
+        Companies most relevant to a campaign prompt
+
+        Args:
+            prompt (str): Campaign prompt
+            k (int): Number of companies to return
+
+        Returns:
+            list: Company rows with a "score", best first; companies sharing
+                no terms with the prompt are left out
+        """
+        rows, vocabulary, idf, matrix = self._ensure_fresh()
+        if not rows or k <= 0:
+            return []
+
+        scores = matrix @ self._query_vector(prompt, vocabulary, idf)
+        k = min(k, len(rows))
+        candidates = np.argpartition(-scores, k - 1)[:k]
+        ranked = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [
+            {**rows[i], "score": round(float(scores[i]), 4)}
+            for i in ranked
+            if scores[i] > 0
+        ]
+
+    def top_leads(self, prompt: str, k: int = 25) -> list:
+        """Founder leads of the top-k companies, in relevance order"""
+        seen = set()
+        leads = []
+        for company in self.top_k(prompt, k):
+            for founder in company["founders"]:
+                if founder["linkedin_url"] in seen:
+                    continue
+                seen.add(founder["linkedin_url"])
+                leads.append(
+                    {
+                        "company": company["company"],
+                        "website": company["website"],
+                        "founder_name": founder["name"],
+                        "linkedin_url": founder["linkedin_url"],
+                    }
+                )
+        return leads
+
+
+_scorer = None
+_scorer_lock = threading.Lock()
+
+
+def get_lead_scorer() -> LeadScorer:
+    """Return the process-wide lead scorer, creating it on first use"""
+    global _scorer
+    with _scorer_lock:
+        if _scorer is None:
+            _scorer = LeadScorer()
+        return _scorer
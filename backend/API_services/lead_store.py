@@ -0,0 +1,240 @@
+from API_services.leads import DEFAULT_LEADS_CSV, founder_leads, iter_companies
+from bisect import bisect_left, bisect_right
+import os
+import logging
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+MAX_PAGE_SIZE = 200
+_MISSING = {"", "n/a", "na", "none", "-"}
+
+
+def normalize_tag(value: str) -> str:
+    """Industry tags are compared lowercase and hyphenated: "Gen AI" -> "gen-ai" """
+    return "-".join((value or "").lower().split())
+
+
+def normalize_location(value: str) -> str:
+    return " ".join((value or "").lower().split())
+
+
+def _location_keys(value: str) -> set:
+    """
+    Index keys for a Location cell
+
+    The full value and each part split on "," or "/" are indexed, so
+    "San Francisco, CA, US / Remote" matches "san francisco", "us" and
+    "remote".
+    """
+    location = normalize_location(value)
+    if location in _MISSING:
+        return set()
+    keys = {location}
+    keys.update(part.strip() for part in re.split(r"[,/]", location) if part.strip())
+    return keys
+
+
+def _to_int(value: str):
+    try:
+        return int(str(value).strip())
+    except (TypeError, ValueError):
+        return None
+
+
+class _SortedColumn:
+    """Parallel sorted value/row-id arrays answering range queries with bisect"""
+
+    def __init__(self, pairs: list):
+        pairs.sort()
+        self.values = [value for value, _ in pairs]
+        self.row_ids = [row_id for _, row_id in pairs]
+
+    def between(self, low=None, high=None) -> set:
+        start = 0 if low is None else bisect_left(self.values, low)
+        end = len(self.values) if high is None else bisect_right(self.values, high)
+        return set(self.row_ids[start:end])
+
+
+class _LeadIndex:
+    """One CSV version's rows and indexes, replaced whole on reload"""
+
+    __slots__ = ("mtime", "rows", "industry", "location", "founded", "team_size")
+
+    def __init__(
+        self,
+        mtime=None,
+        rows: list = None,
+        industry: dict = None,
+        location: dict = None,
+        founded: _SortedColumn = None,
+        team_size: _SortedColumn = None,
+    ):
+        self.mtime = mtime
+        self.rows = rows or []
+        self.industry = industry or {}
+        self.location = location or {}
+        self.founded = founded or _SortedColumn([])
+        self.team_size = team_size or _SortedColumn([])
+
+
+class LeadStore:
+    """
+    Indexed, read-only view of the leads CSV
+
+    Rows are loaded once into a list; Industry tags and Location get inverted
+    indexes (key -> set of row ids) and Founded / Team Size are kept as sorted
+    arrays. Filters are intersected smallest-first. The file's mtime is checked
+    on every query and the indexes are rebuilt when it changes.
+    """
+
+    def __init__(self, csv_path: str = None):
+        self.csv_path = csv_path or DEFAULT_LEADS_CSV
+        self._lock = threading.Lock()
+        self._index = _LeadIndex()
+        self._counters = {"loads": 0, "queries": 0}
+
+    def _build(self, mtime) -> _LeadIndex:
+        rows, industry, location = [], {}, {}
+        founded, team_size = [], []
+
+        for row_id, company in enumerate(iter_companies(self.csv_path)):
+            tags = sorted(
+                {
+                    normalize_tag(tag)
+                    for tag in company.get("Industry", "").split(",")
+                    if tag.strip()
+                }
+            )
+            row = {
+                "company": company.get("Company Name", "").strip(),
+                "website": company.get("Website", "").strip(),
+                "description": company.get("Company Description", "").strip(),
+                "industry": tags,
+                "location": company.get("Location", "").strip(),
+                "founded": _to_int(company.get("Founded")),
+                "team_size": _to_int(company.get("Team Size")),
+                "founders": [
+                    {"name": lead["founder_name"], "linkedin_url": lead["linkedin_url"]}
+                    for lead in founder_leads(company)
+                ],
+            }
+            rows.append(row)
+
+            for tag in tags:
+                industry.setdefault(tag, set()).add(row_id)
+            for key in _location_keys(row["location"]):
+                location.setdefault(key, set()).add(row_id)
+            if row["founded"] is not None:
+                founded.append((row["founded"], row_id))
+            if row["team_size"] is not None:
+                team_size.append((row["team_size"], row_id))
+
+        return _LeadIndex(
+            mtime,
+            rows,
+            industry,
+            location,
+            _SortedColumn(founded),
+            _SortedColumn(team_size),
+        )
+
+    def _ensure_fresh(self) -> _LeadIndex:
+        """The current index, rebuilt first if the CSV changed"""
+        mtime = os.stat(self.csv_path).st_mtime_ns
+        index = self._index
+        if mtime == index.mtime:
+            return index
+        with self._lock:
+            if mtime == self._index.mtime:
+                return self._index
+            index = self._build(mtime)
+            # One assignment, so readers see either version whole
+            self._index = index
+            self._counters["loads"] += 1
+            logger.info(f"Loaded {len(index.rows)} companies from {self.csv_path}")
+            return index
+
+    def query(
+        self,
+        industries: list = None,
+        location: str = None,
+        founded_min: int = None,
+        founded_max: int = None,
+        team_size_min: int = None,
+        team_size_max: int = None,
+        offset: int = 0,
+        limit: int = 50,
+    ) -> dict:
+        """
+        Companies matching every given filter, in CSV order
+
+        Args:
+            industries (list): Tags the company must all have
+            location (str): City, region or full Location value
+            founded_min (int): Earliest founding year, inclusive
+            founded_max (int): Latest founding year, inclusive
+            team_size_min (int): Smallest team, inclusive
+            team_size_max (int): Largest team, inclusive
+            offset (int): Matches to skip
+            limit (int): Page size, capped at MAX_PAGE_SIZE
+
+        Returns:
+            dict: total, offset, limit and the page of results
+        """
+        index = self._ensure_fresh()
+        rows = index.rows
+        self._counters["queries"] += 1
+
+        candidates = []
+        for tag in industries or []:
+            candidates.append(index.industry.get(normalize_tag(tag), set()))
+        if location:
+            candidates.append(index.location.get(normalize_location(location), set()))
+        if founded_min is not None or founded_max is not None:
+            candidates.append(index.founded.between(founded_min, founded_max))
+        if team_size_min is not None or team_size_max is not None:
+            candidates.append(index.team_size.between(team_size_min, team_size_max))
+
+        if candidates:
+            candidates.sort(key=len)
+            matches = sorted(set.intersection(*candidates))
+        else:
+            matches = range(len(rows))
+
+        limit = max(0, min(limit, MAX_PAGE_SIZE))
+        offset = max(0, offset)
+        return {
+            "total": len(matches),
+            "offset": offset,
+            "limit": limit,
+            "results": [rows[row_id] for row_id in matches[offset : offset + limit]],
+        }
+
+    def companies(self) -> tuple:
+        """Return (version, rows) for consumers that build derived indexes"""
+        index = self._ensure_fresh()
+        return index.mtime, index.rows
+
+    def stats(self) -> dict:
+        index = self._index
+        return {
+            **self._counters,
+            "companies": len(index.rows),
+            "industries": len(index.industry),
+            "locations": len(index.location),
+        }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_lead_store() -> LeadStore:
+    """Return the process-wide lead store, creating it on first use"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = LeadStore()
+        return _store
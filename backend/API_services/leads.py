@@ -0,0 +1,74 @@
+from API_services.linkedin_urls import canonical_profile_url, profile_slug
+import csv
+import os
+
+# The YC founder dataset shipped at the repository root
+DEFAULT_LEADS_CSV = os.getenv(
+    "LEADS_CSV_PATH",
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+        "yc.csv",
+    ),
+)
+
+
+def _split(cell: str) -> list:
+    return [part.strip() for part in (cell or "").split(",") if part.strip()]
+
+
+def iter_companies(csv_path: str = None):
+    """
+    Stream company rows from the leads CSV
+
+    Header names are stripped, so the "Founder LinkedIn " column (with its
+    trailing space) is available as "Founder LinkedIn".
+
+    Yields:
+        dict: One row per company
+    """
+    with open(csv_path or DEFAULT_LEADS_CSV, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = [name.strip() for name in next(reader)]
+        for values in reader:
+            if not any(value.strip() for value in values):
+                continue
+            yield dict(zip(header, values))
+
+
+def founder_leads(company: dict) -> list:
+    """
+    Split a company row into one lead per founder profile URL
+
+    Founder names are paired with URLs by position; when the counts differ
+    the name is left empty rather than guessed.
+    """
+    urls = [url for url in _split(company.get("Founder LinkedIn")) if profile_slug(url)]
+    names = _split(company.get("Founder Name"))
+    if len(names) != len(urls):
+        names = [""] * len(urls)
+
+    return [
+        {
+            "company": company.get("Company Name", "").strip(),
+            "website": company.get("Website", "").strip(),
+            "founder_name": name,
+            "linkedin_url": canonical_profile_url(url),
+        }
+        for name, url in zip(names, urls)
+    ]
+
+
+def iter_leads(csv_path: str = None):
+    """
+    Stream deduplicated founder leads from the leads CSV
+
+    Yields:
+        dict: company, website, founder_name and canonical linkedin_url
+    """
+    seen = set()
+    for company in iter_companies(csv_path):
+        for lead in founder_leads(company):
+            if lead["linkedin_url"] in seen:
+                continue
+            seen.add(lead["linkedin_url"])
+            yield lead
@@ -1,7 +1,4 @@
-from linkedin_scraper import Person, actions
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service as ChromeService
+from linkedin_scraper import Person
 from selenium.common.exceptions import (
     TimeoutException,
     WebDriverException,
@@ -9,36 +6,66 @@ from selenium.common.exceptions import (
     ElementNotInteractableException,
     StaleElementReferenceException,
 )
-from webdriver_manager.chrome import ChromeDriverManager
-import json
 import os
 import logging
-from dotenv import load_dotenv
-import tempfile
 import time
 import random
 import traceback
 
+from API_services.config import load_config
+from API_services.driver_pool import DriverPoolError, get_driver_pool
+from API_services.page_readiness import JitterPolicy, ReadinessEngine
+from API_services.linkedin_urls import canonical_profile_url
+from API_services.metrics import observe_stage
+from API_services.profile_cache import get_profile_cache
+from API_services.profile_parser import parse_profile
+from API_services.profile_snapshots import save_snapshot
+from API_services.rate_limiter import get_limiter
+from API_services.single_flight import SingleFlight
+from API_services import tracing
+from API_services.tracing import url_hash
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
 )
 logger = logging.getLogger(__name__)
 
-# Load environment variables from the correct path
-current_dir = os.path.dirname(os.path.abspath(__file__))
-env_path = os.path.join(os.path.dirname(current_dir), ".env")
-load_dotenv(env_path)
+load_config()
+
+_selenium_flight = SingleFlight("selenium")
+
+# "snapshot" (default) parses the rendered page source offline; "person"
+# walks the live DOM with linkedin_scraper's Person
+EXTRACTOR = os.getenv("LINKEDIN_EXTRACTOR", "snapshot").lower()
+# Sections whose /details/ page is also captured for complete lists,
+# e.g. "experience,education,skills"; each costs one more page load
+EXPAND_SECTIONS = [
+    section.strip()
+    for section in os.getenv("LINKEDIN_EXPAND_SECTIONS", "").split(",")
+    if section.strip()
+]
 
 
-def retry_with_backoff(func, retries=5, backoff_in_seconds=1):
+def retry_with_backoff(func, retries=5, backoff_in_seconds=1, max_elapsed=None):
     """
     Retry a function with exponential backoff
+
+    If `max_elapsed` is set, no retry is attempted once the next backoff
+    would push the total time past that many seconds.
     """
+    started = time.monotonic()
+    # The enclosing stage span records how many retries it took
+    parent = tracing.current_span()
     x = 0
     while True:
+        if parent is not None:
+            parent.set_attribute("retries", x)
         try:
-            return func()
+            with tracing.span(
+                "retry_attempt", function=getattr(func, "__name__", None), attempt=x
+            ):
+                return func()
         except (
             TimeoutException,
             WebDriverException,
@@ -49,48 +76,43 @@ def retry_with_backoff(func, retries=5, backoff_in_seconds=1):
             if x == retries:
                 raise e
             sleep = backoff_in_seconds * 2**x + random.uniform(0, 1)
+            if (
+                max_elapsed is not None
+                and time.monotonic() - started + sleep > max_elapsed
+            ):
+                raise e
             logger.info(f"Retrying after {sleep:.2f} seconds due to error: {str(e)}")
             time.sleep(sleep)
             x += 1
 
 
-def scrape_linkedin_profile(url: str) -> dict:
+def scrape_linkedin_profile(url: str, refresh=False) -> dict:
     """
     Scrapes a LinkedIn profile using the linkedin_scraper library
 
     Args:
         url (str): The LinkedIn profile URL to scrape
+        refresh (bool | str): Bypass the profile cache and scrape again, or
+            "stale" to re-scrape only a snapshot past its staleness window
 
     Returns:
         dict: Dictionary with scraped profile information
     """
-    logger.info(f"Starting to scrape LinkedIn profile: {url}")
+    cache = get_profile_cache()
+    cached = cache.lookup("selenium", url, refresh)
+    if cached is not None:
+        logger.info(f"Serving LinkedIn profile from cache: {url}")
+        return cached
 
-    # Set up Chrome options for headless browsing
-    chrome_options = Options()
-    chrome_options.add_argument("--headless=new")
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-    chrome_options.add_argument("--disable-gpu")
-    chrome_options.add_argument("--window-size=1920,1080")
-    chrome_options.add_argument("--disable-extensions")
-    chrome_options.add_argument("--disable-notifications")
-    chrome_options.add_argument(
-        "--disable-blink-features=AutomationControlled"
-    )  # Helps avoid detection
-
-    # Rotate user agents to avoid detection
-    user_agents = [
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36 Edg/119.0.0.0",
-        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.0 Safari/605.1.15",
-    ]
-    chrome_options.add_argument(f"--user-agent={random.choice(user_agents)}")
-
-    # Create a temporary directory for Chrome user data
-    user_data_dir = tempfile.mkdtemp()
-    chrome_options.add_argument(f"--user-data-dir={user_data_dir}")
+    # Concurrent requests for the same profile share a single browser scrape
+    canonical_url = canonical_profile_url(url)
+    return _selenium_flight.do(
+        canonical_url, lambda: _scrape_profile(canonical_url, cache)
+    )
+
+
+def _scrape_profile(url: str, cache) -> dict:
+    logger.info(f"Starting to scrape LinkedIn profile: {url}")
 
     # Get LinkedIn credentials from environment variables
     email = os.getenv("LINKEDIN_EMAIL")
@@ -98,150 +120,210 @@ def scrape_linkedin_profile(url: str) -> dict:
 
     if not email or not password:
         logger.error("LinkedIn credentials not found in environment variables")
-        return {"error": "LinkedIn credentials not found in environment variables"}
+        return {
+            "error": "LinkedIn credentials not found in environment variables",
+            "status": 401,
+        }
 
-    driver = None
     try:
-        # Initialize the Chrome driver with webdriver-manager
-        logger.info("Initializing Chrome driver")
-        service = ChromeService(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=service, options=chrome_options)
-
-        # Set page load timeout
-        driver.set_page_load_timeout(45)
-
-        # Login to LinkedIn
-        try:
-            logger.info("Logging in to LinkedIn")
+        # Lease a warm, already logged-in driver from the pool
+        with tracing.span("selenium_scrape", url_hash=url_hash(url)) as span:
+            with get_driver_pool().acquire() as lease:
+                profile_data = _scrape_with_driver(lease, url)
+                span.set_attributes(**lease.footprint())
+            span.set_attribute("error", profile_data.get("error"))
+
+        if "error" not in profile_data:
+            cache.set("selenium", url, profile_data)
+        return profile_data
 
-            def login_action():
-                actions.login(driver, email, password)
+    except DriverPoolError as pool_error:
+        logger.error(f"Login error: {str(pool_error)}")
+        return {"error": f"Failed to login to LinkedIn: {str(pool_error)}"}
 
-            # Use retry mechanism for login
-            retry_with_backoff(login_action)
+    except Exception as e:
+        # Log the full stack trace for debugging
+        logger.error(f"Error scraping LinkedIn profile: {str(e)}")
+        logger.error(traceback.format_exc())
+        return {"error": f"Error scraping LinkedIn profile: {str(e)}"}
 
-            # Wait for login to complete and cookies to be set
-            time.sleep(random.uniform(5, 8))
 
-            # Check if login was successful by looking for specific elements
-            if "Sign In" in driver.title or "Login" in driver.title:
-                logger.error("Login failed - still on login page")
-                return {"error": "Failed to login to LinkedIn: Still on login page"}
+def _scrape_with_driver(lease, url: str) -> dict:
+    """
+    Scrape a profile with a leased driver
 
-        except Exception as login_error:
-            logger.error(f"Login error: {str(login_error)}")
-            return {"error": f"Failed to login to LinkedIn: {str(login_error)}"}
+    Error results mark the lease failed so the pool recycles the session.
+    """
+    driver = lease.driver
+    readiness = ReadinessEngine(driver)
+    jitter = JitterPolicy.from_env()
 
-        # Navigate to the profile URL with retry
-        try:
-            logger.info(f"Navigating to profile URL: {url}")
+    # Navigate to the profile URL with retry
+    try:
+        logger.info(f"Navigating to profile URL: {url}")
 
-            def navigate_action():
+        def navigate_action():
+            with get_limiter("linkedin").slot():
                 driver.get(url)
 
-            # Use retry mechanism for navigation
-            retry_with_backoff(navigate_action)
+        with observe_stage("selenium_navigate", url_hash=url_hash(url)):
+            # Use retry mechanism for navigation, bounded by the stage budget
+            retry_with_backoff(
+                navigate_action, retries=2, max_elapsed=readiness.budgets["top_card"]
+            )
+
+            # Wait for the profile header instead of a fixed sleep
+            readiness.wait_for_top_card()
+    except Exception as nav_error:
+        lease.failed = True
+        logger.error(f"Navigation error: {str(nav_error)}")
+        return {"error": f"Failed to navigate to profile URL: {str(nav_error)}"}
+
+    # LinkedIn answers bursts with a checkpoint or authwall instead of a 429
+    if "/checkpoint/" in driver.current_url or "/authwall" in driver.current_url:
+        lease.failed = True
+        get_limiter("linkedin").throttle()
+        logger.error("LinkedIn bot detection triggered")
+        return {
+            "error": "LinkedIn rate limited this session, try again later",
+            "status": 429,
+        }
 
-            # Wait for the page to load (dynamic wait)
-            time.sleep(random.uniform(3, 5))  # Random sleep to avoid detection
-        except Exception as nav_error:
-            logger.error(f"Navigation error: {str(nav_error)}")
-            return {"error": f"Failed to navigate to profile URL: {str(nav_error)}"}
+    # Handle common HTTP errors
+    if "Page not found" in driver.title or "404" in driver.title:
+        logger.error("404 Not Found - LinkedIn profile doesn't exist")
+        return {"error": "LinkedIn profile not found (404)", "status": 404}
 
-        # Handle common HTTP errors
-        if "Page not found" in driver.title or "404" in driver.title:
-            logger.error("404 Not Found - LinkedIn profile doesn't exist")
-            return {"error": "LinkedIn profile not found (404)"}
+    if "Access Denied" in driver.title or "403" in driver.title:
+        logger.error("403 Forbidden - Access denied by LinkedIn")
+        return {
+            "error": "Access to this LinkedIn profile is forbidden (403)",
+            "status": 403,
+        }
 
-        if "Access Denied" in driver.title or "403" in driver.title:
-            logger.error("403 Forbidden - Access denied by LinkedIn")
-            return {"error": "Access to this LinkedIn profile is forbidden (403)"}
+    try:
+        with tracing.span("selenium_hydration"):
+            readiness.wait_for_hydration()
+        with tracing.span("selenium_jitter"):
+            jitter.pause()
+
+        if EXTRACTOR == "person":
+            profile_data = _extract_with_person(driver, url)
+        else:
+            profile_data = _extract_from_snapshot(driver, url, readiness)
+    except Exception as scrape_error:
+        logger.error(f"Scraping error: {str(scrape_error)}")
+        logger.error(traceback.format_exc())
+        lease.failed = True
+        return {"error": f"Failed to scrape profile: {str(scrape_error)}"}
 
-        # Create Person object and scrape profile
-        try:
-            logger.info("Scraping profile data")
-            person = Person(url, driver=driver, scrape=False)
-            person.scrape(close_on_complete=False)
-
-            # Check if meaningful data was extracted
-            if not hasattr(person, "name") or not person.name:
-                logger.warning(
-                    "No name found in the scraped profile - possible scraping failure"
-                )
+    logger.info(f"Stage wait times for {url}: {readiness.timings}")
+    return profile_data
 
-                # Try a fallback method to extract at least basic information
-                try:
-                    fallback_data = {
-                        "name": driver.find_element_by_css_selector(
-                            ".text-heading-xlarge"
-                        ).text,
-                        "about": "",
-                        "experiences": [],
-                        "educations": [],
-                        "skills": [],
-                        "accomplishments": [],
-                    }
-                    logger.info("Using fallback data extraction method")
-                    return fallback_data
-                except Exception as fallback_error:
-                    logger.error(f"Fallback extraction failed: {str(fallback_error)}")
-            else:
-                logger.info(f"Successfully scraped profile for: {person.name}")
-
-        except Exception as scrape_error:
-            logger.error(f"Scraping error: {str(scrape_error)}")
-            logger.error(traceback.format_exc())
-            return {"error": f"Failed to scrape profile: {str(scrape_error)}"}
-
-        # Extract profile information with defensive coding
-        profile_data = {
-            "name": person.name if hasattr(person, "name") else "Unknown",
-            "about": person.about if hasattr(person, "about") else "",
-            "experiences": [
-                {
-                    "title": getattr(exp, "position_title", ""),
-                    "company": getattr(exp, "institution_name", ""),
-                    "date_range": getattr(exp, "date_range", ""),
-                    "description": getattr(exp, "description", ""),
-                }
-                for exp in (
-                    person.experiences if hasattr(person, "experiences") else []
-                )
-            ],
-            "educations": [
-                {
-                    "institution": getattr(edu, "institution_name", ""),
-                    "degree": getattr(edu, "degree", ""),
-                    "date_range": getattr(edu, "date_range", ""),
-                }
-                for edu in (person.educations if hasattr(person, "educations") else [])
-            ],
-            "skills": [
-                interest
-                for interest in (
-                    person.interests if hasattr(person, "interests") else []
-                )
-            ],
-            "accomplishments": (
-                person.accomplishments if hasattr(person, "accomplishments") else []
-            ),
-        }
 
-        # Close the driver
-        logger.info("Closing Chrome driver")
-        driver.quit()
+def _capture_pages(driver, url: str, readiness) -> dict:
+    """
+    Page source of the profile and of each LINKEDIN_EXPAND_SECTIONS page
 
-        return profile_data
+    The profile page only lists the first few entries of each section;
+    /details/<section>/ has all of them. A section that fails to load is
+    left out and the profile page's shorter list is used instead.
+    """
+    pages = {"main": driver.page_source}
+    for section in EXPAND_SECTIONS:
+        details_url = f"{url.rstrip('/')}/details/{section}/"
 
-    except Exception as e:
-        # Log the full stack trace for debugging
-        logger.error(f"Error scraping LinkedIn profile: {str(e)}")
-        logger.error(traceback.format_exc())
+        def navigate_action():
+            with get_limiter("linkedin").slot():
+                driver.get(details_url)
 
-        # Make sure to close the driver in case of exception
-        if driver:
-            try:
-                driver.quit()
-            except:
-                pass
-        return {"error": f"Error scraping LinkedIn profile: {str(e)}"}
+        try:
+            with observe_stage("selenium_expand", section=section):
+                retry_with_backoff(
+                    navigate_action,
+                    retries=1,
+                    max_elapsed=readiness.budgets["details"],
+                )
+                if readiness.wait_for_details():
+                    pages[section] = driver.page_source
+        except Exception as e:
+            logger.warning(f"Could not expand {section} for {url}: {str(e)}")
+    return pages
+
+
+def _extract_from_snapshot(driver, url: str, readiness) -> dict:
+    """Capture the rendered pages once and parse them without the browser"""
+    pages = _capture_pages(driver, url, readiness)
+    details = {name: page for name, page in pages.items() if name != "main"}
+    with observe_stage("snapshot_parse") as span:
+        profile_data = parse_profile(pages["main"], details)
+        span.set_attributes(
+            html_bytes=sum(len(page) for page in pages.values()),
+            experiences=len(profile_data["experiences"]),
+            educations=len(profile_data["educations"]),
+            skills=len(profile_data["skills"]),
+        )
+    save_snapshot(url, pages, profile_data)
+
+    if not profile_data["name"]:
+        logger.warning("No name found in the profile page snapshot")
+        return {"error": "Could not find a profile on the page", "status": 404}
+    logger.info(f"Successfully scraped profile for: {profile_data['name']}")
+    return profile_data
+
+
+def _extract_with_person(driver, url: str) -> dict:
+    """Walk the live DOM with linkedin_scraper's Person (LINKEDIN_EXTRACTOR=person)"""
+    logger.info("Scraping profile data")
+    # The profile is already loaded, so skip Person's own driver.get
+    person = Person(url, driver=driver, get=False, scrape=False)
+    with observe_stage("person_scrape") as span:
+        person.scrape(close_on_complete=False)
+        span.set_attributes(
+            experiences=len(getattr(person, "experiences", None) or []),
+            educations=len(getattr(person, "educations", None) or []),
+        )
+
+    # Check if meaningful data was extracted
+    if not hasattr(person, "name") or not person.name:
+        logger.warning(
+            "No name found in the scraped profile - possible scraping failure"
+        )
+        # Parse what the browser rendered instead
+        fallback_data = parse_profile(driver.page_source)
+        if fallback_data["name"]:
+            logger.info("Using page source fallback extraction")
+            return fallback_data
+        logger.error("Fallback extraction found no profile either")
+    else:
+        logger.info(f"Successfully scraped profile for: {person.name}")
+
+    # Extract profile information with defensive coding
+    return {
+        "name": person.name if hasattr(person, "name") else "Unknown",
+        "about": person.about if hasattr(person, "about") else "",
+        "experiences": [
+            {
+                "title": getattr(exp, "position_title", ""),
+                "company": getattr(exp, "institution_name", ""),
+                "date_range": getattr(exp, "date_range", ""),
+                "description": getattr(exp, "description", ""),
+            }
+            for exp in (person.experiences if hasattr(person, "experiences") else [])
+        ],
+        "educations": [
+            {
+                "institution": getattr(edu, "institution_name", ""),
+                "degree": getattr(edu, "degree", ""),
+                "date_range": getattr(edu, "date_range", ""),
+            }
+            for edu in (person.educations if hasattr(person, "educations") else [])
+        ],
+        "skills": [
+            interest
+            for interest in (person.interests if hasattr(person, "interests") else [])
+        ],
+        "accomplishments": (
+            person.accomplishments if hasattr(person, "accomplishments") else []
+        ),
+    }
@@ -0,0 +1,76 @@
+from urllib.parse import unquote, urlparse
+
+# Path segments that identify a member profile, e.g. /in/<slug> or /pub/<slug>
+PROFILE_PATH_PREFIXES = ("in", "pub")
+
+
+def is_linkedin_host(host: str) -> bool:
+    """True for linkedin.com and its www/mobile/country subdomains"""
+    host = host.lower().split(":")[0]
+    return host == "linkedin.com" or host.endswith(".linkedin.com")
+
+
+def profile_slug(url: str) -> str:
+    """
+    Extract the member slug from a LinkedIn profile URL
+
+    Handles missing schemes, www/mobile/country subdomains, trailing path
+    segments such as /details/experience, query strings, fragments,
+    percent-encoding and letter case.
+
+    Args:
+        url (str): Profile URL as supplied by the client
+
+    Returns:
+        str: Lowercase slug, or None if the URL is not a LinkedIn profile
+    """
+    parts = _profile_parts(url)
+    if parts is None:
+        return None
+    return parts[1]
+
+
+def _profile_parts(url: str) -> list:
+    """Lowercased, decoded path segments of a LinkedIn profile URL, or None"""
+    url = (url or "").strip()
+    if not url:
+        return None
+    if "://" not in url:
+        url = f"https://{url.lstrip('/')}"
+
+    parsed = urlparse(url)
+    if not is_linkedin_host(parsed.netloc):
+        return None
+
+    parts = [unquote(part).strip().lower() for part in parsed.path.split("/")]
+    parts = [part for part in parts if part]
+    if len(parts) >= 2 and parts[0] in PROFILE_PATH_PREFIXES:
+        return parts
+    return None
+
+
+def canonical_profile_url(url: str) -> str:
+    """
+    Normalise a LinkedIn profile URL so variants share one key
+
+    Args:
+        url (str): Profile URL as supplied by the client
+
+    Only /in/<slug> URLs collapse to the slug. Legacy /pub/<name>/<id>...
+    URLs need their id segments to resolve to the right member, so they keep
+    their full path.
+
+    Args:
+        url (str): Profile URL as supplied by the client
+
+    Returns:
+        str: https://www.linkedin.com/in/<slug> for /in profile URLs,
+        https://www.linkedin.com/pub/<path> for /pub URLs, otherwise the
+        stripped input without a trailing slash
+    """
+    parts = _profile_parts(url)
+    if parts is None:
+        return (url or "").strip().rstrip("/")
+    if parts[0] == "in":
+        return f"https://www.linkedin.com/in/{parts[1]}"
+    return "https://www.linkedin.com/" + "/".join(parts)
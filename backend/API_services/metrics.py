@@ -0,0 +1,253 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+import threading
+import time
+
+from API_services import tracing
+
+# Seconds; covers a cached hit (~1 ms) up to a slow actor run or browser scrape
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _header(self) -> list:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> list:
+        with self._lock:
+            values = sorted(self._values.items())
+        return self._header() + [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *label_values, amount: float = 1):
+        self.inc(*label_values, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: tuple = (),
+        buckets: tuple = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *label_values):
+        # Per-bucket (non-cumulative) counts; cumulated when rendered
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(label_values)
+            if series is None:
+                series = self._values[label_values] = [
+                    [0] * (len(self.buckets) + 1),
+                    0.0,
+                ]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> list:
+        with self._lock:
+            values = sorted(
+                (key, (list(counts), total))
+                for key, (counts, total) in self._values.items()
+            )
+        lines = self._header()
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _format_labels(
+                    self.labels, key, f'le="{_format_value(float(bound))}"'
+                )
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+REQUESTS = Counter(
+    "workly_http_requests_total",
+    "HTTP requests by route, method and status",
+    ("route", "method", "status"),
+)
+REQUEST_LATENCY = Histogram(
+    "workly_http_request_duration_seconds",
+    "HTTP request latency by route",
+    ("route", "method"),
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "workly_http_requests_in_flight",
+    "HTTP requests currently being served",
+    ("route",),
+)
+STAGE_LATENCY = Histogram(
+    "workly_stage_duration_seconds",
+    "Latency of pipeline stages (apify_call, dataset_fetch, selenium_login, "
+    "selenium_navigate, person_scrape, snapshot_parse, gemini_generate, "
+    "json_extract)",
+    ("stage",),
+)
+STAGES_IN_FLIGHT = Gauge(
+    "workly_stages_in_flight",
+    "Pipeline stages currently running",
+    ("stage",),
+)
+UPSTREAM_ERRORS = Counter(
+    "workly_upstream_errors_total",
+    "Exceptions raised by upstream calls, by stage and exception type",
+    ("stage", "exception"),
+)
+UPSTREAM_HTTP_REQUESTS = Counter(
+    "workly_upstream_http_requests_total",
+    "HTTP requests sent to upstream APIs through the shared client pools",
+    ("upstream",),
+)
+UPSTREAM_CONNECTIONS = Counter(
+    "workly_upstream_connections_opened_total",
+    "New upstream connections; requests minus connections were served on a "
+    "reused keep-alive connection",
+    ("upstream",),
+)
+BROWSER_TRANSFER_BYTES = Histogram(
+    "workly_browser_page_transfer_bytes",
+    "Bytes the browser transferred to load one profile, by browser mode",
+    ("mode",),
+    buckets=(1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6, 1e7, 2.5e7, 5e7),
+)
+BROWSER_RSS_MB = Histogram(
+    "workly_browser_rss_megabytes",
+    "Resident memory of chromedriver and Chrome after a scrape, by mode",
+    ("mode",),
+    buckets=(100, 200, 300, 400, 600, 800, 1000, 1500, 2000, 3000),
+)
+BROWSER_PROFILE_DIR_BYTES = Histogram(
+    "workly_browser_profile_dir_bytes",
+    "Size of a Chrome user-data directory when it was deleted",
+    buckets=(1e6, 5e6, 1e7, 2.5e7, 5e7, 1e8, 2.5e8, 5e8, 1e9),
+)
+BROWSER_PROFILE_DIRS_REMOVED = Counter(
+    "workly_browser_profile_dirs_removed_total",
+    "Chrome user-data directories deleted, by reason (closed, swept, exit)",
+    ("reason",),
+)
+
+_registry = [
+    REQUESTS,
+    REQUEST_LATENCY,
+    REQUESTS_IN_FLIGHT,
+    STAGE_LATENCY,
+    STAGES_IN_FLIGHT,
+    UPSTREAM_ERRORS,
+    UPSTREAM_HTTP_REQUESTS,
+    UPSTREAM_CONNECTIONS,
+    BROWSER_TRANSFER_BYTES,
+    BROWSER_RSS_MB,
+    BROWSER_PROFILE_DIR_BYTES,
+    BROWSER_PROFILE_DIRS_REMOVED,
+]
+
+
+@contextmanager
+def observe_stage(stage: str, **attributes):
+    """
+    Time a pipeline stage and count the exceptions it raises
+
+    The stage is also recorded as a trace span carrying `attributes`; the
+    span is yielded so callers can add result sizes. Works around awaits as
+    well, so the same block is used in the async code paths.
+    """
+    STAGES_IN_FLIGHT.inc(stage)
+    started = time.perf_counter()
+    try:
+        with tracing.span(stage, **attributes) as span:
+            yield span
+    except Exception as e:
+        UPSTREAM_ERRORS.inc(stage, type(e).__name__)
+        raise
+    finally:
+        STAGE_LATENCY.observe(time.perf_counter() - started, stage)
+        STAGES_IN_FLIGHT.dec(stage)
+
+
+def request_started(route: str) -> float:
+    REQUESTS_IN_FLIGHT.inc(route)
+    return time.perf_counter()
+
+
+def request_finished(route: str, method: str, status: int, started: float):
+    REQUESTS_IN_FLIGHT.dec(route)
+    REQUESTS.inc(route, method, str(status))
+    REQUEST_LATENCY.observe(time.perf_counter() - started, route, method)
+
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,173 @@
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+import os
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+# Per-stage timeout budgets in seconds
+DEFAULT_STAGE_BUDGETS = {
+    "login": 15.0,
+    "top_card": 20.0,
+    "hydrate": 8.0,
+    "details": 10.0,
+}
+
+# Elements that only render once the profile header is on the page
+TOP_CARD_SELECTORS = [
+    ".text-heading-xlarge",
+    ".pv-top-card",
+    "main section h1",
+]
+
+# Path fragments LinkedIn keeps the browser on until login has finished
+LOGIN_PATHS = ["/login", "/checkpoint/lg/login-submit", "/uas/login"]
+
+
+class JitterPolicy:
+    """
+    Optional randomised pause between browser actions
+
+    Pacing is purely anti-detection; it is no longer used to wait for the
+    page. Disabled policies never sleep.
+    """
+
+    def __init__(self, min_seconds: float = 0.0, max_seconds: float = 0.0):
+        self.min_seconds = min_seconds
+        self.max_seconds = max(max_seconds, min_seconds)
+
+    @classmethod
+    def from_env(cls) -> "JitterPolicy":
+        """
+        Build a policy from LINKEDIN_JITTER, e.g. "0.5,1.5" (seconds)
+
+        An unset or "off" value disables jitter.
+        """
+        value = os.getenv("LINKEDIN_JITTER", "").strip()
+        if not value or value.lower() == "off":
+            return cls()
+        low, _, high = value.partition(",")
+        return cls(float(low), float(high or low))
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_seconds > 0
+
+    def pause(self) -> float:
+        if not self.enabled:
+            return 0.0
+        delay = random.uniform(self.min_seconds, self.max_seconds)
+        time.sleep(delay)
+        return delay
+
+
+class ReadinessEngine:
+    """
+    Waits on concrete page conditions instead of fixed sleeps
+
+    Every stage gets its own timeout budget and the time actually spent
+    waiting is recorded in `timings`, keyed by stage name.
+    """
+
+    def __init__(self, driver, budgets: dict = None, poll_frequency: float = 0.2):
+        self.driver = driver
+        self.budgets = dict(DEFAULT_STAGE_BUDGETS)
+        if budgets:
+            self.budgets.update(budgets)
+        self.poll_frequency = poll_frequency
+        self.timings = {}
+
+    def wait(self, stage: str, condition, timeout: float = None) -> bool:
+        """
+        Block until `condition(driver)` is truthy or the stage budget runs out
+
+        Args:
+            stage (str): Stage name used for the budget and the timing record
+            condition (callable): Predicate taking the driver
+            timeout (float): Overrides the stage budget
+
+        Returns:
+            bool: True if the condition was met, False on timeout
+        """
+        budget = timeout if timeout is not None else self.budgets.get(stage, 10.0)
+        started = time.monotonic()
+        try:
+            WebDriverWait(
+                self.driver,
+                budget,
+                poll_frequency=self.poll_frequency,
+                ignored_exceptions=(WebDriverException,),
+            ).until(condition)
+            ready = True
+        except TimeoutException:
+            ready = False
+        elapsed = time.monotonic() - started
+        self.timings[stage] = round(elapsed, 3)
+
+        if ready:
+            logger.info(f"Stage '{stage}' ready after {elapsed:.2f}s")
+        else:
+            logger.warning(f"Stage '{stage}' not ready within {budget:.1f}s budget")
+        return ready
+
+    def wait_for_login(self) -> bool:
+        """Login redirect has finished and the global navigation is rendered"""
+
+        def logged_in(driver):
+            url = driver.current_url or ""
+            if any(path in url for path in LOGIN_PATHS):
+                return False
+            return bool(driver.find_elements(By.CLASS_NAME, "global-nav__primary-link"))
+
+        return self.wait("login", logged_in)
+
+    def wait_for_top_card(self) -> bool:
+        """Profile header (name/headline) is present in the DOM"""
+
+        def top_card_present(driver):
+            # Error pages have no top card, so stop waiting as soon as they load
+            title = driver.title or ""
+            if "Page not found" in title or "404" in title or "403" in title:
+                return True
+            return any(
+                driver.find_elements(By.CSS_SELECTOR, selector)
+                for selector in TOP_CARD_SELECTORS
+            )
+
+        return self.wait("top_card", top_card_present)
+
+    def wait_for_hydration(self) -> bool:
+        """
+        Lazy profile sections have rendered
+
+        Scrolls to the bottom to trigger lazy loading, then waits until the
+        number of sections under <main> stops changing between two polls.
+        """
+        last_count = [-1]
+
+        def sections_stable(driver):
+            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+            if driver.execute_script("return document.readyState;") != "complete":
+                return False
+            count = len(driver.find_elements(By.CSS_SELECTOR, "main section"))
+            stable = count > 0 and count == last_count[0]
+            last_count[0] = count
+            return stable
+
+        ready = self.wait("hydrate", sections_stable)
+        self.driver.execute_script("window.scrollTo(0, 0);")
+        return ready
+
+    def wait_for_details(self) -> bool:
+        """A /details/<section>/ page has rendered its list entries"""
+
+        def entries_present(driver):
+            title = driver.title or ""
+            if "Page not found" in title or "404" in title:
+                return True
+            return bool(driver.find_elements(By.CSS_SELECTOR, "main section li"))
+
+        return self.wait("details", entries_present)
@@ -0,0 +1,85 @@
+from API_services.email_generation import generate_cold_email
+from API_services.profile_sources import fetch_profile
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _no_report(stage: str):
+    pass
+
+
+class PipelineError(Exception):
+    """A pipeline step failed with a message meant for the client"""
+
+
+def cold_email_pipeline(
+    client,
+    url: str,
+    prompt: str,
+    refresh=False,
+    regenerate: bool = False,
+    report=_no_report,
+) -> dict:
+    """
+    Scrape a profile and write a cold email for it
+
+    The profile comes from the scraping facade, which prefers Apify and
+    fails over to Selenium when Apify's circuit is open.
+
+    Args:
+        client (genai.Client): Gemini client
+        url (str): LinkedIn profile URL
+        prompt (str): Campaign prompt
+        refresh (bool | str): Bypass the profile cache, or "stale" to
+            re-check only a snapshot past its staleness window
+        regenerate (bool): Bypass the generation cache
+        report (callable): Called with each stage name as the pipeline advances
+
+    Returns:
+        dict: The /scrape-linkedin response body
+
+    Raises:
+        PipelineError: If no profile source returned the profile
+    """
+    report("scraping")
+    result = fetch_profile(url, refresh=refresh)
+
+    # Generating from an error would bill Gemini for a generic email
+    if "error" in result:
+        raise PipelineError(result["error"])
+
+    email = result.get("email")
+
+    report("generating")
+    json_response = generate_cold_email(
+        client, result, prompt, use_cache=not regenerate
+    )
+
+    return {
+        "email": email,
+        "groq_response": json_response["email_output"],
+        "analysis_rationale": json_response["analysis_rationale"],
+    }
+
+
+def profile_pipeline(url: str, refresh=False, report=_no_report) -> dict:
+    """
+    Scrape a full profile with Selenium
+
+    Returns:
+        dict: The /scrape-linkedin-profile response body
+
+    Raises:
+        PipelineError: If the scraper returned an error
+    """
+    # Selenium and linkedin_scraper are only loaded once a full scrape is needed
+    from API_services.linkedin_scraper_service import scrape_linkedin_profile
+
+    report("scraping")
+    profile_data = scrape_linkedin_profile(url, refresh=refresh)
+
+    if isinstance(profile_data, dict) and "error" in profile_data:
+        raise PipelineError(profile_data["error"])
+
+    return profile_data
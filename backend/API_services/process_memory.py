@@ -0,0 +1,66 @@
+import os
+import signal
+
+
+def process_table() -> dict:
+    """pid -> (parent pid, RSS in MB) for every process, or {} without /proc"""
+    table = {}
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return table
+    page_mb = os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "rb") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # The command name may contain spaces, so split after its ")"
+        fields = stat[stat.rfind(b")") + 2 :].split()
+        table[int(entry)] = (int(fields[1]), int(fields[21]) * page_mb)
+    return table
+
+
+def process_tree(pid: int, table: dict) -> list:
+    """`pid` and all of its descendants (chromedriver, Chrome and renderers)"""
+    children = {}
+    for child, (parent, _) in table.items():
+        children.setdefault(parent, []).append(child)
+    tree, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        tree.append(current)
+        stack.extend(children.get(current, []))
+    return tree
+
+
+def tree_rss_mb(pid: int, table: dict = None) -> float:
+    """Resident memory of a process and its descendants, None if unknown"""
+    table = process_table() if table is None else table
+    if pid not in table:
+        return None
+    return round(sum(table[p][1] for p in process_tree(pid, table) if p in table), 1)
+
+
+def kill_tree(pid: int):
+    """SIGKILL a process and its descendants"""
+    # Children first so Chrome is not left running under init
+    for member in reversed(process_tree(pid, process_table())):
+        try:
+            os.kill(member, signal.SIGKILL)
+        except OSError:
+            pass
+
+
+def is_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Alive, but owned by another user
+        return True
+    return True
@@ -0,0 +1,357 @@
+from API_services.linkedin_urls import canonical_profile_url
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Per-source TTL (seconds) and on-disk row cap; oldest-accessed rows go first.
+# A refresh="stale" lookup re-checks snapshots last verified more than
+# stale_after seconds ago.
+DEFAULT_POLICIES = {
+    "apify": {
+        "ttl": int(os.getenv("PROFILE_CACHE_TTL_APIFY", str(7 * 24 * 3600))),
+        "max_entries": int(os.getenv("PROFILE_CACHE_MAX_APIFY", "5000")),
+        "stale_after": int(os.getenv("PROFILE_STALE_AFTER_APIFY", str(24 * 3600))),
+    },
+    "selenium": {
+        "ttl": int(os.getenv("PROFILE_CACHE_TTL_SELENIUM", str(3 * 24 * 3600))),
+        "max_entries": int(os.getenv("PROFILE_CACHE_MAX_SELENIUM", "2000")),
+        "stale_after": int(os.getenv("PROFILE_STALE_AFTER_SELENIUM", str(12 * 3600))),
+    },
+}
+
+# Columns added after the first release, migrated in place
+_SNAPSHOT_COLUMNS = {
+    "content_hash": "TEXT",
+    "changed_at": "REAL",
+    "verified_at": "REAL",
+}
+
+
+def profile_hash(value: dict) -> str:
+    """Content hash of a profile, independent of key order"""
+    canonical = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32]
+
+
+def refresh_mode(value):
+    """
+    Normalize a request's `refresh` field
+
+    Returns:
+        "stale" to re-check only snapshots past their staleness window,
+        otherwise a bool (True bypasses the cache entirely)
+    """
+    if isinstance(value, str) and value.strip().lower() == "stale":
+        return "stale"
+    return bool(value)
+
+
+class ProfileSnapshot:
+    """A cached profile with its content hash and verification times"""
+
+    def __init__(
+        self,
+        value: dict,
+        content_hash: str,
+        changed_at: float,
+        verified_at: float,
+        expires_at: float,
+    ):
+        self.value = value
+        self.content_hash = content_hash
+        self.changed_at = changed_at
+        self.verified_at = verified_at
+        self.expires_at = expires_at
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.content_hash}"'
+
+
+DEFAULT_DB_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    ".cache",
+    "profiles.sqlite3",
+)
+
+
+class ProfileCache:
+    """
+    Two-tier cache of scraped profiles keyed by (source, canonical URL)
+
+    A bounded in-process LRU sits in front of a SQLite table that survives
+    restarts. Each source has its own TTL and row cap.
+    """
+
+    def __init__(
+        self, db_path: str = None, memory_size: int = None, policies: dict = None
+    ):
+        self.db_path = db_path or os.getenv("PROFILE_CACHE_PATH", DEFAULT_DB_PATH)
+        self.memory_size = memory_size or int(
+            os.getenv("PROFILE_CACHE_MEMORY_SIZE", "256")
+        )
+        self.policies = policies or DEFAULT_POLICIES
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "evictions": 0,
+            "unchanged_refreshes": 0,
+            "changed_refreshes": 0,
+            "stale_rechecks": 0,
+        }
+
+        if self.db_path != ":memory:":
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS profiles (
+                source TEXT NOT NULL,
+                url TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                stored_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (source, url)
+            )
+            """)
+        existing = {row[1] for row in self._db.execute("PRAGMA table_info(profiles)")}
+        for column, kind in _SNAPSHOT_COLUMNS.items():
+            if column not in existing:
+                self._db.execute(f"ALTER TABLE profiles ADD COLUMN {column} {kind}")
+        self._db.commit()
+
+    def _ttl(self, source: str) -> int:
+        return self.policies.get(source, {}).get("ttl", 24 * 3600)
+
+    def _stale_after(self, source: str) -> int:
+        return self.policies.get(source, {}).get("stale_after", 24 * 3600)
+
+    def get(self, source: str, url: str):
+        """
+        Look up a cached profile
+
+        Returns:
+            dict: The cached profile, or None on a miss or expired entry
+        """
+        snapshot = self.snapshot(source, url)
+        return snapshot.value if snapshot is not None else None
+
+    def lookup(self, source: str, url: str, refresh=False):
+        """
+        Cached profile for a request's refresh mode (see refresh_mode)
+
+        Returns:
+            dict: The profile to serve, or None if it must be scraped
+        """
+        if refresh is True:
+            return None
+        snapshot = self.snapshot(source, url)
+        if snapshot is None:
+            return None
+        if refresh == "stale" and self.is_stale(source, snapshot):
+            with self._lock:
+                self._counters["stale_rechecks"] += 1
+            return None
+        return snapshot.value
+
+    def is_stale(self, source: str, snapshot: ProfileSnapshot) -> bool:
+        return time.time() - snapshot.verified_at > self._stale_after(source)
+
+    def etag_for(self, source: str, url: str, value: dict) -> str:
+        """
+        Content hash to use as the ETag for a profile being served
+
+        Reuses the stored hash when `value` is the cached snapshot itself, so
+        repeat requests do not re-serialize the profile to hash it.
+        """
+        snapshot = self.snapshot(source, url)
+        if snapshot is not None and snapshot.value is value:
+            return snapshot.content_hash
+        return profile_hash(value)
+
+    def snapshot(self, source: str, url: str) -> ProfileSnapshot:
+        """
+        Look up a cached profile with its snapshot metadata
+
+        Returns:
+            ProfileSnapshot: The snapshot, or None on a miss or expired entry
+        """
+        key = (source, canonical_profile_url(url))
+        now = time.time()
+
+        with self._lock:
+            snapshot = self._memory.get(key)
+            if snapshot is not None:
+                if snapshot.expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._counters["memory_hits"] += 1
+                    return snapshot
+                del self._memory[key]
+
+            row = self._db.execute(
+                """
+                SELECT payload, expires_at, content_hash, changed_at, verified_at,
+                    stored_at
+                FROM profiles WHERE source = ? AND url = ?
+                """,
+                key,
+            ).fetchone()
+            if row is None or row[1] <= now:
+                if row is not None:
+                    self._db.execute(
+                        "DELETE FROM profiles WHERE source = ? AND url = ?", key
+                    )
+                    self._db.commit()
+                self._counters["misses"] += 1
+                return None
+
+            self._db.execute(
+                "UPDATE profiles SET last_access = ? WHERE source = ? AND url = ?",
+                (now, *key),
+            )
+            self._db.commit()
+            payload, expires_at, content_hash, changed_at, verified_at, stored_at = row
+            value = json.loads(payload)
+            # Rows written before snapshots were tracked have no metadata yet
+            snapshot = ProfileSnapshot(
+                value,
+                content_hash or profile_hash(value),
+                changed_at or stored_at,
+                verified_at or stored_at,
+                expires_at,
+            )
+            self._remember(key, snapshot)
+            self._counters["disk_hits"] += 1
+            return snapshot
+
+    def set(self, source: str, url: str, value: dict) -> ProfileSnapshot:
+        """
+        Store a successfully scraped profile in both tiers
+
+        When the content hash matches the stored snapshot, the snapshot is
+        kept and only its verification time and expiry move forward.
+        """
+        key = (source, canonical_profile_url(url))
+        now = time.time()
+        expires_at = now + self._ttl(source)
+        content_hash = profile_hash(value)
+
+        with self._lock:
+            row = self._db.execute(
+                "SELECT content_hash, changed_at FROM profiles "
+                "WHERE source = ? AND url = ?",
+                key,
+            ).fetchone()
+            unchanged = row is not None and row[0] == content_hash
+            changed_at = (row[1] or now) if unchanged else now
+            snapshot = ProfileSnapshot(value, content_hash, changed_at, now, expires_at)
+            self._remember(key, snapshot)
+
+            if unchanged:
+                # Same content: keep the stored payload, just re-verify it
+                self._db.execute(
+                    """
+                    UPDATE profiles SET expires_at = ?, last_access = ?,
+                        verified_at = ?, changed_at = ?
+                    WHERE source = ? AND url = ?
+                    """,
+                    (expires_at, now, now, changed_at, *key),
+                )
+                self._counters["unchanged_refreshes"] += 1
+            else:
+                if row is not None:
+                    self._counters["changed_refreshes"] += 1
+                self._db.execute(
+                    """
+                    INSERT OR REPLACE INTO profiles (
+                        source, url, payload, stored_at, expires_at, last_access,
+                        content_hash, changed_at, verified_at
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (
+                        *key,
+                        json.dumps(value),
+                        now,
+                        expires_at,
+                        now,
+                        content_hash,
+                        changed_at,
+                        now,
+                    ),
+                )
+            self._evict_disk(source, now)
+            self._db.commit()
+            self._counters["writes"] += 1
+            return snapshot
+
+    def invalidate(self, source: str, url: str):
+        key = (source, canonical_profile_url(url))
+        with self._lock:
+            self._memory.pop(key, None)
+            self._db.execute("DELETE FROM profiles WHERE source = ? AND url = ?", key)
+            self._db.commit()
+
+    def _remember(self, key, snapshot: ProfileSnapshot):
+        self._memory[key] = snapshot
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def _evict_disk(self, source: str, now: float):
+        # Expired rows go first, then least recently accessed rows over the cap
+        cursor = self._db.execute(
+            "DELETE FROM profiles WHERE source = ? AND expires_at <= ?", (source, now)
+        )
+        evicted = cursor.rowcount
+        max_entries = self.policies.get(source, {}).get("max_entries")
+        if max_entries:
+            cursor = self._db.execute(
+                """
+                DELETE FROM profiles WHERE source = ? AND url IN (
+                    SELECT url FROM profiles WHERE source = ?
+                    ORDER BY last_access DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (source, source, max_entries),
+            )
+            evicted += cursor.rowcount
+        self._counters["evictions"] += max(evicted, 0)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["memory_entries"] = len(self._memory)
+            stats["disk_entries"] = self._db.execute(
+                "SELECT COUNT(*) FROM profiles"
+            ).fetchone()[0]
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        lookups = hits + stats["misses"]
+        stats["hit_rate"] = round(hits / lookups, 4) if lookups else 0.0
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_profile_cache() -> ProfileCache:
+    """Return the process-wide profile cache, creating it on first use"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ProfileCache()
+        return _cache
@@ -0,0 +1,295 @@
+from html.parser import HTMLParser
+import re
+
+# Elements whose content is never profile text; LinkedIn inlines large JSON
+# payloads in <code> blocks, so skipping them keeps parsing fast
+SKIP_TAGS = {"script", "style", "code", "template", "noscript", "svg"}
+
+VOID_TAGS = {
+    "area",
+    "base",
+    "br",
+    "col",
+    "embed",
+    "hr",
+    "img",
+    "input",
+    "link",
+    "meta",
+    "source",
+    "track",
+    "wbr",
+}
+
+# Anchor ids LinkedIn puts inside (or on) each profile card
+SECTION_IDS = {"about", "experience", "education", "skills"}
+
+# Containers holding the full text behind a "see more" toggle
+LONG_TEXT_CLASSES = ("inline-show-more-text", "pv-shared-text-with-see-more")
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class _Node:
+    __slots__ = ("tag", "attrs", "children")
+
+    def __init__(self, tag: str, attrs: list):
+        self.tag = tag
+        self.attrs = dict(attrs)
+        self.children = []
+
+    @property
+    def classes(self) -> set:
+        return set((self.attrs.get("class") or "").split())
+
+
+class _TreeBuilder(HTMLParser):
+    """Builds a minimal element tree, tolerating unclosed and stray tags"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = _Node("#document", [])
+        self._stack = [self.root]
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if self._skip:
+            self._skip += tag in SKIP_TAGS
+            return
+        if tag in SKIP_TAGS:
+            self._skip = 1
+            return
+        node = _Node(tag, attrs)
+        self._stack[-1].children.append(node)
+        if tag not in VOID_TAGS:
+            self._stack.append(node)
+
+    def handle_startendtag(self, tag, attrs):
+        if not self._skip:
+            self._stack[-1].children.append(_Node(tag, attrs))
+
+    def handle_endtag(self, tag):
+        if self._skip:
+            self._skip -= tag in SKIP_TAGS
+            return
+        # Close the nearest matching element and anything left open in it
+        for index in range(len(self._stack) - 1, 0, -1):
+            if self._stack[index].tag == tag:
+                del self._stack[index:]
+                return
+
+    def handle_data(self, data):
+        if not self._skip:
+            self._stack[-1].children.append(data)
+
+
+def _parse(page_source: str) -> _Node:
+    builder = _TreeBuilder()
+    builder.feed(page_source or "")
+    builder.close()
+    return builder.root
+
+
+def _find_all(node: _Node, match, stop=None) -> list:
+    """Descendants matching `match`, not descending into `stop` matches"""
+    found = []
+    stack = list(reversed([c for c in node.children if isinstance(c, _Node)]))
+    while stack:
+        current = stack.pop()
+        if match(current):
+            found.append(current)
+        if stop is not None and stop(current):
+            continue
+        stack.extend(reversed([c for c in current.children if isinstance(c, _Node)]))
+    return found
+
+
+def _first(node: _Node, match, stop=None) -> _Node:
+    found = _find_all(node, match, stop)
+    return found[0] if found else None
+
+
+def _has_class(*names):
+    return lambda node: any(name in node.classes for name in names)
+
+
+def _is_item(node: _Node) -> bool:
+    return node.tag == "li"
+
+
+def _text(node: _Node) -> str:
+    """Visible text, skipping the screen-reader copies LinkedIn duplicates"""
+    if node is None:
+        return ""
+    parts = []
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, str):
+            parts.append(current)
+        elif "visually-hidden" not in current.classes:
+            stack.extend(reversed(current.children))
+    return _WHITESPACE.sub(" ", " ".join(parts)).strip()
+
+
+def _first_part(text: str) -> str:
+    # "Acme · Full-time", "Jan 2020 - Present · 4 yrs"
+    return text.split(" · ")[0].strip()
+
+
+def _sections(root: _Node) -> dict:
+    """Profile cards keyed by their anchor id"""
+    sections = {}
+    for section in _find_all(root, lambda node: node.tag == "section"):
+        anchor = section.attrs.get("id")
+        if anchor not in SECTION_IDS:
+            marker = _first(section, lambda node: node.attrs.get("id") in SECTION_IDS)
+            anchor = marker.attrs["id"] if marker else None
+        if anchor and anchor not in sections:
+            sections[anchor] = section
+    return sections
+
+
+def _is_entry(node: _Node) -> bool:
+    # Entries carry a bold title; other list items hold descriptions,
+    # skills or media attached to the entry around them
+    return _is_item(node) and _first(node, _has_class("t-bold"), stop=_is_item)
+
+
+def _items(container: _Node) -> list:
+    """Outermost entries, looking through wrapper list items"""
+    if container is None:
+        return []
+    return _find_all(container, _is_entry, stop=_is_entry)
+
+
+def _own(item: _Node, class_name: str, exclude: str = None) -> _Node:
+    # First element with the class in this entry, ignoring nested entries
+    def match(node):
+        return class_name in node.classes and not (exclude and exclude in node.classes)
+
+    return _first(item, match, stop=_is_item)
+
+
+def _caption(item: _Node) -> str:
+    caption = _own(item, "pvs-entity__caption-wrapper") or _own(item, "t-black--light")
+    return _first_part(_text(caption))
+
+
+def _description(item: _Node) -> str:
+    return _text(_first(item, _has_class(*LONG_TEXT_CLASSES), stop=_is_entry))
+
+
+def _experiences(container: _Node) -> list:
+    experiences = []
+    for item in _items(container):
+        # Several roles at one company are nested entries under it
+        roles = _items(item)
+        if roles:
+            company = _text(_own(item, "t-bold"))
+            for role in roles:
+                experiences.append(
+                    {
+                        "title": _text(_own(role, "t-bold")),
+                        "company": company,
+                        "date_range": _caption(role),
+                        "description": _description(role),
+                    }
+                )
+            continue
+        experiences.append(
+            {
+                "title": _text(_own(item, "t-bold")),
+                "company": _first_part(
+                    _text(_own(item, "t-normal", exclude="t-black--light"))
+                ),
+                "date_range": _caption(item),
+                "description": _description(item),
+            }
+        )
+    return experiences
+
+
+def _educations(container: _Node) -> list:
+    return [
+        {
+            "institution": _text(_own(item, "t-bold")),
+            "degree": _text(_own(item, "t-normal", exclude="t-black--light")),
+            "date_range": _caption(item),
+        }
+        for item in _items(container)
+    ]
+
+
+def _skills(container: _Node) -> list:
+    names = (_text(_own(item, "t-bold")) for item in _items(container))
+    return list(dict.fromkeys(name for name in names if name))
+
+
+def _name(root: _Node) -> str:
+    heading = _first(root, _has_class("text-heading-xlarge")) or _first(
+        root, lambda node: node.tag == "h1"
+    )
+    if heading is not None:
+        return _text(heading)
+    title = _first(root, lambda node: node.tag == "title")
+    return _text(title).split(" | ")[0] if title is not None else ""
+
+
+def _about(section: _Node) -> str:
+    if section is None:
+        return ""
+    long_text = _first(section, _has_class(*LONG_TEXT_CLASSES))
+    if long_text is not None:
+        return _text(long_text)
+    spans = _find_all(section, lambda node: node.attrs.get("aria-hidden") == "true")
+    # The first span is the card heading when there is no text container
+    return _text(spans[-1]) if spans else ""
+
+
+def _details_list(page_source: str, section: str) -> _Node:
+    """The entry list on a /details/<section>/ page"""
+    root = _parse(page_source)
+    sections = _sections(root)
+    if section in sections:
+        return sections[section]
+    main = _first(root, lambda node: node.tag == "main") or root
+    for candidate in _find_all(main, lambda node: node.tag == "section"):
+        if _items(candidate):
+            return candidate
+    return main
+
+
+def parse_profile(page_source: str, details: dict = None) -> dict:
+    """
+    Extract a profile from rendered page source, without a browser
+
+    Args:
+        page_source (str): HTML of the profile page
+        details (dict): Section name ("experience", "education", "skills")
+            -> HTML of its /details/<section>/ page; these complete lists
+            replace the shortened ones on the profile page
+
+    Returns:
+        dict: name, about, experiences, educations, skills and
+        accomplishments, the same shape as the live-DOM scraper
+    """
+    root = _parse(page_source)
+    sections = _sections(root)
+    containers = {
+        name: sections.get(name) for name in ("experience", "education", "skills")
+    }
+    for name, source in (details or {}).items():
+        if name in containers and source:
+            container = _details_list(source, name)
+            if _items(container):
+                containers[name] = container
+
+    return {
+        "name": _name(root),
+        "about": _about(sections.get("about")),
+        "experiences": _experiences(containers["experience"]),
+        "educations": _educations(containers["education"]),
+        "skills": _skills(containers["skills"]),
+        "accomplishments": [],
+    }
@@ -0,0 +1,180 @@
+from API_services.profile_parser import parse_profile
+from API_services.tracing import url_hash
+import gzip
+import json
+import os
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Rendered pages captured by the Selenium scraper, kept so profiles can be
+# re-parsed without another browser visit and so parser changes can be
+# checked against real pages (see reparse_snapshots.py)
+SNAPSHOT_DIR = os.getenv(
+    "PROFILE_SNAPSHOT_DIR",
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        ".cache",
+        "snapshots",
+    ),
+)
+SNAPSHOTS_ENABLED = os.getenv("PROFILE_SNAPSHOTS", "on").lower() != "off"
+# Snapshots kept per profile, newest first
+SNAPSHOT_KEEP = int(os.getenv("PROFILE_SNAPSHOT_KEEP", "3"))
+# Limits across all profiles: total size and age, enforced by prune_snapshots
+SNAPSHOT_MAX_MB = float(os.getenv("PROFILE_SNAPSHOT_MAX_MB", "500"))
+SNAPSHOT_MAX_AGE_DAYS = float(os.getenv("PROFILE_SNAPSHOT_MAX_AGE_DAYS", "30"))
+# Seconds between the directory scans save_snapshot triggers
+SNAPSHOT_PRUNE_INTERVAL = float(os.getenv("PROFILE_SNAPSHOT_PRUNE_INTERVAL", "300"))
+
+_prune_lock = threading.Lock()
+_pruned_at = 0.0
+
+
+def _profile_dir(url: str) -> str:
+    return os.path.join(SNAPSHOT_DIR, url_hash(url))
+
+
+def save_snapshot(url: str, pages: dict, profile: dict) -> str:
+    """
+    Store the captured pages and the profile parsed from them
+
+    Failures are logged, never raised: a snapshot is a by-product of the
+    scrape and must not fail it.
+
+    Args:
+        url (str): Profile URL
+        pages (dict): "main" -> profile page HTML, plus any expanded
+            section -> its /details/ page HTML
+        profile (dict): What parse_profile returned for these pages
+
+    Returns:
+        str: Path of the snapshot, or None if it was not written
+    """
+    if not SNAPSHOTS_ENABLED:
+        return None
+    directory = _profile_dir(url)
+    path = os.path.join(directory, f"{time.time_ns()}.json.gz")
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with gzip.open(path, "wt", encoding="utf-8", compresslevel=6) as f:
+            json.dump(
+                {
+                    "url": url,
+                    "captured_at": time.time(),
+                    "pages": pages,
+                    "profile": profile,
+                },
+                f,
+            )
+        for stale in snapshot_paths(url)[SNAPSHOT_KEEP:]:
+            os.remove(stale)
+    except OSError as e:
+        logger.warning(f"Could not save profile snapshot for {url}: {str(e)}")
+        return None
+    _maybe_prune()
+    return path
+
+
+def _maybe_prune():
+    global _pruned_at
+    with _prune_lock:
+        if time.monotonic() - _pruned_at < SNAPSHOT_PRUNE_INTERVAL:
+            return
+        _pruned_at = time.monotonic()
+    prune_snapshots()
+
+
+def _captured_ns(path: str) -> int:
+    # Files are named <capture time in ns>.json.gz
+    try:
+        return int(os.path.basename(path).split(".", 1)[0])
+    except ValueError:
+        return 0
+
+
+def prune_snapshots(max_bytes: int = None, max_age: float = None) -> int:
+    """
+    Enforce the global snapshot limits
+
+    Snapshots older than `max_age` seconds go first, then the oldest ones
+    until the rest fit in `max_bytes`. Failures are logged, never raised.
+
+    Args:
+        max_bytes (int): Defaults to PROFILE_SNAPSHOT_MAX_MB
+        max_age (float): Defaults to PROFILE_SNAPSHOT_MAX_AGE_DAYS
+
+    Returns:
+        int: Number of snapshots removed
+    """
+    if max_bytes is None:
+        max_bytes = int(SNAPSHOT_MAX_MB * 1024 * 1024)
+    if max_age is None:
+        max_age = SNAPSHOT_MAX_AGE_DAYS * 24 * 3600
+
+    files = []
+    for path in snapshot_paths():
+        try:
+            files.append((_captured_ns(path), path, os.path.getsize(path)))
+        except OSError:
+            pass
+    files.sort()
+    cutoff_ns = (time.time() - max_age) * 1e9
+    total = sum(size for _, _, size in files)
+
+    removed = 0
+    for captured_ns, path, size in files:
+        if captured_ns >= cutoff_ns and total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError as e:
+            logger.warning(f"Could not remove profile snapshot {path}: {str(e)}")
+            continue
+        total -= size
+        removed += 1
+        try:
+            os.rmdir(os.path.dirname(path))
+        except OSError:
+            # Still holds newer snapshots of the profile
+            pass
+    if removed:
+        logger.info(f"Pruned {removed} profile snapshots")
+    return removed
+
+
+def load_snapshot(path: str) -> dict:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def snapshot_paths(url: str = None) -> list:
+    """Snapshot files for one profile, or for all, newest first"""
+    directories = (
+        [_profile_dir(url)]
+        if url
+        else [
+            os.path.join(SNAPSHOT_DIR, name)
+            for name in (
+                os.listdir(SNAPSHOT_DIR) if os.path.isdir(SNAPSHOT_DIR) else []
+            )
+        ]
+    )
+    paths = []
+    for directory in directories:
+        if os.path.isdir(directory):
+            paths.extend(
+                os.path.join(directory, name)
+                for name in os.listdir(directory)
+                if name.endswith(".json.gz")
+            )
+    return sorted(paths, key=os.path.basename, reverse=True)
+
+
+def reparse(snapshot: dict) -> dict:
+    """Run the current parser over a loaded snapshot"""
+    pages = dict(snapshot["pages"])
+    main = pages.pop("main", "")
+    return parse_profile(main, pages)
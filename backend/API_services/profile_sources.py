@@ -0,0 +1,268 @@
+from API_services.apify import APIFY_LinkedIn_WebScrape, APIFY_LinkedIn_WebScrape_Async
+from API_services.circuit_breaker import CircuitBreaker
+from API_services.linkedin_urls import canonical_profile_url
+from API_services.profile_cache import get_profile_cache
+from API_services import tracing
+from API_services.tracing import url_hash
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import asyncio
+import json
+import os
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+_breakers = {"apify": CircuitBreaker("apify"), "selenium": CircuitBreaker("selenium")}
+_hedge_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("SCRAPE_HEDGE_WORKERS", "16")),
+    thread_name_prefix="profile-hedge",
+)
+# Keep losing hedged tasks referenced until they finish
+_background_tasks = set()
+
+
+def selenium_profile_fields(profile_data: dict) -> dict:
+    """Map a Selenium profile onto the Apify fields used for generation"""
+    if "error" in profile_data:
+        return profile_data
+    experiences = profile_data.get("experiences") or []
+    headline = ""
+    if experiences:
+        current = experiences[0]
+        headline = " at ".join(
+            part for part in (current.get("title"), current.get("company")) if part
+        )
+    return {
+        "about": profile_data.get("about") or "",
+        "headline": headline,
+        "email": "",
+        "fullName": profile_data.get("name") or "",
+    }
+
+
+# The facade reads the profile caches itself, so sources always scrape
+# (refresh=True); they still write what they scrape back to the cache
+
+
+def _scrape_apify(url: str) -> dict:
+    return json.loads(APIFY_LinkedIn_WebScrape(url, refresh=True))
+
+
+def _scrape_selenium(url: str) -> dict:
+    from API_services.linkedin_scraper_service import scrape_linkedin_profile
+
+    return selenium_profile_fields(scrape_linkedin_profile(url, refresh=True))
+
+
+async def _ascrape_apify(url: str) -> dict:
+    return json.loads(await APIFY_LinkedIn_WebScrape_Async(url, refresh=True))
+
+
+async def _ascrape_selenium(url: str) -> dict:
+    return await asyncio.to_thread(_scrape_selenium, url)
+
+
+_SOURCES = {"apify": _scrape_apify, "selenium": _scrape_selenium}
+_ASYNC_SOURCES = {"apify": _ascrape_apify, "selenium": _ascrape_selenium}
+
+
+def source_order() -> list:
+    """
+    Configured sources, primary first
+
+    SCRAPE_SOURCES sets the order (default "apify,selenium"). Selenium is
+    only used when LinkedIn credentials are configured.
+    """
+    order = []
+    for name in os.getenv("SCRAPE_SOURCES", "apify,selenium").split(","):
+        name = name.strip()
+        if name not in _SOURCES or name in order:
+            continue
+        if name == "selenium" and not (
+            os.getenv("LINKEDIN_EMAIL") and os.getenv("LINKEDIN_PASSWORD")
+        ):
+            continue
+        order.append(name)
+    return order
+
+
+def _hedge_after() -> float:
+    value = os.getenv("SCRAPE_HEDGE_AFTER")
+    return float(value) if value else None
+
+
+def _cached_profile(url: str, refresh) -> dict:
+    cache = get_profile_cache()
+    canonical = canonical_profile_url(url)
+    for name in source_order():
+        cached = cache.lookup(name, canonical, refresh)
+        if cached is not None:
+            return cached if name == "apify" else selenium_profile_fields(cached)
+    return None
+
+
+def _upstream_failed(result: dict) -> bool:
+    """
+    Whether an error result says the source itself is unhealthy
+
+    Sources tag errors caused by the request (unknown profile, bad URL,
+    missing credentials) with a 4xx "status". Untagged errors come from
+    exceptions and timeouts; they count, as do 429 and 5xx answers.
+    """
+    if "error" not in result:
+        return False
+    status = result.get("status")
+    return status is None or status == 429 or status >= 500
+
+
+def _record(name: str, result: dict, started: float) -> dict:
+    # Client errors count as a healthy answer so a half-open trial resolves
+    _breakers[name].record(not _upstream_failed(result), time.monotonic() - started)
+    return result
+
+
+def _call(name: str, url: str) -> dict:
+    started = time.monotonic()
+    with tracing.span("profile_source", source=name, url_hash=url_hash(url)) as span:
+        try:
+            result = _SOURCES[name](url)
+        except Exception as e:
+            result = {"error": f"{name} scrape failed: {str(e)}"}
+        span.set_attribute("error", result.get("error"))
+    return _record(name, result, started)
+
+
+async def _acall(name: str, url: str) -> dict:
+    started = time.monotonic()
+    with tracing.span("profile_source", source=name, url_hash=url_hash(url)) as span:
+        try:
+            result = await _ASYNC_SOURCES[name](url)
+        except Exception as e:
+            result = {"error": f"{name} scrape failed: {str(e)}"}
+        span.set_attribute("error", result.get("error"))
+    return _record(name, result, started)
+
+
+def _failure(errors: list) -> dict:
+    if not errors:
+        return {"error": "All profile sources are unavailable (circuit open)"}
+    return {"error": "; ".join(errors)}
+
+
+def fetch_profile(url: str, refresh=False) -> dict:
+    """
+    Scrape a profile from the healthiest source
+
+    Sources are tried in order, skipping any whose circuit is open, and the
+    next one is used when a source fails. With SCRAPE_HEDGE_AFTER set, a
+    request to the next source is also started once the current one has
+    been running that long, and the first success wins.
+
+    Args:
+        url (str): LinkedIn profile URL
+        refresh (bool | str): Bypass the profile caches, or "stale" to
+            re-scrape only when the cached snapshot is past its window
+
+    Returns:
+        dict: about, headline, email and fullName, or an error
+    """
+    if refresh is not True:
+        cached = _cached_profile(url, refresh)
+        if cached is not None:
+            return cached
+
+    remaining = source_order()
+    errors = []
+    hedge_after = _hedge_after()
+
+    if hedge_after is None:
+        for name in remaining:
+            if not _breakers[name].allow():
+                continue
+            result = _call(name, url)
+            if "error" not in result:
+                return result
+            logger.warning(f"Profile source {name} failed, failing over")
+            errors.append(result["error"])
+        return _failure(errors)
+
+    pending = set()
+
+    def launch() -> bool:
+        while remaining:
+            name = remaining.pop(0)
+            if _breakers[name].allow():
+                pending.add(_hedge_pool.submit(tracing.bind_context(_call), name, url))
+                return True
+        return False
+
+    launch()
+    while pending:
+        done, pending = wait(
+            pending,
+            timeout=hedge_after if remaining else None,
+            return_when=FIRST_COMPLETED,
+        )
+        if not done:
+            logger.info(f"Hedging profile scrape after {hedge_after}s")
+            launch()
+            continue
+        for future in done:
+            result = future.result()
+            if "error" not in result:
+                return result
+            errors.append(result["error"])
+        if not pending:
+            launch()
+    return _failure(errors)
+
+
+async def afetch_profile(url: str, refresh=False) -> dict:
+    """asyncio variant of fetch_profile"""
+    if refresh is not True:
+        # Cache lookups can hit SQLite under a lock; run them off the loop
+        cached = await asyncio.to_thread(_cached_profile, url, refresh)
+        if cached is not None:
+            return cached
+
+    remaining = source_order()
+    errors = []
+    hedge_after = _hedge_after()
+    pending = set()
+
+    def launch() -> bool:
+        while remaining:
+            name = remaining.pop(0)
+            if _breakers[name].allow():
+                pending.add(asyncio.ensure_future(_acall(name, url)))
+                return True
+        return False
+
+    launch()
+    while pending:
+        done, pending = await asyncio.wait(
+            pending,
+            timeout=hedge_after if remaining and hedge_after is not None else None,
+            return_when=asyncio.FIRST_COMPLETED,
+        )
+        if not done:
+            logger.info(f"Hedging profile scrape after {hedge_after}s")
+            launch()
+            continue
+        for task in done:
+            result = task.result()
+            if "error" not in result:
+                for loser in pending:
+                    _background_tasks.add(loser)
+                    loser.add_done_callback(_background_tasks.discard)
+                return result
+            errors.append(result["error"])
+        if not pending:
+            launch()
+    return _failure(errors)
+
+
+def breaker_states() -> dict:
+    """Circuit state and call statistics per profile source"""
+    return {name: breaker.stats() for name, breaker in _breakers.items()}
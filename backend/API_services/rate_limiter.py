@@ -0,0 +1,395 @@
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+import contextvars
+import asyncio
+import os
+import logging
+import threading
+import time
+
+from API_services import tracing
+
+logger = logging.getLogger(__name__)
+
+# (rps, concurrency) per upstream, overridable with RATE_LIMIT_<NAME>_RPS,
+# RATE_LIMIT_<NAME>_CONCURRENCY and RATE_LIMIT_<NAME>_BURST
+DEFAULT_LIMITS = {
+    "gemini": (4.0, 8),
+    "apify": (1.0, 4),
+    "linkedin": (0.2, 2),
+}
+
+_caller = contextvars.ContextVar("rate_limit_caller", default="interactive")
+
+
+class RateLimitTimeout(Exception):
+    """No slot became available within the acquire timeout"""
+
+
+@contextmanager
+def rate_limit_caller(name: str):
+    """
+    Attribute upstream calls made in this context to `name`
+
+    Waiting calls are served round-robin across callers, so a campaign with
+    a deep queue does not starve interactive requests.
+    """
+    token = _caller.set(name)
+    try:
+        yield
+    finally:
+        _caller.reset(token)
+
+
+def _parse_delay(value) -> float:
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(str(value).strip().rstrip("s")))
+    except ValueError:
+        return None
+
+
+def retry_after(error: Exception) -> float:
+    """Server-requested delay from a Retry-After header or Gemini RetryInfo"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers is not None:
+        delay = _parse_delay(headers.get("Retry-After"))
+        if delay is not None:
+            return delay
+
+    details = getattr(error, "details", None)
+    if isinstance(details, dict):
+        details = details.get("error", details).get("details", [])
+    for detail in details if isinstance(details, list) else []:
+        if isinstance(detail, dict) and "retryDelay" in detail:
+            return _parse_delay(detail["retryDelay"])
+    return None
+
+
+def is_rate_limited(error: Exception) -> bool:
+    """True for 429s from genai (`code`) or apify_client (`status_code`)"""
+    return 429 in (getattr(error, "code", None), getattr(error, "status_code", None))
+
+
+class _Waiter:
+    """A queued acquire: a blocked thread, or a future on an event loop"""
+
+    __slots__ = ("started", "granted", "loop", "future")
+
+    def __init__(self, loop=None):
+        self.started = time.monotonic()
+        self.granted = False
+        self.loop = loop
+        self.future = loop.create_future() if loop is not None else None
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+def _call_soon(loop, callback, *args):
+    try:
+        loop.call_soon_threadsafe(callback, *args)
+    except RuntimeError:
+        # The loop was closed; its waiters are gone with it
+        pass
+
+
+class UpstreamLimiter:
+    """
+    Token bucket plus concurrency cap for one upstream, with fair queuing
+
+    Callers wait in per-caller FIFO queues served round-robin. The refill
+    rate adapts AIMD-style: a 429 halves it and pauses the bucket for the
+    Retry-After delay, and each success adds back a small step towards the
+    configured rate, so sustained load settles just under the quota.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rps: float = None,
+        concurrency: int = None,
+        burst: float = None,
+        acquire_timeout: float = None,
+    ):
+        default_rps, default_concurrency = DEFAULT_LIMITS.get(name, (5.0, 8))
+        prefix = f"RATE_LIMIT_{name.upper()}"
+        self.name = name
+        self.max_rps = rps or float(os.getenv(f"{prefix}_RPS", default_rps))
+        self.min_rps = self.max_rps / 16
+        self.concurrency = concurrency or int(
+            os.getenv(f"{prefix}_CONCURRENCY", default_concurrency)
+        )
+        self.burst = burst or float(
+            os.getenv(f"{prefix}_BURST", max(1.0, self.max_rps))
+        )
+        self.acquire_timeout = acquire_timeout or float(
+            os.getenv("RATE_LIMIT_ACQUIRE_TIMEOUT", "120")
+        )
+
+        self.rps = self.max_rps
+        self._tokens = self.burst
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._in_flight = 0
+        self._queues = {}
+        self._rotation = deque()
+        # event loop -> asyncio waiters queued from it, and its refill timer
+        self._async_loops = {}
+        self._timers = {}
+        self._cond = threading.Condition()
+        self._counters = {
+            "acquired": 0,
+            "throttled": 0,
+            "timeouts": 0,
+            "wait_seconds": 0.0,
+        }
+
+    def _refill(self, now: float):
+        elapsed = now - self._refilled_at
+        self._tokens = min(self.burst, self._tokens + elapsed * self.rps)
+        self._refilled_at = now
+
+    def _delay(self, now: float) -> float:
+        """Seconds until a slot could open; None when waiting on a release"""
+        if self._in_flight >= self.concurrency:
+            return None
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self._tokens < 1:
+            return (1 - self._tokens) / self.rps
+        return 0.0
+
+    def _enqueue(self, caller: str, waiter: "_Waiter"):
+        if caller not in self._queues:
+            self._queues[caller] = deque()
+            self._rotation.append(caller)
+        self._queues[caller].append(waiter)
+        if waiter.loop is not None:
+            self._async_loops[waiter.loop] = self._async_loops.get(waiter.loop, 0) + 1
+
+    def _forget(self, caller: str, waiter: "_Waiter"):
+        """Take a waiter that gave up out of the queues"""
+        queue = self._queues[caller]
+        queue.remove(waiter)
+        if not queue:
+            del self._queues[caller]
+            self._rotation.remove(caller)
+        self._untrack(waiter)
+
+    def _untrack(self, waiter: "_Waiter"):
+        if waiter.loop is None:
+            return
+        remaining = self._async_loops[waiter.loop] - 1
+        if remaining:
+            self._async_loops[waiter.loop] = remaining
+        else:
+            del self._async_loops[waiter.loop]
+
+    def _dequeue(self, caller: str) -> "_Waiter":
+        queue = self._queues[caller]
+        waiter = queue.popleft()
+        self._rotation.popleft()
+        if queue:
+            self._rotation.append(caller)
+        else:
+            del self._queues[caller]
+        return waiter
+
+    def _dispatch(self):
+        """
+        Grant slots to waiters in round-robin order while tokens last
+
+        Called with the condition held. Threads are woken through the
+        condition; asyncio waiters get their future resolved on their own
+        loop, and a timer is armed there for the next refill, so no thread
+        is tied up while a coroutine waits.
+        """
+        now = time.monotonic()
+        self._refill(now)
+        delay = None
+        while self._rotation:
+            delay = self._delay(now)
+            if delay != 0.0:
+                break
+            waiter = self._dequeue(self._rotation[0])
+            self._untrack(waiter)
+            self._tokens -= 1
+            self._in_flight += 1
+            self._counters["acquired"] += 1
+            self._counters["wait_seconds"] += now - waiter.started
+            waiter.granted = True
+            if waiter.future is not None:
+                _call_soon(waiter.loop, _resolve, waiter.future)
+        if delay:
+            for loop in self._async_loops:
+                _call_soon(loop, self._arm_timer, loop, now + delay)
+        self._cond.notify_all()
+
+    def _arm_timer(self, loop, when: float):
+        # Runs on `loop`; keeps one timer per loop, at the earliest refill
+        armed = self._timers.get(loop)
+        if armed is not None:
+            if armed[0] <= when:
+                return
+            armed[1].cancel()
+        handle = loop.call_later(
+            max(0.0, when - time.monotonic()), self._on_timer, loop
+        )
+        self._timers[loop] = (when, handle)
+
+    def _on_timer(self, loop):
+        self._timers.pop(loop, None)
+        with self._cond:
+            self._dispatch()
+
+    def acquire(self, caller: str = None):
+        """
+        Block until this caller's turn comes and a token is available
+
+        For threads only; coroutines use aslot, which waits on the event loop.
+        """
+        caller = caller or _caller.get()
+        waiter = _Waiter()
+        deadline = waiter.started + self.acquire_timeout
+
+        with self._cond:
+            self._enqueue(caller, waiter)
+            self._dispatch()
+            while not waiter.granted:
+                now = time.monotonic()
+                if now >= deadline:
+                    self._forget(caller, waiter)
+                    self._counters["timeouts"] += 1
+                    # The next waiter may now be at the head of the rotation
+                    self._dispatch()
+                    raise RateLimitTimeout(
+                        f"No {self.name} slot within {self.acquire_timeout}s"
+                    )
+                wait = deadline - now
+                delay = self._delay(now)
+                if delay:
+                    wait = min(wait, delay)
+                self._cond.wait(wait)
+                self._dispatch()
+
+    def release(self, error: Exception = None):
+        """Return a concurrency slot and adapt the rate to the outcome"""
+        with self._cond:
+            self._in_flight -= 1
+            if error is not None and is_rate_limited(error):
+                self._throttle(retry_after(error))
+            elif error is None and self.rps < self.max_rps:
+                self.rps = min(self.max_rps, self.rps + self.max_rps / 20)
+            self._dispatch()
+
+    def _throttle(self, delay: float = None):
+        self.rps = max(self.min_rps, self.rps / 2)
+        self._tokens = min(self._tokens, 0.0)
+        if delay:
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        self._counters["throttled"] += 1
+        logger.warning(
+            f"{self.name} rate limited, slowing to {self.rps:.2f} rps"
+            + (f" after a {delay:.1f}s pause" if delay else "")
+        )
+
+    def throttle(self, delay: float = None):
+        """Record a rate-limit signal that did not arrive as an exception"""
+        with self._cond:
+            self._throttle(delay)
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, caller: str = None):
+        """Hold one rate-limited call for the duration of the block"""
+        with tracing.span("rate_limit_wait", upstream=self.name):
+            self.acquire(caller)
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            # Also runs on GeneratorExit when a stream is abandoned
+            self.release(error)
+
+    @asynccontextmanager
+    async def aslot(self, caller: str = None):
+        """Async variant of slot; waits on the event loop, not in a thread"""
+        caller = caller or _caller.get()
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(loop)
+        with self._cond:
+            self._enqueue(caller, waiter)
+            self._dispatch()
+        try:
+            with tracing.span("rate_limit_wait", upstream=self.name):
+                await asyncio.wait_for(
+                    asyncio.shield(waiter.future), self.acquire_timeout
+                )
+        except (asyncio.CancelledError, asyncio.TimeoutError) as e:
+            with self._cond:
+                granted = waiter.granted
+                if not granted:
+                    self._forget(caller, waiter)
+                    if isinstance(e, asyncio.TimeoutError):
+                        self._counters["timeouts"] += 1
+                    self._dispatch()
+            if granted:
+                # Granted while giving up: hand the slot back
+                self.release()
+            if isinstance(e, asyncio.TimeoutError):
+                raise RateLimitTimeout(
+                    f"No {self.name} slot within {self.acquire_timeout}s"
+                ) from None
+            raise
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.release(error)
+
+    def stats(self) -> dict:
+        with self._cond:
+            stats = dict(self._counters)
+            stats.update(
+                {
+                    "rps": round(self.rps, 3),
+                    "max_rps": self.max_rps,
+                    "concurrency": self.concurrency,
+                    "in_flight": self._in_flight,
+                    "waiting": sum(len(queue) for queue in self._queues.values()),
+                    "paused_for": round(
+                        max(0.0, self._paused_until - time.monotonic()), 1
+                    ),
+                }
+            )
+        stats["wait_seconds"] = round(stats["wait_seconds"], 3)
+        return stats
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name: str) -> UpstreamLimiter:
+    """Return the process-wide limiter for an upstream, creating it on first use"""
+    with _limiters_lock:
+        if name not in _limiters:
+            _limiters[name] = UpstreamLimiter(name)
+        return _limiters[name]
+
+
+def rate_limit_stats() -> dict:
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {name: limiter.stats() for name, limiter in limiters.items()}
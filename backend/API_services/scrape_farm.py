@@ -0,0 +1,509 @@
+from API_services.browser_profiles import sweep_profile_dirs
+from API_services.metrics import observe_stage
+from API_services.process_memory import kill_tree, process_table, tree_rss_mb
+from API_services.profile_cache import get_profile_cache
+from API_services.rate_limiter import DEFAULT_LIMITS
+from API_services import tracing
+from API_services.tracing import url_hash
+from collections import deque
+from concurrent.futures import Future
+import atexit
+import multiprocessing
+import os
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# How often the supervisor samples worker memory and liveness
+MONITOR_INTERVAL = 2.0
+
+
+def _default_memory_budget() -> float:
+    # Half of the host's memory, leaving the rest to the API process
+    try:
+        with open("/proc/meminfo", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("MemTotal:"):
+                    return int(line.split()[1]) / 1024 / 2
+    except OSError:
+        pass
+    return 4096.0
+
+
+def _worker_main(
+    worker_id: int,
+    tasks,
+    results,
+    rss_limit_mb: float,
+    max_tasks: int,
+    linkedin_rps: float,
+    initializer,
+    initargs: tuple,
+):
+    """Scrape tasks with this process's own browser until told to stop"""
+    # Exactly one browser per worker; the farm decides how many run at once
+    os.environ["LINKEDIN_DRIVER_POOL_SIZE"] = "1"
+    # Rate limits are per process, so each worker gets its share of the
+    # host-wide LinkedIn budget
+    os.environ["RATE_LIMIT_LINKEDIN_RPS"] = str(linkedin_rps)
+    os.environ["RATE_LIMIT_LINKEDIN_CONCURRENCY"] = "1"
+    # One trace file per worker slot: rotation is not safe across processes
+    tracing.use_process_trace_file(f"farm-{os.getppid()}-{worker_id}")
+    if initializer is not None:
+        initializer(*initargs)
+
+    from API_services.driver_pool import get_driver_pool
+    from API_services.linkedin_scraper_service import scrape_linkedin_profile
+
+    done = 0
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                return
+            task_id, url, refresh, trace_id, parent_id = task
+            span = tracing.start_span(
+                "farm_task",
+                trace_id=trace_id,
+                parent_id=parent_id,
+                worker=worker_id,
+                url_hash=url_hash(url),
+            )
+            try:
+                result = scrape_linkedin_profile(url, refresh)
+            except Exception as e:
+                span.record_error(e)
+                result = {"error": f"Scrape worker failed: {str(e)}"}
+            finally:
+                tracing.end_span(span)
+
+            done += 1
+            rss = tree_rss_mb(os.getpid())
+            retire = None
+            if max_tasks and done >= max_tasks:
+                retire = "max_tasks"
+            elif rss is not None and rss > rss_limit_mb:
+                retire = "memory"
+            results.put(("done", worker_id, task_id, result, rss, retire))
+            if retire:
+                return
+    finally:
+        get_driver_pool().close()
+        # Forked workers exit without running atexit handlers
+        tracing.flush()
+
+
+class _Task:
+    def __init__(self, task_id: int, url: str, refresh, trace_ids: tuple):
+        self.task_id = task_id
+        self.url = url
+        self.refresh = refresh
+        self.trace_ids = trace_ids
+        self.future = Future()
+        self.attempts = 0
+
+
+class _Worker:
+    """Supervisor-side state for one worker process"""
+
+    def __init__(self, worker_id: int):
+        self.worker_id = worker_id
+        self.process = None
+        self.tasks = None
+        self.task = None
+        self.task_started = None
+        self.tasks_done = 0
+        self.rss_mb = None
+        self.retiring = None
+        self.crashes_in_row = 0
+        self.restart_at = 0.0
+
+
+class ScrapeFarm:
+    """
+    Pool of isolated scraper processes, each owning one logged-in browser
+
+    Profiles are queued in one shared work queue and handed to whichever
+    worker is idle, so throughput grows with the number of workers until
+    the LinkedIn rate limit (shared out between them) becomes the bound.
+    The worker count is capped by the host memory budget divided by the
+    expected footprint of a worker and its browser.
+
+    A worker retires itself after `max_tasks` scrapes or once its process
+    tree (Python, chromedriver and Chrome) exceeds its share of the budget.
+    The supervisor kills a tree that grows past twice that share, or whose
+    scrape exceeds `task_timeout`, and restarts crashed workers with a
+    backoff. A task whose worker died is retried `task_retries` times.
+    """
+
+    def __init__(
+        self,
+        workers: int = None,
+        memory_budget_mb: float = None,
+        worker_memory_mb: float = None,
+        max_tasks: int = None,
+        task_timeout: float = None,
+        task_retries: int = None,
+        start_method: str = None,
+        initializer=None,
+        initargs: tuple = (),
+    ):
+        requested = workers or int(
+            os.getenv("SCRAPE_FARM_WORKERS", str(os.cpu_count() or 1))
+        )
+        self.memory_budget_mb = memory_budget_mb or float(
+            os.getenv("SCRAPE_FARM_MEMORY_MB", _default_memory_budget())
+        )
+        self.worker_memory_mb = worker_memory_mb or float(
+            os.getenv("SCRAPE_FARM_WORKER_MEMORY_MB", "600")
+        )
+        self.workers = max(
+            1, min(requested, int(self.memory_budget_mb // self.worker_memory_mb))
+        )
+        if self.workers < requested:
+            logger.warning(
+                f"Scrape farm limited to {self.workers} workers by its "
+                f"{self.memory_budget_mb:.0f} MB memory budget"
+            )
+        self.rss_limit_mb = self.memory_budget_mb / self.workers
+        self.max_tasks = max_tasks or int(os.getenv("SCRAPE_FARM_MAX_TASKS", "50"))
+        self.task_timeout = task_timeout or float(
+            os.getenv("SCRAPE_FARM_TASK_TIMEOUT", "300")
+        )
+        self.task_retries = (
+            task_retries
+            if task_retries is not None
+            else int(os.getenv("SCRAPE_FARM_TASK_RETRIES", "1"))
+        )
+        # Forking a threaded server (or a live Chrome session) is unsafe
+        self._context = multiprocessing.get_context(
+            start_method or os.getenv("SCRAPE_FARM_START_METHOD", "spawn")
+        )
+        self._initializer = initializer
+        self._initargs = initargs
+        self._linkedin_rps = (
+            float(
+                os.getenv("RATE_LIMIT_LINKEDIN_RPS", str(DEFAULT_LIMITS["linkedin"][0]))
+            )
+            / self.workers
+        )
+
+        self._lock = threading.Lock()
+        self._pending = deque()
+        self._tasks = {}
+        self._next_id = 0
+        self._workers = [_Worker(i) for i in range(self.workers)]
+        self._results = None
+        self._supervisor = None
+        self._closed = False
+        self._counters = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "retried": 0,
+            "crashes": 0,
+            "timeouts": 0,
+            "recycled_max_tasks": 0,
+            "recycled_memory": 0,
+            "killed_memory": 0,
+        }
+
+    def start(self):
+        """Start the worker processes and the supervisor thread"""
+        with self._lock:
+            if self._supervisor is not None:
+                return
+            self._results = self._context.Queue()
+            for worker in self._workers:
+                self._spawn(worker)
+            self._supervisor = threading.Thread(
+                target=self._supervise, name="scrape-farm", daemon=True
+            )
+            self._supervisor.start()
+        logger.info(f"Scrape farm started with {self.workers} workers")
+
+    def _spawn(self, worker: _Worker):
+        worker.tasks = self._context.SimpleQueue()
+        worker.process = self._context.Process(
+            target=_worker_main,
+            args=(
+                worker.worker_id,
+                worker.tasks,
+                self._results,
+                self.rss_limit_mb,
+                self.max_tasks,
+                self._linkedin_rps,
+                self._initializer,
+                self._initargs,
+            ),
+            name=f"scrape-farm-{worker.worker_id}",
+            daemon=True,
+        )
+        worker.process.start()
+        worker.task = None
+        worker.tasks_done = 0
+        worker.retiring = None
+
+    def submit(self, url: str, refresh=False) -> Future:
+        """
+        Queue one profile scrape
+
+        Returns:
+            Future: Resolves to the scraped profile dict, or a dict with an
+            "error" key; it never raises
+        """
+        if self._closed:
+            raise RuntimeError("Scrape farm is closed")
+        self.start()
+        span = tracing.current_span()
+        trace_ids = (span.trace_id, span.span_id) if span else (None, None)
+        with self._lock:
+            task = _Task(self._next_id, url, refresh, trace_ids)
+            self._next_id += 1
+            self._tasks[task.task_id] = task
+            self._pending.append(task)
+            self._counters["submitted"] += 1
+        return task.future
+
+    def scrape_many(self, urls: list, refresh=False) -> dict:
+        """
+        Scrape many profiles across the farm's browsers
+
+        Cached profiles are served without a round trip to a worker.
+
+        Args:
+            urls (list): LinkedIn profile URLs
+            refresh (bool | str): Bypass the profile cache, or "stale" to
+                re-scrape only snapshots past their staleness window
+
+        Returns:
+            dict: "results" (url -> profile) and "errors" (url -> message),
+            the same shape APIFY_LinkedIn_WebScrape_Batch returns
+        """
+        cache = get_profile_cache()
+        unique_urls = list(dict.fromkeys(url.strip() for url in urls if url.strip()))
+        results, errors, futures = {}, {}, {}
+
+        with observe_stage("farm_batch", profiles=len(unique_urls)) as span:
+            for url in unique_urls:
+                cached = cache.lookup("selenium", url, refresh)
+                if cached is not None:
+                    results[url] = cached
+                else:
+                    # Already looked up here, so the worker scrapes directly
+                    futures[url] = self.submit(url, refresh=True)
+            for url, future in futures.items():
+                profile = future.result()
+                if "error" in profile:
+                    errors[url] = profile["error"]
+                else:
+                    results[url] = profile
+            span.set_attributes(
+                cached=len(unique_urls) - len(futures), errors=len(errors)
+            )
+        return {"results": results, "errors": errors}
+
+    def _resolve(self, task: _Task, result: dict):
+        # Caller holds _lock
+        self._tasks.pop(task.task_id, None)
+        self._counters["failed" if "error" in result else "completed"] += 1
+        task.future.set_result(result)
+
+    def _supervise(self):
+        next_check = 0.0
+        while not self._closed:
+            self._dispatch()
+            try:
+                message = self._results.get(timeout=0.2)
+            except queue.Empty:
+                message = None
+            except (EOFError, OSError):
+                return
+            if message is not None:
+                self._handle(message)
+            if time.monotonic() >= next_check:
+                self._check_workers()
+                next_check = time.monotonic() + MONITOR_INTERVAL
+
+    def _drain(self) -> bool:
+        """Handle every result already queued; False once the queue is gone"""
+        while True:
+            try:
+                message = self._results.get_nowait()
+            except queue.Empty:
+                return True
+            except (EOFError, OSError):
+                return False
+            self._handle(message)
+
+    def _dispatch(self):
+        with self._lock:
+            for worker in self._workers:
+                # A requeued task may have been resolved by a late result
+                while self._pending and self._pending[0].task_id not in self._tasks:
+                    self._pending.popleft()
+                if not self._pending:
+                    return
+                if worker.task is not None or worker.retiring:
+                    continue
+                if worker.process is None or not worker.process.is_alive():
+                    continue
+                task = self._pending.popleft()
+                task.attempts += 1
+                worker.task = task
+                worker.task_started = time.monotonic()
+                worker.tasks.put(
+                    (task.task_id, task.url, task.refresh, *task.trace_ids)
+                )
+
+    def _handle(self, message: tuple):
+        _, worker_id, task_id, result, rss, retire = message
+        with self._lock:
+            worker = self._workers[worker_id]
+            worker.tasks_done += 1
+            worker.crashes_in_row = 0
+            worker.rss_mb = rss
+            if worker.task is not None and worker.task.task_id == task_id:
+                worker.task = None
+            task = self._tasks.get(task_id)
+            if task is not None:
+                self._resolve(task, result)
+            if retire:
+                worker.retiring = retire
+                self._counters[f"recycled_{retire}"] += 1
+                logger.info(f"Scrape worker {worker_id} retiring ({retire})")
+
+    def _requeue(self, worker: _Worker, reason: str):
+        # Caller holds _lock
+        task, worker.task = worker.task, None
+        if task is None or task.task_id not in self._tasks:
+            return
+        if task.attempts <= self.task_retries:
+            self._counters["retried"] += 1
+            self._pending.appendleft(task)
+        else:
+            self._resolve(task, {"error": f"Scrape worker {reason}"})
+
+    def _check_workers(self):
+        # Results a worker put before exiting are read first, so a worker that
+        # retired is not taken for a crash and its finished task run again.
+        # One that exits after this snapshot is left for the next check.
+        dead = {
+            worker.worker_id
+            for worker in self._workers
+            if worker.process is not None and not worker.process.is_alive()
+        }
+        if not self._drain():
+            return
+        table = process_table()
+        now = time.monotonic()
+        exited = False
+        with self._lock:
+            for worker in self._workers:
+                process = worker.process
+                if process is None:
+                    if not self._closed and now >= worker.restart_at:
+                        self._spawn(worker)
+                    continue
+
+                reason = None
+                if process.is_alive():
+                    worker.rss_mb = tree_rss_mb(process.pid, table) if table else None
+                    if worker.rss_mb is not None and (
+                        worker.rss_mb > 2 * self.rss_limit_mb
+                    ):
+                        reason = f"used {worker.rss_mb:.0f} MB"
+                        self._counters["killed_memory"] += 1
+                    elif (
+                        worker.task is not None
+                        and now - worker.task_started > self.task_timeout
+                    ):
+                        reason = "timed out"
+                        self._counters["timeouts"] += 1
+                    else:
+                        continue
+                    logger.warning(
+                        f"Scrape worker {worker.worker_id} {reason}, killing it"
+                    )
+                    kill_tree(process.pid)
+                    process.join(5)
+                elif worker.worker_id not in dead:
+                    continue
+                else:
+                    process.join(0)
+                    if not worker.retiring:
+                        reason = "crashed"
+                        self._counters["crashes"] += 1
+                        logger.warning(
+                            f"Scrape worker {worker.worker_id} exited with code "
+                            f"{process.exitcode}"
+                        )
+                if reason is not None:
+                    # Back off so a broken setup or a steady leak does not spin
+                    worker.crashes_in_row += 1
+                    worker.restart_at = now + min(30, 2**worker.crashes_in_row)
+
+                self._requeue(worker, reason or "exited")
+                worker.process = None
+                exited = True
+                if not self._closed and now >= worker.restart_at:
+                    self._spawn(worker)
+        if exited:
+            # A killed or crashed worker never deleted its Chrome profile
+            sweep_profile_dirs()
+
+    def close(self):
+        """Stop every worker and fail scrapes that have not finished"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            workers = [w for w in self._workers if w.process is not None]
+            for worker in workers:
+                try:
+                    worker.tasks.put(None)
+                except Exception:
+                    pass
+        for worker in workers:
+            worker.process.join(10)
+            if worker.process.is_alive():
+                kill_tree(worker.process.pid)
+        with self._lock:
+            for task in list(self._tasks.values()):
+                self._resolve(task, {"error": "Scrape farm shut down"})
+            self._pending.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "memory_budget_mb": round(self.memory_budget_mb),
+                "worker_memory_limit_mb": round(self.rss_limit_mb),
+                "queued": len(self._pending),
+                "busy": sum(1 for w in self._workers if w.task is not None),
+                **self._counters,
+                "worker_rss_mb": [w.rss_mb for w in self._workers],
+            }
+
+
+_farm = None
+_farm_lock = threading.Lock()
+
+
+def get_scrape_farm() -> ScrapeFarm:
+    """Return the process-wide scrape farm, starting it on first use"""
+    global _farm
+    with _farm_lock:
+        if _farm is None:
+            _farm = ScrapeFarm()
+            _farm.start()
+            atexit.register(_farm.close)
+        return _farm
+
+
+def scrape_farm_stats() -> dict:
+    """Farm counters, or None if nothing has used the farm yet"""
+    return _farm.stats() if _farm is not None else None
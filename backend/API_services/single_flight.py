@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Every SingleFlight created in the process, by name, for /stats
+_groups = {}
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key
+
+    The first caller for a key runs the function; callers that arrive while
+    it is in flight block on it and receive the same result or exception.
+    Nothing is remembered once the call finishes.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._counters = {"executed": 0, "coalesced": 0}
+        _groups[name] = self
+
+    def do(self, key: str, func):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = _Call()
+                self._calls[key] = call
+                leader = True
+                self._counters["executed"] += 1
+            else:
+                call.waiters += 1
+                leader = False
+                self._counters["coalesced"] += 1
+
+        if not leader:
+            logger.info(f"Waiting on in-flight {self.name} call for {key}")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["in_flight"] = len(self._calls)
+        return stats
+
+
+class AsyncSingleFlight:
+    """
+    asyncio counterpart of SingleFlight for coroutines on one event loop
+
+    The work runs in a task owned by the flight, and every caller, the
+    first included, awaits it through a shield. A cancelled caller (say,
+    a client that disconnected) leaves on its own and does not fail the
+    others; the work finishes for whoever is still waiting.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls = {}
+        self._counters = {"executed": 0, "coalesced": 0}
+        _groups[name] = self
+
+    async def do(self, key: str, coro_func):
+        task = self._calls.get(key)
+        if task is not None:
+            self._counters["coalesced"] += 1
+            logger.info(f"Waiting on in-flight {self.name} call for {key}")
+        else:
+            self._counters["executed"] += 1
+            task = asyncio.ensure_future(coro_func())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        return await asyncio.shield(task)
+
+    def _finished(self, key: str, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Mark the exception retrieved when every caller has gone
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        stats = dict(self._counters)
+        stats["in_flight"] = len(self._calls)
+        return stats
+
+
+def single_flight_stats() -> dict:
+    return {name: group.stats() for name, group in _groups.items()}
@@ -0,0 +1,13 @@
+import json
+
+
+def format_sse(event: str, data) -> str:
+    """Serialise one server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+# Comment line that keeps proxies from closing an idle stream
+SSE_KEEP_ALIVE = ": keep-alive\n\n"
+
+# Disable caching and proxy buffering so events reach the client immediately
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
@@ -0,0 +1,378 @@
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+import atexit
+import contextvars
+import hashlib
+import json
+import os
+import logging
+import queue
+import re
+import secrets
+import threading
+import time
+import urllib.request
+
+from API_services.linkedin_urls import canonical_profile_url
+
+logger = logging.getLogger(__name__)
+
+TRACE_HEADER = "X-Trace-Id"
+
+# "jsonl" (default), "otlp" or "off"; spans are still created when off so
+# trace ids keep flowing into response headers and campaign results
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "jsonl").lower()
+TRACE_FILE = os.getenv(
+    "TRACE_FILE",
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        ".cache",
+        "traces.jsonl",
+    ),
+)
+TRACE_FILE_MAX_BYTES = int(os.getenv("TRACE_FILE_MAX_BYTES", str(20 * 1024 * 1024)))
+TRACE_FILE_BACKUPS = int(os.getenv("TRACE_FILE_BACKUPS", "5"))
+OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318")
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "workly-backend")
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+_current = contextvars.ContextVar("trace_span", default=None)
+
+
+class Span:
+    """One timed operation within a trace"""
+
+    def __init__(self, name: str, trace_id: str, parent_id: str, attributes: dict):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = {k: v for k, v in attributes.items() if v is not None}
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+        self._token = None
+
+    def set_attribute(self, key: str, value):
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_attributes(self, **attributes):
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def record_error(self, error: BaseException):
+        self.error = f"{type(error).__name__}: {error}"
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start_ns / 1e9,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "status": "error" if self.error else "ok",
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+def url_hash(url: str) -> str:
+    """Stable, non-reversible id for a profile URL to use in span attributes"""
+    canonical = canonical_profile_url(url) if url else ""
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+def current_span() -> Span:
+    return _current.get()
+
+
+def current_trace_id() -> str:
+    span = _current.get()
+    return span.trace_id if span else None
+
+
+def parse_traceparent(header: str) -> tuple:
+    """(trace_id, parent_span_id) from a W3C traceparent header, if valid"""
+    match = _TRACEPARENT.match((header or "").strip().lower())
+    return (match.group(1), match.group(2)) if match else (None, None)
+
+
+def start_span(name: str, trace_id: str = None, parent_id: str = None, **attributes):
+    """
+    Start a span and make it current
+
+    With no explicit trace_id the span is a child of the current span, or
+    the root of a new trace if there is none. Pair with end_span().
+    """
+    parent = _current.get()
+    if trace_id is None and parent is not None:
+        trace_id, parent_id = parent.trace_id, parent.span_id
+    span = Span(name, trace_id or secrets.token_hex(16), parent_id, attributes)
+    span._token = _current.set(span)
+    return span
+
+
+def end_span(span: Span, error: BaseException = None):
+    if error is not None:
+        span.record_error(error)
+    span.end_ns = time.time_ns()
+    try:
+        _current.reset(span._token)
+    except ValueError:
+        # Ended from a different context (e.g. a response generator driven
+        # by another task); the span itself is still complete
+        pass
+    _export(span)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Run the block inside a child span of the current one"""
+    current = start_span(name, **attributes)
+    try:
+        yield current
+    except BaseException as e:
+        current.record_error(e)
+        raise
+    finally:
+        end_span(current)
+
+
+def bind_context(func):
+    """
+    Bind `func` to a copy of the caller's context for another thread
+
+    Thread pools do not carry contextvars over, so spans opened by the
+    submitted work would otherwise start new traces. Bind once per
+    submission: a context cannot be entered by two threads at once.
+    """
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.run(func, *args, **kwargs)
+
+    return run
+
+
+class _JsonlExporter:
+    """
+    Appends spans to a rotating JSONL file from a background thread
+
+    Export never blocks the caller on disk: when the writer falls behind the
+    queue fills and further spans are dropped and counted. Rotation renames
+    the file, so each file must have a single writing process, see
+    use_process_trace_file.
+    """
+
+    def __init__(self, path: str, max_queue: int = 10000):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._handler = RotatingFileHandler(
+            path,
+            maxBytes=TRACE_FILE_MAX_BYTES,
+            backupCount=TRACE_FILE_BACKUPS,
+            encoding="utf-8",
+        )
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        threading.Thread(target=self._run, name="jsonl-exporter", daemon=True).start()
+
+    def export(self, span: Span):
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout: float = 5.0):
+        """Wait until spans exported so far are written"""
+        written = threading.Event()
+        try:
+            self._queue.put(written, timeout=timeout)
+        except queue.Full:
+            return
+        written.wait(timeout)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if isinstance(item, threading.Event):
+                self._handler.flush()
+                item.set()
+                continue
+            try:
+                record = logging.makeLogRecord(
+                    {
+                        "msg": json.dumps(item.to_dict(), default=str),
+                        "levelno": logging.INFO,
+                    }
+                )
+                self._handler.handle(record)
+            except Exception as e:
+                self.dropped += 1
+                logger.warning(f"Dropping span, JSONL export failed: {e}")
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_span(span: Span) -> dict:
+    otlp = {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        # SERVER for HTTP request spans, INTERNAL for everything else
+        "kind": 2 if "http.method" in span.attributes else 1,
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns),
+        "attributes": [
+            {"key": key, "value": _otlp_value(value)}
+            for key, value in span.attributes.items()
+        ],
+        "status": ({"code": 2, "message": span.error} if span.error else {"code": 1}),
+    }
+    if span.parent_id:
+        otlp["parentSpanId"] = span.parent_id
+    return otlp
+
+
+class _OtlpExporter:
+    """
+    Batches spans to an OTLP/HTTP collector (JSON encoding) from a thread
+
+    Export never blocks a request: when the collector is slow or down the
+    queue fills and further spans are dropped and counted.
+    """
+
+    def __init__(self, endpoint: str, batch_size: int = 256, interval: float = 2.0):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.batch_size = batch_size
+        self.interval = interval
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=batch_size * 20)
+        threading.Thread(target=self._run, name="otlp-exporter", daemon=True).start()
+
+    def export(self, span: Span):
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._post(batch)
+
+    def _post(self, batch: list):
+        body = {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [
+                            {
+                                "key": "service.name",
+                                "value": {"stringValue": SERVICE_NAME},
+                            }
+                        ]
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": "workly"},
+                            "spans": [_otlp_span(span) for span in batch],
+                        }
+                    ],
+                }
+            ]
+        }
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(body).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=5) as response:
+                response.read()
+        except Exception as e:
+            self.dropped += len(batch)
+            logger.warning(f"Dropping {len(batch)} spans, OTLP export failed: {e}")
+
+
+_exporter = None
+_exporter_lock = threading.Lock()
+
+
+def _reset_after_fork():
+    # The exporter thread and file handle stay with the parent
+    global _exporter, _exporter_lock
+    _exporter = None
+    _exporter_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _get_exporter():
+    global _exporter
+    if _exporter is None:
+        with _exporter_lock:
+            if _exporter is None:
+                if TRACE_EXPORTER == "otlp":
+                    _exporter = _OtlpExporter(OTLP_ENDPOINT)
+                elif TRACE_EXPORTER == "jsonl":
+                    _exporter = _JsonlExporter(TRACE_FILE)
+    return _exporter
+
+
+def use_process_trace_file(label: str):
+    """
+    Write this process's JSONL spans to their own file beside TRACE_FILE
+
+    For child processes such as scrape farm workers, which would otherwise
+    rotate the parent's file underneath it. Call before the first span ends.
+    """
+    global TRACE_FILE, _exporter
+    root, ext = os.path.splitext(TRACE_FILE)
+    with _exporter_lock:
+        TRACE_FILE = f"{root}.{label}{ext}"
+        _exporter = None
+
+
+def flush(timeout: float = 5.0):
+    """Wait for exported spans to reach the JSONL file"""
+    exporter = _exporter
+    if isinstance(exporter, _JsonlExporter):
+        exporter.flush(timeout)
+
+
+# Spans still queued for the file when the interpreter exits
+atexit.register(flush)
+
+
+def _export(span: Span):
+    if TRACE_EXPORTER == "off":
+        return
+    try:
+        exporter = _get_exporter()
+        if exporter is not None:
+            exporter.export(span)
+    except Exception as e:
+        logger.warning(f"Span export failed: {e}")
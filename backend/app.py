@@ -1,21 +1,60 @@
 import os
 import json
+import hashlib
+import re
 import logging
 import sys
-from flask import Flask, request, jsonify
+from flask import (
+    Flask,
+    Response,
+    g,
+    request,
+    jsonify,
+    send_file,
+    stream_with_context,
+)
 import argparse
 
 # Add the current directory to the path so we can import modules correctly
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from API_services.apify import APIFY_LinkedIn_WebScrape
-from API_services.linkedin_scraper_service import scrape_linkedin_profile
+from API_services.config import load_config
+
+# Load environment variables once, before the service modules read them
+load_config()
+
+from API_services.clients import client_pool_stats, get_gemini_client
+from API_services.apify import APIFY_LinkedIn_WebScrape_Batch
+from API_services.campaigns import (
+    SCRAPE_SOURCES,
+    campaign_output_path,
+    run_campaign,
+)
+from API_services.email_generation import (
+    structured_output_stats,
+    improve_email,
+    stream_cold_email,
+    stream_improve_email,
+)
+from API_services.jobs import get_job_queue
+from API_services.lead_store import MAX_PAGE_SIZE, get_lead_store
+from API_services import metrics, tracing
+from API_services.pipelines import (
+    PipelineError,
+    cold_email_pipeline,
+    profile_pipeline,
+)
+from API_services.generation_cache import get_generation_cache, get_prefix_cache
+from API_services.profile_cache import get_profile_cache, refresh_mode
+from API_services.profile_sources import breaker_states, fetch_profile
+from API_services.rate_limiter import rate_limit_stats
+from API_services.scrape_farm import scrape_farm_stats
+from API_services.single_flight import single_flight_stats
+from API_services.tracing import TRACE_HEADER
+from API_services.sse import SSE_HEADERS, SSE_KEEP_ALIVE, format_sse
 
 # from groq import Groq
-from dotenv import load_dotenv
 from flask_cors import CORS
-from google import genai
-from google.genai import types
 
 # Configure logging
 logging.basicConfig(
@@ -23,14 +62,77 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Load environment variables from the .env file in the current directory
-load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env"))
-
 app = Flask(__name__)
-CORS(app, resources={r"/*": {"origins": "*"}})
+CORS(app, resources={r"/*": {"origins": "*"}}, expose_headers=[TRACE_HEADER, "ETag"])
+
+
+@app.before_request
+def start_request_metrics():
+    g.metrics_route = request.url_rule.rule if request.url_rule else "unmatched"
+    g.metrics_started = metrics.request_started(g.metrics_route)
+
+
+@app.after_request
+def record_response_status(response):
+    g.metrics_status = response.status_code
+    return response
+
+
+@app.teardown_request
+def finish_request_metrics(error=None):
+    # Runs after a streamed response has finished, so SSE latency is complete
+    if "metrics_started" in g:
+        metrics.request_finished(
+            g.metrics_route,
+            request.method,
+            g.get("metrics_status", 500),
+            g.metrics_started,
+        )
+
+
+@app.before_request
+def start_request_trace():
+    # Continue the caller's trace when it sent a W3C traceparent header
+    trace_id, parent_id = tracing.parse_traceparent(request.headers.get("traceparent"))
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    g.trace_span = tracing.start_span(
+        f"{request.method} {route}",
+        trace_id=trace_id,
+        parent_id=parent_id,
+        **{
+            "http.method": request.method,
+            "http.route": route,
+            "http.request_bytes": request.content_length,
+        },
+    )
+
+
+@app.after_request
+def add_trace_header(response):
+    if "trace_span" in g:
+        response.headers[TRACE_HEADER] = g.trace_span.trace_id
+        g.trace_span.set_attributes(
+            **{
+                "http.status_code": response.status_code,
+                "http.response_bytes": response.content_length,
+            }
+        )
+    return response
+
+
+@app.teardown_request
+def finish_request_trace(error=None):
+    if "trace_span" in g:
+        tracing.end_span(g.pop("trace_span"), error)
+
+
+# Upper bound on profiles accepted by a single /scrape-linkedin-batch call
+MAX_BATCH_URLS = int(os.getenv("MAX_BATCH_URLS", "500"))
+
+# Idle interval after which an SSE stream sends a keep-alive comment
+SSE_HEARTBEAT_SECONDS = 15
 
 # client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
 
 
 @app.route("/scrape-linkedin", methods=["POST"])
@@ -44,49 +146,117 @@ def scrape_linkedin():
     prompt = data["prompt"]
 
     try:
-        result_str = APIFY_LinkedIn_WebScrape(url)
-        result = json.loads(result_str)
-
-        email = result.get("email")
-        about = result.get("about", "")
-        headline = result.get("headline", "")
-        fullName = result.get("fullName", "")
-
-        message = client.models.generate_content(
-            model="gemini-2.0-flash",
-            config=types.GenerateContentConfig(
-                system_instruction='You\'re a skilled  copywriter who knows how to write cold emails that actually get replies. Your job is to craft short, thoughtful, and personalized emails for enterprise decision-makers based on their LinkedIn profiles and a quick briefing on the product or service being offered.\n\nHere\'s what you\'ll get to work with:\n\n- A snapshot of the person\'s LinkedIn info — things like their name, job title, company, industry, recent posts, achievements, or shared interests.  \n- A campaign prompt that explains the product/service, the value it brings, and what kind of call-to-action we\'re aiming for.\n\n**Your task:**\nWrite only the body of the email (no subject line or extra headers) using the following rules:\n\n- Always start with: **Dear [First Name],**\n- Keep it brief — aim for **4 to 6 sentences total**\n- Make it personal — use **relevant LinkedIn details** to show we\'ve done our homework\n- Focus on **real value** — how does this offering help solve a challenge or make their work easier, faster, or more effective?\n- Use a **natural, conversational tone** — like it was written by a thoughtful human\n- End with a **light, low-pressure CTA** — like asking if they\'d be open to a quick call or if it makes sense to connect\n- Avoid all fluff — skip generic intros like "Hope you\'re well," marketing buzzwords, or long walls of text\n\n**Output format (JSON only):**\n```json\n{\n  "email_output": "The full body of the email starting with \'Dear [First Name],\'",\n  "analysis_rationale": [\n    "Insightful reasoning based on LinkedIn activity or achievements — e.g., recent promotion, project success, or strong content engagement",\n    "What makes this person\'s performance or profile impressive and why it was used in the email",\n    "Any connections between their career performance and the value proposition of the offering"\n  ]\n}\n```\n\n**Never include anything outside this JSON structure. No explanations, no extra text, just valid JSON.**'
-            ),
-            contents=[
-                f"Their name is {fullName}.\n\n***Important prompt***:[ {prompt} ]. {headline}. {about}."
-            ],
+        return jsonify(
+            cold_email_pipeline(
+                get_gemini_client(),
+                url,
+                prompt,
+                refresh=refresh_mode(data.get("refresh")),
+                regenerate=bool(data.get("regenerate")),
+            )
         )
 
-        response = message.text
+    except Exception as e:
+        logger.error(f"Error in scrape-linkedin: {str(e)}")
+        return jsonify({"error": str(e)}), 500
 
-        # Extract JSON from the response
-        if "```json" in response and "```" in response:
-            json_str = response.split("```json")[1].split("```")[0].strip()
-        else:
-            json_str = response
 
-        json_response = json.loads(json_str)
+@app.route("/scrape-linkedin/stream", methods=["POST"])
+def scrape_linkedin_stream():
+    """
+    Streaming /scrape-linkedin: email text is sent as server-sent events
+    while Gemini generates it, the rationale follows in the final event
+    """
+    data = request.get_json()
 
-        return jsonify(
-            {
-                "email": email,
-                "groq_response": json_response["email_output"],
-                "analysis_rationale": json_response["analysis_rationale"],
-            }
+    if not data or "url" not in data or "prompt" not in data:
+        return jsonify({"error": "Missing URL or prompt in request"}), 400
+
+    url = data["url"]
+    prompt = data["prompt"]
+    refresh = refresh_mode(data.get("refresh"))
+    use_cache = not data.get("regenerate")
+
+    def events():
+        try:
+            yield format_sse("stage", {"stage": "scraping"})
+            result = fetch_profile(url, refresh=refresh)
+            if "error" in result:
+                yield format_sse("error", {"error": result["error"]})
+                return
+
+            yield format_sse("stage", {"stage": "generating"})
+            for kind, value in stream_cold_email(
+                get_gemini_client(), result, prompt, use_cache=use_cache
+            ):
+                if kind == "delta":
+                    yield format_sse("email_delta", {"text": value})
+                else:
+                    json_response = value
+
+            yield format_sse(
+                "done",
+                {
+                    "email": result.get("email"),
+                    "groq_response": json_response["email_output"],
+                    "analysis_rationale": json_response["analysis_rationale"],
+                },
+            )
+
+        except Exception as e:
+            logger.error(f"Error in scrape-linkedin stream: {str(e)}")
+            yield format_sse("error", {"error": str(e)})
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+
+@app.route("/scrape-linkedin-batch", methods=["POST"])
+def scrape_linkedin_batch():
+    data = request.get_json()
+
+    if not data or not isinstance(data.get("urls"), list) or not data["urls"]:
+        return jsonify({"error": "Missing urls list in request"}), 400
+
+    urls = [url for url in data["urls"] if isinstance(url, str) and url.strip()]
+    if len(urls) > MAX_BATCH_URLS:
+        return (
+            jsonify({"error": f"Too many URLs, the limit is {MAX_BATCH_URLS}"}),
+            400,
+        )
+
+    try:
+        result = json.loads(
+            APIFY_LinkedIn_WebScrape_Batch(
+                urls, refresh=refresh_mode(data.get("refresh"))
+            )
+        )
+        if "error" in result:
+            return jsonify({"error": result["error"]}), 500
+
+        profiles = []
+        for url in dict.fromkeys(url.strip() for url in urls):
+            if url in result["results"]:
+                profiles.append({"url": url, "profile": result["results"][url]})
+            else:
+                profiles.append({"url": url, "error": result["errors"].get(url)})
+
+        logger.info(
+            f"Batch scrape finished: {len(result['results'])} profiles, "
+            f"{len(result['errors'])} failures"
         )
+        return jsonify({"profiles": profiles, "failed": len(result["errors"])})
 
     except Exception as e:
-        logger.error(f"Error in scrape-linkedin: {str(e)}")
+        logger.error(f"Error in scrape-linkedin-batch: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 
 @app.route("/improve-email", methods=["POST"])
-def improve_email():
+def improve_email_endpoint():
     data = request.get_json()
 
     if not data or "email" not in data or "prompt" not in data:
@@ -95,28 +265,17 @@ def improve_email():
     email_content = data["email"]
     prompt = data["prompt"]
     recipient_name = data.get("recipient_name", "the recipient")
+    use_cache = not data.get("regenerate")
 
     try:
-        message = client.models.generate_content(
-            model="gemini-2.0-flash",
-            config=types.GenerateContentConfig(
-                system_instruction='You\'re a skilled B2B copywriter who knows how to improve cold emails to make them more effective. Your job is to refine and enhance an existing email based on specific improvement instructions.\n\n**Your task:**\nImprove the provided email using the following rules:\n\n- Always start with: **Dear [First Name],**\n- Keep it brief — aim for **4 to 6 sentences total**\n- Make it personal and maintain any personalization from the original email\n- Focus on **real value** — how does this offering help solve a challenge or make their work easier, faster, or more effective?\n- Use a **natural, conversational tone** — like it was written by a thoughtful human\n- End with a **light, low-pressure CTA** — like asking if they\'d be open to a quick call or if it makes sense to connect\n- Avoid all fluff — skip generic intros like "Hope you\'re well," marketing buzzwords, or long walls of text\n\n**Output format (JSON only):**\n```json\n{\n  "email_output": "The full body of the improved email starting with \'Dear [First Name],\'",\n  "improvement_rationale": [\n    "Explanation of key improvements made to the email",\n    "How the improvements address the specific prompt instructions",\n    "Why these changes will make the email more effective"\n  ]\n}\n```\n\n**Never include anything outside this JSON structure. No explanations, no extra text, just valid JSON.**'
-            ),
-            contents=[
-                f"Here is the original email:\n\n{email_content}\n\nThe recipient's name is {recipient_name}.\n\nImprovement instructions: {prompt}"
-            ],
+        json_response = improve_email(
+            get_gemini_client(),
+            email_content,
+            recipient_name,
+            prompt,
+            use_cache=use_cache,
         )
 
-        response = message.text
-
-        # Extract JSON from the response
-        if "```json" in response and "```" in response:
-            json_str = response.split("```json")[1].split("```")[0].strip()
-        else:
-            json_str = response
-
-        json_response = json.loads(json_str)
-
         return jsonify(
             {
                 "improved_email": json_response["email_output"],
@@ -129,6 +288,52 @@ def improve_email():
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/improve-email/stream", methods=["POST"])
+def improve_email_stream():
+    """Streaming /improve-email over server-sent events"""
+    data = request.get_json()
+
+    if not data or "email" not in data or "prompt" not in data:
+        return jsonify({"error": "Missing email or prompt in request"}), 400
+
+    email_content = data["email"]
+    prompt = data["prompt"]
+    recipient_name = data.get("recipient_name", "the recipient")
+    use_cache = not data.get("regenerate")
+
+    def events():
+        try:
+            for kind, value in stream_improve_email(
+                get_gemini_client(),
+                email_content,
+                recipient_name,
+                prompt,
+                use_cache=use_cache,
+            ):
+                if kind == "delta":
+                    yield format_sse("email_delta", {"text": value})
+                else:
+                    json_response = value
+
+            yield format_sse(
+                "done",
+                {
+                    "improved_email": json_response["email_output"],
+                    "improvement_rationale": json_response["improvement_rationale"],
+                },
+            )
+
+        except Exception as e:
+            logger.error(f"Error in improve-email stream: {str(e)}")
+            yield format_sse("error", {"error": str(e)})
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+
 @app.route("/scrape-linkedin-profile", methods=["POST"])
 def scrape_linkedin_profile_endpoint():
     data = request.get_json()
@@ -141,27 +346,275 @@ def scrape_linkedin_profile_endpoint():
     logger.info(f"Received request to scrape LinkedIn profile: {url}")
 
     try:
-        profile_data = scrape_linkedin_profile(url)
-
-        if isinstance(profile_data, dict) and "error" in profile_data:
-            error_message = profile_data["error"]
-            logger.error(f"Error from scraper: {error_message}")
-            return jsonify({"error": error_message}), 500
+        profile_data = profile_pipeline(url, refresh=refresh_mode(data.get("refresh")))
 
         logger.info(
             f"Successfully scraped profile for: {profile_data.get('name', 'Unknown')}"
         )
-        return jsonify(profile_data)
+        # Clients holding the current snapshot get a 304 instead of the payload
+        etag = get_profile_cache().etag_for("selenium", url, profile_data)
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = jsonify(profile_data)
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
+
+    except PipelineError as e:
+        logger.error(f"Error from scraper: {str(e)}")
+        return jsonify({"error": str(e)}), 500
 
     except Exception as e:
         logger.error(f"Unexpected error in scrape-linkedin-profile: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/jobs/scrape-linkedin", methods=["POST"])
+def enqueue_scrape_linkedin():
+    """Queue /scrape-linkedin work and return a job id immediately"""
+    data = request.get_json()
+
+    if not data or "url" not in data or "prompt" not in data:
+        return jsonify({"error": "Missing URL or prompt in request"}), 400
+
+    job = get_job_queue().submit(
+        "scrape-linkedin",
+        cold_email_pipeline,
+        get_gemini_client(),
+        data["url"],
+        data["prompt"],
+        refresh=refresh_mode(data.get("refresh")),
+        regenerate=bool(data.get("regenerate")),
+    )
+    return jsonify(_job_links(job)), 202
+
+
+@app.route("/jobs/scrape-linkedin-profile", methods=["POST"])
+def enqueue_scrape_linkedin_profile():
+    """Queue /scrape-linkedin-profile work and return a job id immediately"""
+    data = request.get_json()
+
+    if not data or "url" not in data:
+        return jsonify({"error": "Missing URL in request"}), 400
+
+    job = get_job_queue().submit(
+        "scrape-linkedin-profile",
+        profile_pipeline,
+        data["url"],
+        refresh=refresh_mode(data.get("refresh")),
+    )
+    return jsonify(_job_links(job)), 202
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict())
+
+
+@app.route("/jobs/<job_id>/events", methods=["GET"])
+def stream_job_events(job_id):
+    """Server-sent events for each stage transition until the job finishes"""
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    def events():
+        seen = 0
+        while True:
+            new_events = job.wait_for_event(seen, timeout=SSE_HEARTBEAT_SECONDS)
+            if not new_events:
+                yield SSE_KEEP_ALIVE
+                continue
+            seen += len(new_events)
+            for event in new_events:
+                yield format_sse("stage", event)
+            if job.finished:
+                yield format_sse(job.status, job.to_dict())
+                return
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+
+def _job_links(job) -> dict:
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/jobs/{job.id}",
+        "events_url": f"/jobs/{job.id}/events",
+    }
+
+
+@app.route("/campaigns", methods=["POST"])
+def start_campaign():
+    """
+    Run a campaign over yc.csv as a background job
+
+    Posting again with the same campaign_id (by default derived from the
+    prompt) resumes from that campaign's checkpoint; while it is still
+    running, the post is refused with a 409.
+    """
+    data = request.get_json()
+
+    if not data or not data.get("prompt"):
+        return jsonify({"error": "Missing prompt in request"}), 400
+
+    campaign_id = (
+        data.get("campaign_id")
+        or hashlib.sha1(data["prompt"].encode("utf-8")).hexdigest()[:12]
+    )
+    if not re.fullmatch(r"[A-Za-z0-9_-]{1,64}", campaign_id):
+        return jsonify({"error": "Invalid campaign_id"}), 400
+    scrape_source = data.get("scrape_source")
+    if scrape_source is not None and scrape_source not in SCRAPE_SOURCES:
+        return jsonify({"error": "Invalid scrape_source"}), 400
+    for name in ("limit", "top_k"):
+        value = data.get(name)
+        if value is not None and (
+            isinstance(value, bool) or not isinstance(value, int) or value < 0
+        ):
+            return jsonify({"error": f"{name} must be a non-negative integer"}), 400
+
+    job = get_job_queue().submit_unique(
+        f"campaign:{campaign_id}",
+        "campaign",
+        run_campaign,
+        get_gemini_client(),
+        data["prompt"],
+        campaign_output_path(campaign_id),
+        limit=data.get("limit"),
+        top_k=data.get("top_k"),
+        scrape_source=scrape_source,
+    )
+    if job is None:
+        return jsonify({"error": f"Campaign {campaign_id} is already running"}), 409
+    return jsonify({"campaign_id": campaign_id, **_job_links(job)}), 202
+
+
+@app.route("/campaigns/<campaign_id>/results", methods=["GET"])
+def campaign_results(campaign_id):
+    """Results written so far, one JSON object per line"""
+    if not re.fullmatch(r"[A-Za-z0-9_-]{1,64}", campaign_id):
+        return jsonify({"error": "Invalid campaign_id"}), 400
+
+    output_path = campaign_output_path(campaign_id)
+    if not os.path.exists(output_path):
+        return jsonify({"error": "Campaign not found"}), 404
+    return send_file(output_path, mimetype="application/x-ndjson")
+
+
+@app.route("/leads", methods=["GET"])
+def query_leads():
+    """
+    Filter yc.csv companies
+
+    Query params: industry (repeatable or comma-separated, all must match),
+    location, founded_min, founded_max, team_size_min, team_size_max,
+    offset and limit.
+    """
+    args = request.args
+    industries = [
+        tag for value in args.getlist("industry") for tag in value.split(",") if tag
+    ]
+
+    try:
+        filters = {
+            name: int(args[name])
+            for name in (
+                "founded_min",
+                "founded_max",
+                "team_size_min",
+                "team_size_max",
+                "offset",
+                "limit",
+            )
+            if args.get(name)
+        }
+    except ValueError:
+        return jsonify({"error": "Numeric filters must be integers"}), 400
+
+    try:
+        page = get_lead_store().query(
+            industries=industries, location=args.get("location"), **filters
+        )
+        return jsonify(page), 200
+    except Exception as e:
+        logger.error(f"Error querying leads: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/leads/rank", methods=["POST"])
+def rank_leads():
+    """Top-k companies for a campaign prompt by TF-IDF relevance"""
+    data = request.get_json()
+
+    if not data or not data.get("prompt"):
+        return jsonify({"error": "Missing prompt in request"}), 400
+
+    try:
+        k = min(int(data.get("k", 25)), MAX_PAGE_SIZE)
+    except (TypeError, ValueError):
+        return jsonify({"error": "k must be an integer"}), 400
+
+    try:
+        # Deferred: numpy/scipy add noticeably to cold start
+        from API_services.lead_scoring import get_lead_scorer
+
+        results = get_lead_scorer().top_k(data["prompt"], k)
+        return jsonify({"results": results}), 200
+    except Exception as e:
+        logger.error(f"Error ranking leads: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route("/health", methods=["GET"])
 def health_check():
     """Endpoint to verify the API is running"""
-    return jsonify({"status": "ok", "message": "Service is running"}), 200
+    return (
+        jsonify(
+            {
+                "status": "ok",
+                "message": "Service is running",
+                "scrapers": breaker_states(),
+            }
+        ),
+        200,
+    )
+
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    """Prometheus scrape endpoint"""
+    return Response(metrics.render_metrics(), content_type=metrics.CONTENT_TYPE)
+
+
+@app.route("/stats", methods=["GET"])
+def stats():
+    """Cache counters for capacity planning"""
+    return (
+        jsonify(
+            {
+                "profile_cache": get_profile_cache().stats(),
+                "coalescing": single_flight_stats(),
+                "generation_cache": get_generation_cache().stats(),
+                "prompt_prefix_cache": get_prefix_cache().stats(),
+                "structured_output": structured_output_stats(),
+                "rate_limits": rate_limit_stats(),
+                "http_pools": client_pool_stats(),
+                "jobs": get_job_queue().stats(),
+                "leads": get_lead_store().stats(),
+                "scrape_farm": scrape_farm_stats(),
+            }
+        ),
+        200,
+    )
 
 
 if __name__ == "__main__":
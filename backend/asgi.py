@@ -0,0 +1,616 @@
+"""
+ASGI serving mode for the backend
+
+Same routes and request/response contracts as app.py, but Gemini and Apify
+calls are awaited on the event loop instead of blocking a worker thread, so a
+single process can hold hundreds of generations in flight. Background jobs
+run on the same in-process job queue as in app.py. Run with:
+
+    hypercorn asgi:app --bind 0.0.0.0:8000
+"""
+
+import os
+import json
+import hashlib
+import re
+import logging
+import sys
+import asyncio
+
+# Add the current directory to the path so we can import modules correctly
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from API_services.config import load_config
+
+# Load environment variables once, before the service modules read them
+load_config()
+
+from API_services.apify import APIFY_LinkedIn_WebScrape_Batch
+from API_services.clients import client_pool_stats, get_gemini_client
+from API_services.campaigns import (
+    SCRAPE_SOURCES,
+    campaign_output_path,
+    run_campaign,
+)
+from API_services.email_generation import (
+    agenerate_cold_email,
+    aimprove_email,
+    astream_cold_email,
+    astream_improve_email,
+    structured_output_stats,
+)
+from API_services.generation_cache import get_generation_cache, get_prefix_cache
+from API_services.jobs import get_job_queue
+from API_services.lead_store import MAX_PAGE_SIZE, get_lead_store
+from API_services import metrics, tracing
+from API_services.pipelines import cold_email_pipeline, profile_pipeline
+from API_services.profile_cache import get_profile_cache, refresh_mode
+from API_services.profile_sources import afetch_profile, breaker_states
+from API_services.rate_limiter import rate_limit_stats
+from API_services.scrape_farm import scrape_farm_stats
+from API_services.single_flight import single_flight_stats
+from API_services.tracing import TRACE_HEADER
+from API_services.sse import SSE_HEADERS, SSE_KEEP_ALIVE, format_sse
+
+from quart import Quart, Response, g, request, jsonify, send_file
+from quart_cors import cors
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+app = cors(Quart(__name__), allow_origin="*", expose_headers=[TRACE_HEADER, "ETag"])
+
+
+@app.before_request
+async def start_request_metrics():
+    g.metrics_route = request.url_rule.rule if request.url_rule else "unmatched"
+    g.metrics_started = metrics.request_started(g.metrics_route)
+
+
+@app.after_request
+async def record_response_status(response):
+    g.metrics_status = response.status_code
+    return response
+
+
+@app.teardown_request
+async def finish_request_metrics(error=None):
+    if "metrics_started" in g:
+        metrics.request_finished(
+            g.metrics_route,
+            request.method,
+            g.get("metrics_status", 500),
+            g.metrics_started,
+        )
+
+
+@app.before_request
+async def start_request_trace():
+    # Continue the caller's trace when it sent a W3C traceparent header
+    trace_id, parent_id = tracing.parse_traceparent(request.headers.get("traceparent"))
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    g.trace_span = tracing.start_span(
+        f"{request.method} {route}",
+        trace_id=trace_id,
+        parent_id=parent_id,
+        **{
+            "http.method": request.method,
+            "http.route": route,
+            "http.request_bytes": request.content_length,
+        },
+    )
+
+
+@app.after_request
+async def add_trace_header(response):
+    if "trace_span" in g:
+        response.headers[TRACE_HEADER] = g.trace_span.trace_id
+        g.trace_span.set_attributes(
+            **{
+                "http.status_code": response.status_code,
+                "http.response_bytes": response.content_length,
+            }
+        )
+    return response
+
+
+@app.teardown_request
+async def finish_request_trace(error=None):
+    if "trace_span" in g:
+        tracing.end_span(g.pop("trace_span"), error)
+
+
+# Upper bound on profiles accepted by a single /scrape-linkedin-batch call
+MAX_BATCH_URLS = int(os.getenv("MAX_BATCH_URLS", "500"))
+
+# Idle interval after which an SSE stream sends a keep-alive comment
+SSE_HEARTBEAT_SECONDS = 15
+
+
+@app.route("/scrape-linkedin", methods=["POST"])
+async def scrape_linkedin():
+    data = await request.get_json()
+
+    if not data or "url" not in data:
+        return jsonify({"error": "Missing URL in request"}), 400
+
+    url = data["url"]
+    prompt = data["prompt"]
+
+    try:
+        result = await afetch_profile(url, refresh=refresh_mode(data.get("refresh")))
+        if "error" in result:
+            logger.error(f"Error from scraper: {result['error']}")
+            return jsonify({"error": result["error"]}), 500
+
+        email = result.get("email")
+
+        json_response = await agenerate_cold_email(
+            get_gemini_client(), result, prompt, use_cache=not data.get("regenerate")
+        )
+
+        return jsonify(
+            {
+                "email": email,
+                "groq_response": json_response["email_output"],
+                "analysis_rationale": json_response["analysis_rationale"],
+            }
+        )
+
+    except Exception as e:
+        logger.error(f"Error in scrape-linkedin: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/scrape-linkedin/stream", methods=["POST"])
+async def scrape_linkedin_stream():
+    """Streaming /scrape-linkedin over server-sent events"""
+    data = await request.get_json()
+
+    if not data or "url" not in data or "prompt" not in data:
+        return jsonify({"error": "Missing URL or prompt in request"}), 400
+
+    url = data["url"]
+    prompt = data["prompt"]
+    refresh = refresh_mode(data.get("refresh"))
+    use_cache = not data.get("regenerate")
+
+    async def events():
+        try:
+            yield format_sse("stage", {"stage": "scraping"})
+            result = await afetch_profile(url, refresh=refresh)
+            if "error" in result:
+                yield format_sse("error", {"error": result["error"]})
+                return
+
+            yield format_sse("stage", {"stage": "generating"})
+            async for kind, value in astream_cold_email(
+                get_gemini_client(), result, prompt, use_cache=use_cache
+            ):
+                if kind == "delta":
+                    yield format_sse("email_delta", {"text": value})
+                else:
+                    json_response = value
+
+            yield format_sse(
+                "done",
+                {
+                    "email": result.get("email"),
+                    "groq_response": json_response["email_output"],
+                    "analysis_rationale": json_response["analysis_rationale"],
+                },
+            )
+
+        except Exception as e:
+            logger.error(f"Error in scrape-linkedin stream: {str(e)}")
+            yield format_sse("error", {"error": str(e)})
+
+    return Response(events(), mimetype="text/event-stream", headers=SSE_HEADERS)
+
+
+@app.route("/scrape-linkedin-batch", methods=["POST"])
+async def scrape_linkedin_batch():
+    data = await request.get_json()
+
+    if not data or not isinstance(data.get("urls"), list) or not data["urls"]:
+        return jsonify({"error": "Missing urls list in request"}), 400
+
+    urls = [url for url in data["urls"] if isinstance(url, str) and url.strip()]
+    if len(urls) > MAX_BATCH_URLS:
+        return (
+            jsonify({"error": f"Too many URLs, the limit is {MAX_BATCH_URLS}"}),
+            400,
+        )
+
+    try:
+        # A batch is a handful of long actor runs; keep it off the event loop
+        result = json.loads(
+            await asyncio.to_thread(
+                APIFY_LinkedIn_WebScrape_Batch,
+                urls,
+                refresh=refresh_mode(data.get("refresh")),
+            )
+        )
+        if "error" in result:
+            return jsonify({"error": result["error"]}), 500
+
+        profiles = []
+        for url in dict.fromkeys(url.strip() for url in urls):
+            if url in result["results"]:
+                profiles.append({"url": url, "profile": result["results"][url]})
+            else:
+                profiles.append({"url": url, "error": result["errors"].get(url)})
+
+        return jsonify({"profiles": profiles, "failed": len(result["errors"])})
+
+    except Exception as e:
+        logger.error(f"Error in scrape-linkedin-batch: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/improve-email", methods=["POST"])
+async def improve_email_endpoint():
+    data = await request.get_json()
+
+    if not data or "email" not in data or "prompt" not in data:
+        return jsonify({"error": "Missing email or prompt in request"}), 400
+
+    email_content = data["email"]
+    prompt = data["prompt"]
+    recipient_name = data.get("recipient_name", "the recipient")
+    use_cache = not data.get("regenerate")
+
+    try:
+        json_response = await aimprove_email(
+            get_gemini_client(),
+            email_content,
+            recipient_name,
+            prompt,
+            use_cache=use_cache,
+        )
+
+        return jsonify(
+            {
+                "improved_email": json_response["email_output"],
+                "improvement_rationale": json_response["improvement_rationale"],
+            }
+        )
+
+    except Exception as e:
+        logger.error(f"Error in improve-email: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/improve-email/stream", methods=["POST"])
+async def improve_email_stream():
+    """Streaming /improve-email over server-sent events"""
+    data = await request.get_json()
+
+    if not data or "email" not in data or "prompt" not in data:
+        return jsonify({"error": "Missing email or prompt in request"}), 400
+
+    email_content = data["email"]
+    prompt = data["prompt"]
+    recipient_name = data.get("recipient_name", "the recipient")
+    use_cache = not data.get("regenerate")
+
+    async def events():
+        try:
+            async for kind, value in astream_improve_email(
+                get_gemini_client(),
+                email_content,
+                recipient_name,
+                prompt,
+                use_cache=use_cache,
+            ):
+                if kind == "delta":
+                    yield format_sse("email_delta", {"text": value})
+                else:
+                    json_response = value
+
+            yield format_sse(
+                "done",
+                {
+                    "improved_email": json_response["email_output"],
+                    "improvement_rationale": json_response["improvement_rationale"],
+                },
+            )
+
+        except Exception as e:
+            logger.error(f"Error in improve-email stream: {str(e)}")
+            yield format_sse("error", {"error": str(e)})
+
+    return Response(events(), mimetype="text/event-stream", headers=SSE_HEADERS)
+
+
+@app.route("/scrape-linkedin-profile", methods=["POST"])
+async def scrape_linkedin_profile_endpoint():
+    data = await request.get_json()
+
+    if not data or "url" not in data:
+        logger.error("Missing URL in LinkedIn profile scrape request")
+        return jsonify({"error": "Missing URL in request"}), 400
+
+    url = data["url"]
+    logger.info(f"Received request to scrape LinkedIn profile: {url}")
+
+    try:
+        from API_services.linkedin_scraper_service import scrape_linkedin_profile
+
+        # Selenium is blocking; the driver pool bounds how many threads run
+        profile_data = await asyncio.to_thread(
+            scrape_linkedin_profile, url, refresh=refresh_mode(data.get("refresh"))
+        )
+
+        if isinstance(profile_data, dict) and "error" in profile_data:
+            error_message = profile_data["error"]
+            logger.error(f"Error from scraper: {error_message}")
+            return jsonify({"error": error_message}), 500
+
+        # Clients holding the current snapshot get a 304 instead of the payload
+        etag = await asyncio.to_thread(
+            get_profile_cache().etag_for, "selenium", url, profile_data
+        )
+        if request.if_none_match.contains(etag):
+            response = Response("", status=304)
+        else:
+            response = jsonify(profile_data)
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
+
+    except Exception as e:
+        logger.error(f"Unexpected error in scrape-linkedin-profile: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/jobs/scrape-linkedin", methods=["POST"])
+async def enqueue_scrape_linkedin():
+    """Queue /scrape-linkedin work and return a job id immediately"""
+    data = await request.get_json()
+
+    if not data or "url" not in data or "prompt" not in data:
+        return jsonify({"error": "Missing URL or prompt in request"}), 400
+
+    job = get_job_queue().submit(
+        "scrape-linkedin",
+        cold_email_pipeline,
+        get_gemini_client(),
+        data["url"],
+        data["prompt"],
+        refresh=refresh_mode(data.get("refresh")),
+        regenerate=bool(data.get("regenerate")),
+    )
+    return jsonify(_job_links(job)), 202
+
+
+@app.route("/jobs/scrape-linkedin-profile", methods=["POST"])
+async def enqueue_scrape_linkedin_profile():
+    """Queue /scrape-linkedin-profile work and return a job id immediately"""
+    data = await request.get_json()
+
+    if not data or "url" not in data:
+        return jsonify({"error": "Missing URL in request"}), 400
+
+    job = get_job_queue().submit(
+        "scrape-linkedin-profile",
+        profile_pipeline,
+        data["url"],
+        refresh=refresh_mode(data.get("refresh")),
+    )
+    return jsonify(_job_links(job)), 202
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+async def get_job(job_id):
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict())
+
+
+@app.route("/jobs/<job_id>/events", methods=["GET"])
+async def stream_job_events(job_id):
+    """Server-sent events for each stage transition until the job finishes"""
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    async def events():
+        seen = 0
+        while True:
+            new_events = await job.await_event(seen, timeout=SSE_HEARTBEAT_SECONDS)
+            if not new_events:
+                yield SSE_KEEP_ALIVE
+                continue
+            seen += len(new_events)
+            for event in new_events:
+                yield format_sse("stage", event)
+            if job.finished:
+                yield format_sse(job.status, job.to_dict())
+                return
+
+    return Response(events(), mimetype="text/event-stream", headers=SSE_HEADERS)
+
+
+def _job_links(job) -> dict:
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/jobs/{job.id}",
+        "events_url": f"/jobs/{job.id}/events",
+    }
+
+
+@app.route("/campaigns", methods=["POST"])
+async def start_campaign():
+    """
+    Run a campaign over yc.csv as a background job
+
+    Posting again with the same campaign_id (by default derived from the
+    prompt) resumes from that campaign's checkpoint; while it is still
+    running, the post is refused with a 409.
+    """
+    data = await request.get_json()
+
+    if not data or not data.get("prompt"):
+        return jsonify({"error": "Missing prompt in request"}), 400
+
+    campaign_id = (
+        data.get("campaign_id")
+        or hashlib.sha1(data["prompt"].encode("utf-8")).hexdigest()[:12]
+    )
+    if not re.fullmatch(r"[A-Za-z0-9_-]{1,64}", campaign_id):
+        return jsonify({"error": "Invalid campaign_id"}), 400
+    scrape_source = data.get("scrape_source")
+    if scrape_source is not None and scrape_source not in SCRAPE_SOURCES:
+        return jsonify({"error": "Invalid scrape_source"}), 400
+    for name in ("limit", "top_k"):
+        value = data.get(name)
+        if value is not None and (
+            isinstance(value, bool) or not isinstance(value, int) or value < 0
+        ):
+            return jsonify({"error": f"{name} must be a non-negative integer"}), 400
+
+    job = get_job_queue().submit_unique(
+        f"campaign:{campaign_id}",
+        "campaign",
+        run_campaign,
+        get_gemini_client(),
+        data["prompt"],
+        campaign_output_path(campaign_id),
+        limit=data.get("limit"),
+        top_k=data.get("top_k"),
+        scrape_source=scrape_source,
+    )
+    if job is None:
+        return jsonify({"error": f"Campaign {campaign_id} is already running"}), 409
+    return jsonify({"campaign_id": campaign_id, **_job_links(job)}), 202
+
+
+@app.route("/campaigns/<campaign_id>/results", methods=["GET"])
+async def campaign_results(campaign_id):
+    """Results written so far, one JSON object per line"""
+    if not re.fullmatch(r"[A-Za-z0-9_-]{1,64}", campaign_id):
+        return jsonify({"error": "Invalid campaign_id"}), 400
+
+    output_path = campaign_output_path(campaign_id)
+    if not os.path.exists(output_path):
+        return jsonify({"error": "Campaign not found"}), 404
+    return await send_file(output_path, mimetype="application/x-ndjson")
+
+
+@app.route("/leads", methods=["GET"])
+async def query_leads():
+    """
+    Filter yc.csv companies
+
+    Query params: industry (repeatable or comma-separated, all must match),
+    location, founded_min, founded_max, team_size_min, team_size_max,
+    offset and limit.
+    """
+    args = request.args
+    industries = [
+        tag for value in args.getlist("industry") for tag in value.split(",") if tag
+    ]
+
+    try:
+        filters = {
+            name: int(args[name])
+            for name in (
+                "founded_min",
+                "founded_max",
+                "team_size_min",
+                "team_size_max",
+                "offset",
+                "limit",
+            )
+            if args.get(name)
+        }
+    except ValueError:
+        return jsonify({"error": "Numeric filters must be integers"}), 400
+
+    try:
+        # A changed CSV is re-read and re-indexed; keep that off the event loop
+        page = await asyncio.to_thread(
+            get_lead_store().query,
+            industries=industries,
+            location=args.get("location"),
+            **filters,
+        )
+        return jsonify(page), 200
+    except Exception as e:
+        logger.error(f"Error querying leads: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/leads/rank", methods=["POST"])
+async def rank_leads():
+    """Top-k companies for a campaign prompt by TF-IDF relevance"""
+    data = await request.get_json()
+
+    if not data or not data.get("prompt"):
+        return jsonify({"error": "Missing prompt in request"}), 400
+
+    try:
+        k = min(int(data.get("k", 25)), MAX_PAGE_SIZE)
+    except (TypeError, ValueError):
+        return jsonify({"error": "k must be an integer"}), 400
+
+    try:
+        # Deferred: numpy/scipy add noticeably to cold start
+        from API_services.lead_scoring import get_lead_scorer
+
+        results = await asyncio.to_thread(get_lead_scorer().top_k, data["prompt"], k)
+        return jsonify({"results": results}), 200
+    except Exception as e:
+        logger.error(f"Error ranking leads: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/health", methods=["GET"])
+async def health_check():
+    """Endpoint to verify the API is running"""
+    return (
+        jsonify(
+            {
+                "status": "ok",
+                "message": "Service is running",
+                "scrapers": breaker_states(),
+            }
+        ),
+        200,
+    )
+
+
+@app.route("/metrics", methods=["GET"])
+async def prometheus_metrics():
+    """Prometheus scrape endpoint"""
+    return Response(metrics.render_metrics(), content_type=metrics.CONTENT_TYPE)
+
+
+@app.route("/stats", methods=["GET"])
+async def stats():
+    """Cache counters for capacity planning"""
+    # Counting the disk entries is a SQLite query
+    profile_cache = await asyncio.to_thread(get_profile_cache().stats)
+    return (
+        jsonify(
+            {
+                "profile_cache": profile_cache,
+                "coalescing": single_flight_stats(),
+                "generation_cache": get_generation_cache().stats(),
+                "prompt_prefix_cache": get_prefix_cache().stats(),
+                "structured_output": structured_output_stats(),
+                "rate_limits": rate_limit_stats(),
+                "http_pools": client_pool_stats(),
+                "jobs": get_job_queue().stats(),
+                "leads": get_lead_store().stats(),
+                "scrape_farm": scrape_farm_stats(),
+            }
+        ),
+        200,
+    )
@@ -0,0 +1,102 @@
+"""
+Per-scrape footprint of the "full" and "lean" browser modes
+
+Opens the same pages with a real Chrome in each mode and reports the bytes
+transferred per page, the resident memory of chromedriver plus Chrome, and
+the size of the user-data directory when the browser is closed:
+
+    python benchmarks/browser_footprint.py \
+        --urls https://www.linkedin.com/in/some-founder --login
+
+Without --login the pages are opened signed out, which is enough to compare
+public pages. Needs Chrome and chromedriver (or CHROMEDRIVER) installed.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+
+def _median(values: list) -> float:
+    values = [v for v in values if v is not None]
+    return round(statistics.median(values), 1) if values else None
+
+
+def measure(mode: str, urls: list, login: bool) -> dict:
+    from API_services.browser_profiles import dir_size
+    from API_services.driver_pool import DriverPool, launch_driver
+
+    pool = None
+    if login:
+        pool = DriverPool(size=1, mode=mode)
+        lease_context = pool.acquire()
+        pooled = lease_context.__enter__()
+    else:
+        pooled = launch_driver(mode=mode)
+
+    samples = []
+    try:
+        for url in urls:
+            pooled.driver.get(url)
+            samples.append(pooled.footprint())
+        profile_bytes = dir_size(pooled.user_data_dir)
+    finally:
+        if pool is not None:
+            lease_context.__exit__(None, None, None)
+            pool.close()
+        else:
+            pooled.close()
+
+    return {
+        "pages": len(samples),
+        "transfer_kb_median": _median(
+            [
+                s["transfer_bytes"] / 1024 if s["transfer_bytes"] else None
+                for s in samples
+            ]
+        ),
+        "browser_rss_mb_median": _median([s["browser_rss_mb"] for s in samples]),
+        "browser_rss_mb_last": samples[-1]["browser_rss_mb"] if samples else None,
+        "profile_dir_mb": round(profile_bytes / (1024 * 1024), 1),
+        "profile_dir_removed": not os.path.exists(pooled.user_data_dir),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Browser footprint benchmark")
+    parser.add_argument(
+        "--urls", required=True, help="Comma-separated pages to open in each mode"
+    )
+    parser.add_argument(
+        "--login",
+        action="store_true",
+        help="Log in with LINKEDIN_EMAIL / LINKEDIN_PASSWORD first",
+    )
+    parser.add_argument("--modes", default="full,lean", help="Modes to compare")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    urls = [url.strip() for url in args.urls.split(",") if url.strip()]
+    report = {
+        "python": platform.python_version(),
+        "modes": {
+            mode: measure(mode, urls, args.login)
+            for mode in (m.strip() for m in args.modes.split(","))
+            if mode
+        },
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
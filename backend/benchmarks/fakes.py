@@ -0,0 +1,434 @@
+"""
+Local stand-ins for Apify, Gemini and Chrome used by the offline benchmark
+
+The Apify and Gemini fakes are real HTTP servers speaking just enough of
+each API for apify_client and google-genai, so requests go through the
+same client code as in production. The browser fake is swapped in at the
+webdriver level and serves recorded_profile.html.
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlparse
+import gzip
+import html
+import itertools
+import json
+import os
+import random
+import re
+import threading
+import time
+
+RECORDED_PROFILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "recorded_profile.html"
+)
+
+
+def _slug(url: str) -> str:
+    # /in/<slug>/ and its /in/<slug>/details/<section>/ pages
+    parts = [part for part in urlparse(url).path.split("/") if part]
+    if "in" in parts and parts.index("in") + 1 < len(parts):
+        return parts[parts.index("in") + 1]
+    return parts[-1] if parts else "someone"
+
+
+def _display_name(slug: str) -> str:
+    return " ".join(part.capitalize() for part in slug.split("-")[:2])
+
+
+def _jitter(mean: float) -> float:
+    return random.uniform(0.5 * mean, 1.5 * mean) if mean > 0 else 0.0
+
+
+class _FakeServer:
+    """ThreadingHTTPServer on an ephemeral port, served from a daemon thread"""
+
+    handler = None
+
+    def __init__(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _body(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length)
+                # apify_client gzips request bodies
+                if self.headers.get("Content-Encoding") == "gzip":
+                    raw = gzip.decompress(raw)
+                return json.loads(raw or b"null")
+
+            def _send(self, status: int, payload, headers: dict = None):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self.json_body = None
+                fake.handle(self, "GET")
+
+            def do_POST(self):
+                # Read the body up front so keep-alive connections stay in sync
+                self.json_body = self._body()
+                fake.handle(self, "POST")
+
+        return Handler
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class FakeApifyServer(_FakeServer):
+    """
+    Actor runs, run status and dataset items for the LinkedIn profile actor
+
+    A run "takes" `actor_latency` seconds (inside the start call) and
+    yields one item per input URL.
+    """
+
+    def __init__(self, actor_latency: float = 0.5):
+        super().__init__()
+        self.actor_latency = actor_latency
+        self._ids = itertools.count(1)
+        self._runs = {}
+        self._datasets = {}
+        self._lock = threading.Lock()
+
+    def handle(self, request, method: str):
+        parsed = urlparse(request.path)
+        parts = parsed.path.strip("/").split("/")
+
+        if method == "POST" and parts[:2] == ["v2", "acts"] and parts[-1] == "runs":
+            run_input = request.json_body or {}
+            time.sleep(_jitter(self.actor_latency))
+            run_id = f"run{next(self._ids)}"
+            items = [
+                {
+                    "linkedinUrl": url,
+                    "fullName": _display_name(_slug(url)),
+                    "headline": "Co-founder & CEO",
+                    "about": "Building tools that help small teams ship faster.",
+                    "email": f"{_slug(url)}@example.com",
+                }
+                for url in run_input.get("profileUrls", [])
+            ]
+            run = {"id": run_id, "status": "SUCCEEDED", "defaultDatasetId": run_id}
+            with self._lock:
+                self._runs[run_id] = run
+                self._datasets[run_id] = items
+            return request._send(201, {"data": run})
+
+        if method == "GET" and parts[:2] == ["v2", "actor-runs"]:
+            run = self._runs.get(parts[2])
+            if run is None:
+                return request._send(404, {"error": {"type": "record-not-found"}})
+            return request._send(200, {"data": run})
+
+        if method == "GET" and parts[:2] == ["v2", "datasets"] and parts[-1] == "items":
+            query = parse_qs(parsed.query)
+            items = self._datasets.get(parts[2], [])
+            offset = int(query.get("offset", ["0"])[0])
+            limit = int(query.get("limit", [str(len(items))])[0])
+            page = items[offset : offset + limit]
+            return request._send(
+                200,
+                page,
+                {
+                    "x-apify-pagination-total": str(len(items)),
+                    "x-apify-pagination-offset": str(offset),
+                    "x-apify-pagination-limit": str(limit),
+                    "x-apify-pagination-desc": "",
+                },
+            )
+
+        request._send(404, {"error": {"type": "page-not-found"}})
+
+
+class FakeGeminiServer(_FakeServer):
+    """
+    generateContent for any model, honouring the requested response schema
+
+    `malformed_rate` of first-pass generations come back either wrapped in
+    prose and code fences (repaired locally) or truncated (needs a repair
+    call); for packed requests it is the rate at which a lead is left out of
+    the response. Cached-content creation is refused, as it is for prompts
+    below the real API's minimum cacheable size.
+    """
+
+    def __init__(self, latency: float = 0.8, malformed_rate: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.malformed_rate = malformed_rate
+        self.calls = 0
+
+    def _packed_output(self, spec: dict, contents: str) -> list:
+        # One entry per "lead_id" line, addressed to that lead
+        entries = []
+        for line in contents.split("\n"):
+            if not line.startswith('{"lead_id"'):
+                continue
+            lead = json.loads(line)
+            if random.random() < self.malformed_rate:
+                continue
+            entry = self._output(spec["items"])
+            entry["lead_id"] = lead["lead_id"]
+            entry["email_output"] = entry["email_output"].replace(
+                "Alex", (lead.get("name") or "there").split()[0]
+            )
+            entries.append(entry)
+        return entries
+
+    def _output(self, schema: dict, contents: str = "") -> dict:
+        output = {}
+        for name, spec in (schema or {}).get("properties", {}).items():
+            items = spec.get("items") or {}
+            if str(items.get("type", "")).upper() == "OBJECT":
+                output[name] = self._packed_output(spec, contents)
+            elif str(spec.get("type", "")).upper() == "ARRAY":
+                output[name] = [
+                    "Recent role change suggests an active buying window",
+                    "Their team size matches the product's sweet spot",
+                ]
+            else:
+                output[name] = (
+                    "Dear Alex,\n\nI noticed your team recently launched a new "
+                    "product. We help founders cut onboarding time in half. "
+                    "Would you be open to a quick call next week?"
+                )
+        return output
+
+    def handle(self, request, method: str):
+        path = urlparse(request.path).path
+        if method == "POST" and path.endswith("/cachedContents"):
+            return request._send(
+                400,
+                {
+                    "error": {
+                        "code": 400,
+                        "message": "Cached content is too small",
+                        "status": "INVALID_ARGUMENT",
+                    }
+                },
+            )
+        if method != "POST" or not path.endswith(":generateContent"):
+            return request._send(404, {"error": {"code": 404, "status": "NOT_FOUND"}})
+
+        body = request.json_body or {}
+        self.calls += 1
+        time.sleep(_jitter(self.latency))
+        schema = body.get("generationConfig", {}).get("responseSchema")
+        contents = "\n".join(
+            part.get("text", "")
+            for content in body.get("contents", [])
+            for part in content.get("parts", [])
+        )
+        text = json.dumps(self._output(schema, contents))
+
+        is_repair = "Malformed output" in contents
+        is_packed = '{"lead_id"' in contents
+        if not (is_repair or is_packed) and random.random() < self.malformed_rate:
+            if random.random() < 0.5:
+                text = f"Here is the email you asked for:\n```json\n{text}\n```"
+            else:
+                text = text[: len(text) // 2]
+
+        prompt_tokens = len(json.dumps(body)) // 4
+        output_tokens = len(text) // 4
+        request._send(
+            200,
+            {
+                "candidates": [
+                    {
+                        "content": {"role": "model", "parts": [{"text": text}]},
+                        "finishReason": "STOP",
+                        "index": 0,
+                    }
+                ],
+                "usageMetadata": {
+                    "promptTokenCount": prompt_tokens,
+                    "candidatesTokenCount": output_tokens,
+                    "totalTokenCount": prompt_tokens + output_tokens,
+                },
+                "modelVersion": "gemini-2.0-flash",
+            },
+        )
+
+
+class _FakeElement:
+    def __init__(self, text: str = ""):
+        self.text = text
+
+
+class FakeWebDriver:
+    """
+    The subset of the Chrome WebDriver API the scraper uses
+
+    Every profile URL serves recorded_profile.html with the name and
+    company filled in from the URL slug.
+    """
+
+    navigate_latency = 0.3
+    _template = None
+
+    def __init__(self, service=None, options=None):
+        self.current_url = "about:blank"
+        self.title = ""
+        self.page_source = "<html></html>"
+
+    @classmethod
+    def _page(cls, slug: str) -> str:
+        if cls._template is None:
+            with open(RECORDED_PROFILE, encoding="utf-8") as f:
+                cls._template = f.read()
+        name = _display_name(slug)
+        return cls._template.replace("{name}", name).replace(
+            "{company}", f"{name.split()[0]} Labs"
+        )
+
+    def set_page_load_timeout(self, seconds):
+        pass
+
+    def get(self, url: str):
+        time.sleep(_jitter(self.navigate_latency))
+        self.current_url = url
+        if "/details/" in url:
+            # Only the one section, as on LinkedIn's "Show all" pages
+            section = urlparse(url).path.rstrip("/").rsplit("/", 1)[-1]
+            match = re.search(
+                rf'<section id="{section}">.*?</section>', self._page(_slug(url)), re.S
+            )
+            if match:
+                self.page_source = (
+                    f"<html><body><main>{match.group(0)}</main></body></html>"
+                )
+                self.title = f"{_display_name(_slug(url))} | LinkedIn"
+            else:
+                self.page_source = "<html><body><h1>Page not found</h1></body></html>"
+                self.title = "Page not found | LinkedIn"
+        elif "/in/" in url:
+            self.page_source = self._page(_slug(url))
+            self.title = f"{_display_name(_slug(url))} | LinkedIn"
+        else:
+            self.page_source = '<nav><a class="global-nav__primary-link"></a></nav>'
+            self.title = "Feed | LinkedIn"
+
+    def find_elements(self, by, value):
+        if value == "main section":
+            count = self.page_source.count("<section")
+            return [_FakeElement() for _ in range(count)]
+        selector = value.lstrip(".").split()[-1]
+        return [_FakeElement()] if selector in self.page_source else []
+
+    def find_element(self, by, value):
+        elements = self.find_elements(by, value)
+        if not elements:
+            raise LookupError(f"No element for {value}")
+        return elements[0]
+
+    def execute_script(self, script, *args):
+        if "readyState" in script:
+            return "complete"
+        if "transferSize" in script:
+            return len(self.page_source.encode("utf-8"))
+        return None
+
+    def execute_cdp_cmd(self, cmd, cmd_args):
+        return {}
+
+    def quit(self):
+        pass
+
+
+_SPAN = re.compile(r'<span class="([\w-]+)"[^>]*>(.*?)</span>', re.S)
+
+
+class RecordedPerson:
+    """Stand-in for linkedin_scraper.Person that reads the recorded page"""
+
+    scrape_latency = 0.5
+
+    def __init__(self, linkedin_url=None, driver=None, get=True, scrape=True, **kw):
+        self.linkedin_url = linkedin_url
+        self.driver = driver
+        self.interests = []
+        self.accomplishments = []
+
+    def _items(self, section: str) -> list:
+        match = re.search(
+            rf'<section id="{section}">(.*?)</section>', self.driver.page_source, re.S
+        )
+        items = []
+        for block in re.findall(
+            r"<li[^>]*>(.*?)</li>", match.group(1) if match else "", re.S
+        ):
+            spans = {
+                cls: html.unescape(text.strip()) for cls, text in _SPAN.findall(block)
+            }
+            items.append(spans)
+        return items
+
+    def scrape(self, close_on_complete=True):
+        time.sleep(_jitter(self.scrape_latency))
+        source = self.driver.page_source
+        name = re.search(r'class="text-heading-xlarge">(.*?)<', source)
+        about = re.search(r'<span aria-hidden="true">(.*?)</span>', source, re.S)
+        self.name = html.unescape(name.group(1)) if name else None
+        self.about = html.unescape(about.group(1).strip()) if about else ""
+        self.experiences = [
+            SimpleNamespace(
+                position_title=item.get("t-bold", ""),
+                institution_name=item.get("t-normal", ""),
+                date_range=item.get("pvs-entity__caption-wrapper", ""),
+                description="",
+            )
+            for item in self._items("experience")
+        ]
+        self.educations = [
+            SimpleNamespace(
+                institution_name=item.get("t-bold", ""),
+                degree=item.get("t-normal", ""),
+                date_range=item.get("pvs-entity__caption-wrapper", ""),
+            )
+            for item in self._items("education")
+        ]
+
+
+def _fake_login(driver, email, password):
+    driver.get("https://www.linkedin.com/feed/")
+
+
+def install_fake_browser(navigate_latency: float = 0.3, scrape_latency: float = 0.5):
+    """Route the driver pool and scraper to FakeWebDriver / RecordedPerson"""
+    from API_services import driver_pool, linkedin_scraper_service
+
+    FakeWebDriver.navigate_latency = navigate_latency
+    RecordedPerson.scrape_latency = scrape_latency
+    os.environ.setdefault("CHROMEDRIVER", "/dev/null")
+    driver_pool.webdriver = SimpleNamespace(Chrome=FakeWebDriver)
+    driver_pool.actions = SimpleNamespace(login=_fake_login)
+    linkedin_scraper_service.Person = RecordedPerson
@@ -0,0 +1,123 @@
+"""
+Scaling benchmark for the Selenium scrape farm
+
+Runs the same batch of profiles through ScrapeFarm with an increasing
+number of worker processes, each driving the fake Chrome from fakes.py,
+and reports throughput and speedup over a single worker:
+
+    python benchmarks/farm_bench.py --profiles 40 --workers 1,2,4 \
+        --navigate-latency 0.3 --scrape-latency 0.5 --output farm.json
+
+Worker start-up and login are timed separately from the batch, and every
+run uses fresh profile URLs so the profile cache never answers.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+
+def run(workers: int, profiles: int, args, offset: int) -> dict:
+    from API_services.scrape_farm import ScrapeFarm
+    from benchmarks.fakes import install_fake_browser
+
+    farm = ScrapeFarm(
+        workers=workers,
+        max_tasks=args.max_tasks,
+        initializer=install_fake_browser,
+        initargs=(args.navigate_latency, args.scrape_latency),
+    )
+    try:
+        started = time.perf_counter()
+        # One scrape per worker so every browser is up and logged in
+        farm.scrape_many(
+            [
+                f"https://www.linkedin.com/in/farm-warmup-{offset + i}"
+                for i in range(farm.workers)
+            ]
+        )
+        warm = time.perf_counter() - started
+
+        urls = [
+            f"https://www.linkedin.com/in/farm-founder-{offset + i}"
+            for i in range(profiles)
+        ]
+        started = time.perf_counter()
+        result = farm.scrape_many(urls)
+        wall = time.perf_counter() - started
+        stats = farm.stats()
+    finally:
+        farm.close()
+
+    return {
+        "workers": farm.workers,
+        "profiles": profiles,
+        "errors": len(result["errors"]),
+        "startup_seconds": round(warm, 2),
+        "wall_seconds": round(wall, 2),
+        "profiles_per_second": round(len(result["results"]) / wall, 2),
+        "worker_rss_mb": stats["worker_rss_mb"],
+        "crashes": stats["crashes"],
+        "recycled": stats["recycled_max_tasks"] + stats["recycled_memory"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape farm scaling benchmark")
+    parser.add_argument("--profiles", type=int, default=40, help="Profiles per run")
+    parser.add_argument(
+        "--workers", default="1,2,4", help="Comma-separated worker counts"
+    )
+    parser.add_argument("--navigate-latency", type=float, default=0.3)
+    parser.add_argument("--scrape-latency", type=float, default=0.5)
+    parser.add_argument(
+        "--max-tasks", type=int, default=None, help="Recycle workers after N scrapes"
+    )
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    cache_dir = tempfile.mkdtemp(prefix="workly-farm-bench-")
+    # Inherited by the spawned workers
+    os.environ.update(
+        {
+            "PROFILE_CACHE_PATH": os.path.join(cache_dir, "profiles.sqlite3"),
+            "LINKEDIN_EMAIL": "bench@example.com",
+            "LINKEDIN_PASSWORD": "bench",
+            "LINKEDIN_JITTER": "off",
+            "RATE_LIMIT_LINKEDIN_RPS": "1000",
+            "TRACE_EXPORTER": "off",
+        }
+    )
+
+    runs = []
+    for index, workers in enumerate(int(w) for w in args.workers.split(",")):
+        runs.append(run(workers, args.profiles, args, offset=index * 100000))
+    baseline = runs[0]["profiles_per_second"]
+    for result in runs:
+        result["speedup"] = (
+            round(result["profiles_per_second"] / baseline, 2) if baseline else None
+        )
+
+    report = {
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "navigate_latency": args.navigate_latency,
+        "scrape_latency": args.scrape_latency,
+        "runs": runs,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
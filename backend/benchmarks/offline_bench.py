@@ -0,0 +1,221 @@
+"""
+Offline benchmark for the Flask API
+
+Starts local fakes for Apify, Gemini and Chrome, serves app.py on an
+ephemeral port and drives /scrape-linkedin, /improve-email and
+/scrape-linkedin-profile at a fixed concurrency. Results are printed (or
+written with --output) as JSON so runs can be compared across commits:
+
+    python benchmarks/offline_bench.py --requests 200 --concurrency 16 \
+        --gemini-latency 0.8 --malformed-rate 0.1 --output bench.json
+
+Every request uses a distinct profile URL and prompt, so the profile and
+generation caches never short-circuit the measured path.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+ENDPOINTS = ("/scrape-linkedin", "/improve-email", "/scrape-linkedin-profile")
+
+
+def _percentile(ordered: list, fraction: float) -> float:
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return round(ordered[index] * 1000, 1)
+
+
+def _payload(endpoint: str, i: int) -> dict:
+    url = f"https://www.linkedin.com/in/bench-founder-{i}"
+    if endpoint == "/scrape-linkedin":
+        return {
+            "url": url,
+            "prompt": f"Offer #{i}: onboarding automation for seed teams",
+        }
+    if endpoint == "/improve-email":
+        return {
+            "email": f"Dear Alex, we build onboarding tools (draft {i}).",
+            "recipient_name": "Alex",
+            "prompt": "Make it shorter and friendlier",
+        }
+    return {"url": url}
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BACKEND_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def run_endpoint(
+    base_url: str, endpoint: str, requests: int, concurrency: int, offset: int
+) -> dict:
+    import requests as http
+
+    local = threading.local()
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def call(i: int):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = http.Session()
+        started = time.perf_counter()
+        try:
+            response = session.post(
+                base_url + endpoint, json=_payload(endpoint, offset + i), timeout=300
+            )
+            ok = response.status_code == 200 and "error" not in response.json()
+        except Exception:
+            ok = False
+        elapsed = time.perf_counter() - started
+        with lock:
+            (latencies if ok else errors).append(elapsed)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(call, range(requests)))
+    wall = time.perf_counter() - started
+
+    ordered = sorted(latencies)
+    return {
+        "requests": requests,
+        "errors": len(errors),
+        "p50_ms": _percentile(ordered, 0.50),
+        "p95_ms": _percentile(ordered, 0.95),
+        "p99_ms": _percentile(ordered, 0.99),
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else None,
+        "wall_seconds": round(wall, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline API benchmark")
+    parser.add_argument(
+        "--requests", type=int, default=100, help="Requests per endpoint"
+    )
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument(
+        "--endpoints",
+        default=",".join(ENDPOINTS),
+        help="Comma-separated subset of " + ", ".join(ENDPOINTS),
+    )
+    parser.add_argument(
+        "--apify-latency", type=float, default=0.5, help="Seconds per actor run"
+    )
+    parser.add_argument(
+        "--gemini-latency", type=float, default=0.8, help="Seconds per generation"
+    )
+    parser.add_argument(
+        "--malformed-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of generations returned malformed (0-1)",
+    )
+    parser.add_argument(
+        "--navigate-latency", type=float, default=0.3, help="Seconds per page load"
+    )
+    parser.add_argument(
+        "--scrape-latency",
+        type=float,
+        default=0.5,
+        help="Seconds per live-DOM profile scrape (LINKEDIN_EXTRACTOR=person)",
+    )
+    parser.add_argument(
+        "--keep-rate-limits",
+        action="store_true",
+        help="Keep the production upstream rate limits instead of lifting them",
+    )
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    from benchmarks.fakes import FakeApifyServer, FakeGeminiServer, install_fake_browser
+
+    apify = FakeApifyServer(args.apify_latency).start()
+    gemini = FakeGeminiServer(args.gemini_latency, args.malformed_rate).start()
+    workdir = tempfile.mkdtemp(prefix="workly-bench-")
+
+    # Must be in place before the app and its service modules are imported
+    os.environ.update(
+        {
+            "APIFY_API_TOKEN": "bench",
+            "APIFY_API_URL": apify.url,
+            "GOOGLE_API_KEY": "bench",
+            "GEMINI_BASE_URL": gemini.url,
+            "LINKEDIN_EMAIL": "bench@example.com",
+            "LINKEDIN_PASSWORD": "bench",
+            "LINKEDIN_JITTER": "off",
+            "PROFILE_CACHE_PATH": os.path.join(workdir, "profiles.sqlite3"),
+            "SCRAPE_SOURCES": "apify",
+        }
+    )
+    if not args.keep_rate_limits:
+        for name in ("GEMINI", "APIFY", "LINKEDIN"):
+            os.environ[f"RATE_LIMIT_{name}_RPS"] = "100000"
+            os.environ[f"RATE_LIMIT_{name}_CONCURRENCY"] = "100000"
+
+    import logging
+
+    logging.disable(logging.WARNING)
+    install_fake_browser(args.navigate_latency, args.scrape_latency)
+
+    from werkzeug.serving import make_server
+    from app import app
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    results = {}
+    endpoints = [name.strip() for name in args.endpoints.split(",") if name.strip()]
+    for index, endpoint in enumerate(endpoints):
+        results[endpoint] = run_endpoint(
+            base_url, endpoint, args.requests, args.concurrency, index * args.requests
+        )
+
+    server.shutdown()
+    apify.stop()
+    gemini.stop()
+
+    report = {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "gemini_calls": gemini.calls,
+        "endpoints": results,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
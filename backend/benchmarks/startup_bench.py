@@ -0,0 +1,130 @@
+"""
+Cold start benchmark for the Flask and Quart apps
+
+Each run starts a fresh interpreter, imports the app module and serves one
+/health request through the test client, timing both. Heavy dependencies
+that were loaded along the way are reported so a regression (say, a new
+module-level import of google.genai) shows up next to the timing:
+
+    python benchmarks/startup_bench.py --runs 5 --output startup.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that should only be imported by the routes that need them
+HEAVY_MODULES = (
+    "google.genai",
+    "apify_client",
+    "selenium",
+    "webdriver_manager",
+    "linkedin_scraper",
+    "numpy",
+    "scipy",
+)
+
+# Runs inside the child interpreter; prints a single JSON line
+_PROBE = """
+import asyncio, json, sys, time
+started = time.perf_counter()
+import {module} as target
+imported = time.perf_counter()
+client = target.app.test_client()
+if {is_async}:
+    response = asyncio.run(client.get("/health"))
+else:
+    response = client.get("/health")
+served = time.perf_counter()
+print(json.dumps({{
+    "import_ms": (imported - started) * 1000,
+    "health_ms": (served - imported) * 1000,
+    "status": response.status_code,
+    "loaded": [name for name in {heavy!r} if name in sys.modules],
+}}))
+"""
+
+
+def _parse_importtime(stderr: str, top: int) -> list:
+    """Slowest modules by cumulative import time from -X importtime output"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        rows.append((int(cumulative), name.strip()))
+    rows.sort(reverse=True)
+    return [{"module": name, "ms": round(us / 1000, 1)} for us, name in rows[:top]]
+
+
+def measure(module: str, runs: int, top: int) -> dict:
+    probe = _PROBE.format(module=module, is_async=module == "asgi", heavy=HEAVY_MODULES)
+    env = dict(os.environ)
+    env.setdefault("GOOGLE_API_KEY", "startup-bench")
+
+    samples, breakdown = [], []
+    for run in range(runs):
+        # Only the first run pays for -X importtime's own overhead
+        flags = ["-X", "importtime"] if run == 0 else []
+        completed = subprocess.run(
+            [sys.executable, *flags, "-c", probe],
+            cwd=BACKEND_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        samples.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+        if run == 0:
+            breakdown = _parse_importtime(completed.stderr, top)
+
+    measured = samples[1:] or samples
+    return {
+        "runs": runs,
+        "import_ms_median": round(
+            statistics.median(s["import_ms"] for s in measured), 1
+        ),
+        "health_ms_median": round(
+            statistics.median(s["health_ms"] for s in measured), 1
+        ),
+        "health_status": samples[-1]["status"],
+        "heavy_modules_loaded": samples[-1]["loaded"],
+        "slowest_imports": breakdown,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold start benchmark")
+    parser.add_argument(
+        "--runs", type=int, default=5, help="Fresh interpreters per app"
+    )
+    parser.add_argument("--apps", default="app,asgi", help="Comma-separated modules")
+    parser.add_argument(
+        "--top", type=int, default=10, help="Slowest imports to list per app"
+    )
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = {
+        "python": platform.python_version(),
+        "apps": {
+            module.strip(): measure(module.strip(), args.runs, args.top)
+            for module in args.apps.split(",")
+            if module.strip()
+        },
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Run a cold email campaign over the YC founders dataset
+
+    python campaign_runner.py --prompt "We help seed-stage teams ..." \
+        --output campaign.jsonl
+
+Re-running with the same --output resumes from its checkpoint file; the
+results file ends up with one row per lead, its latest outcome.
+"""
+
+import os
+import sys
+import argparse
+import logging
+
+# Add the current directory to the path so we can import modules correctly
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from API_services.config import load_config
+
+# Before the service imports, some of which read settings at import time
+load_config()
+
+from API_services.campaigns import SCRAPE_SOURCES, CampaignRunningError, run_campaign
+from API_services.clients import get_gemini_client
+from API_services.leads import DEFAULT_LEADS_CSV
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a bulk email campaign")
+    parser.add_argument("--prompt", required=True, help="Campaign prompt")
+    parser.add_argument(
+        "--output", required=True, help="JSONL results file (resumable)"
+    )
+    parser.add_argument(
+        "--csv", default=DEFAULT_LEADS_CSV, help="Leads CSV (default: yc.csv)"
+    )
+    parser.add_argument("--scrape-concurrency", type=int, default=None)
+    parser.add_argument("--generate-concurrency", type=int, default=None)
+    parser.add_argument("--scrape-batch-size", type=int, default=None)
+    parser.add_argument(
+        "--limit", type=int, default=None, help="Process at most N new leads"
+    )
+    parser.add_argument(
+        "--top-k",
+        type=int,
+        default=None,
+        help="Only run founders of the K companies most relevant to the prompt",
+    )
+    parser.add_argument(
+        "--scrape-source",
+        choices=SCRAPE_SOURCES,
+        default=None,
+        help="apify (default) or selenium, which uses the browser farm",
+    )
+    parser.add_argument(
+        "--no-pack",
+        action="store_true",
+        help="One Gemini request per lead instead of packing several leads",
+    )
+    args = parser.parse_args()
+
+    try:
+        summary = run_campaign(
+            get_gemini_client(),
+            args.prompt,
+            args.output,
+            csv_path=args.csv,
+            scrape_concurrency=args.scrape_concurrency,
+            generate_concurrency=args.generate_concurrency,
+            scrape_batch_size=args.scrape_batch_size,
+            limit=args.limit,
+            top_k=args.top_k,
+            scrape_source=args.scrape_source,
+            pack_leads=False if args.no_pack else None,
+        )
+    except CampaignRunningError as e:
+        print(f"Not started: {str(e)}")
+        sys.exit(1)
+    print(
+        f"Done: {summary['succeeded']} succeeded, {summary['failed']} failed, "
+        f"{summary['skipped']} already finished -> {summary['output_path']}"
+    )
+
+
+if __name__ == "__main__":
+    main()
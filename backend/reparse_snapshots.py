@@ -0,0 +1,68 @@
+"""
+Re-parse saved profile snapshots with the current parser
+
+    python reparse_snapshots.py                      # every snapshot
+    python reparse_snapshots.py --url https://www.linkedin.com/in/someone
+    python reparse_snapshots.py path/to/snapshot.json.gz --show
+
+Each snapshot keeps the profile that was parsed when it was captured; any
+snapshot whose re-parsed profile differs is listed with the changed fields
+and the exit status is 1, so parser changes can be checked against real
+pages before they ship.
+"""
+
+import os
+import sys
+import argparse
+import json
+
+# Add the current directory to the path so we can import modules correctly
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from API_services.config import load_config
+
+load_config()
+
+from API_services.profile_snapshots import load_snapshot, reparse, snapshot_paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-parse profile snapshots")
+    parser.add_argument("paths", nargs="*", help="Snapshot files (default: all)")
+    parser.add_argument("--url", default=None, help="Only this profile's snapshots")
+    parser.add_argument(
+        "--latest", action="store_true", help="Only the newest snapshot per profile"
+    )
+    parser.add_argument(
+        "--show", action="store_true", help="Print every re-parsed profile"
+    )
+    args = parser.parse_args()
+
+    paths = args.paths or snapshot_paths(args.url)
+    if args.latest:
+        newest = {}
+        for path in paths:
+            newest.setdefault(os.path.dirname(path), path)
+        paths = list(newest.values())
+
+    changed = 0
+    for path in paths:
+        snapshot = load_snapshot(path)
+        profile = reparse(snapshot)
+        fields = [
+            key
+            for key in profile
+            if profile.get(key) != (snapshot.get("profile") or {}).get(key)
+        ]
+        if fields:
+            changed += 1
+            print(f"CHANGED {snapshot['url']} ({path}): {', '.join(fields)}")
+        if args.show:
+            print(json.dumps(profile, indent=2))
+
+    print(f"{len(paths)} snapshots re-parsed, {changed} changed")
+    sys.exit(1 if changed else 0)
+
+
+if __name__ == "__main__":
+    main()
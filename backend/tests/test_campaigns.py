@@ -0,0 +1,23 @@
+import pytest
+
+from API_services import campaigns
+
+
+def _fail(path):
+    raise UnicodeDecodeError("utf-8", b"\xff", 0, 1, "invalid start byte")
+
+
+def test_checkpoint_lock_is_released_when_loading_fails(tmp_path, monkeypatch):
+    output = str(tmp_path / "campaign.jsonl")
+    csv_path = tmp_path / "leads.csv"
+    csv_path.write_text("Company Name,Founder Name,Founder LinkedIn \n")
+    monkeypatch.setattr(campaigns, "_load_checkpoint", _fail)
+
+    with pytest.raises(UnicodeDecodeError) as failure:
+        campaigns.run_campaign(None, "prompt", output, csv_path=str(csv_path))
+
+    # A run that failed to start must not keep the campaign locked, even
+    # while its frames are still referenced by the traceback
+    writer = campaigns._ResultWriter(output, f"{output}.checkpoint")
+    writer.close()
+    assert failure.value
@@ -0,0 +1,43 @@
+import threading
+import time
+
+from API_services.jobs import JobQueue
+
+
+def _wait(job, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not job.finished and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return job.finished
+
+
+def test_campaigns_do_not_hold_up_interactive_jobs():
+    queue = JobQueue(workers=1, campaign_workers=1)
+    release = threading.Event()
+
+    def campaign(report):
+        release.wait(5)
+        return "campaign"
+
+    campaigns = [
+        queue.submit_unique(f"campaign:{i}", "campaign", campaign) for i in range(3)
+    ]
+    scrape = queue.submit("scrape-linkedin", lambda report: "scraped")
+
+    assert _wait(scrape) and scrape.result == "scraped"
+    assert not any(job.finished for job in campaigns)
+    release.set()
+    assert all(_wait(job) for job in campaigns)
+
+
+def test_submit_unique_refuses_a_running_key():
+    queue = JobQueue(workers=1, campaign_workers=1)
+    release = threading.Event()
+
+    first = queue.submit_unique(
+        "campaign:a", "campaign", lambda report: release.wait(5)
+    )
+    assert queue.submit_unique("campaign:a", "campaign", lambda report: None) is None
+    release.set()
+    assert _wait(first)
+    assert queue.submit_unique("campaign:a", "campaign", lambda report: None)
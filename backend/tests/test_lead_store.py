@@ -0,0 +1,65 @@
+import csv
+import os
+
+from API_services.lead_store import LeadStore
+
+FIELDS = [
+    "Company Name",
+    "Website",
+    "Company Description",
+    "Industry",
+    "Founder Name",
+    "Founder LinkedIn ",
+    "Founded",
+    "Team Size",
+    "Location",
+    "Socials",
+]
+
+
+def _store(tmp_path, rows) -> LeadStore:
+    path = tmp_path / "leads.csv"
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({field: row.get(field, "") for field in FIELDS})
+    return LeadStore(str(path))
+
+
+def _names(result) -> list:
+    return [row["company"] for row in result["results"]]
+
+
+def test_location_matches_every_listed_place(tmp_path):
+    store = _store(
+        tmp_path,
+        [
+            {"Company Name": "Hybrid", "Location": "San Francisco, CA, US / Remote"},
+            {"Company Name": "Dual", "Location": "London, UK / New York, NY, US"},
+            {"Company Name": "Local", "Location": "San Francisco"},
+        ],
+    )
+
+    assert _names(store.query(location="remote")) == ["Hybrid"]
+    assert _names(store.query(location="San Francisco")) == ["Hybrid", "Local"]
+    assert _names(store.query(location="london")) == ["Dual"]
+    assert _names(store.query(location="us")) == ["Hybrid", "Dual"]
+    assert _names(store.query(location="san francisco, ca, us / remote")) == ["Hybrid"]
+
+
+def test_filters_intersect_and_reload(tmp_path):
+    store = _store(
+        tmp_path,
+        [
+            {"Company Name": "A", "Industry": "Gen AI, saas", "Founded": "2021"},
+            {"Company Name": "B", "Industry": "saas", "Founded": "2023"},
+        ],
+    )
+    assert _names(store.query(industries=["saas"], founded_min=2022)) == ["B"]
+    assert _names(store.query(industries=["gen-ai"])) == ["A"]
+
+    stat = os.stat(store.csv_path)
+    _store(tmp_path, [{"Company Name": "C", "Industry": "saas"}])
+    os.utime(store.csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert _names(store.query(industries=["saas"])) == ["C"]
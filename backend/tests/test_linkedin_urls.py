@@ -0,0 +1,33 @@
+from API_services.linkedin_urls import canonical_profile_url, profile_slug
+
+
+def test_in_variants_share_one_key():
+    expected = "https://www.linkedin.com/in/ada-lovelace"
+    for url in (
+        "https://www.linkedin.com/in/ada-lovelace/",
+        "linkedin.com/in/Ada-Lovelace",
+        "https://uk.linkedin.com/in/ada-lovelace/details/experience?trk=x#top",
+        "http://m.linkedin.com/in/ada%2Dlovelace",
+    ):
+        assert canonical_profile_url(url) == expected
+
+
+def test_pub_url_keeps_id_segments():
+    url = "https://www.linkedin.com/pub/Ada-Lovelace/1A/2b/3c/"
+    assert canonical_profile_url(url) == (
+        "https://www.linkedin.com/pub/ada-lovelace/1a/2b/3c"
+    )
+    assert canonical_profile_url("uk.linkedin.com/pub/ada-lovelace/1a/2b/3c") == (
+        canonical_profile_url(url)
+    )
+    assert canonical_profile_url(url) != canonical_profile_url(
+        "linkedin.com/in/ada-lovelace"
+    )
+    assert profile_slug(url) == "ada-lovelace"
+
+
+def test_non_profile_urls_pass_through():
+    assert canonical_profile_url("https://example.com/in/ada/") == (
+        "https://example.com/in/ada"
+    )
+    assert profile_slug("https://www.linkedin.com/company/ada-labs") is None
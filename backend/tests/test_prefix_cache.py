@@ -0,0 +1,149 @@
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from API_services import email_generation
+from API_services.generation_cache import PromptPrefixCache
+
+PROFILE = {"fullName": "Ada Lovelace", "headline": "Founder", "about": ""}
+OUTPUT = json.dumps({"email_output": "Hi Ada", "analysis_rationale": ["fit"]})
+
+
+class StaleCacheError(Exception):
+    code = 404
+
+
+class FakeModels:
+    """Rejects the cached prefix the way the API does once it has expired"""
+
+    def __init__(self):
+        self.configs = []
+
+    def _chunks(self, config):
+        self.configs.append(config)
+        if config.cached_content:
+            raise StaleCacheError("CachedContent not found")
+        for part in (OUTPUT[:12], OUTPUT[12:]):
+            yield SimpleNamespace(text=part, usage_metadata=None)
+
+    def generate_content_stream(self, model, config, contents):
+        return self._chunks(config)
+
+
+class FakeAsyncModels(FakeModels):
+    async def generate_content_stream(self, model, config, contents):
+        chunks = self._chunks(config)
+
+        async def stream():
+            for chunk in chunks:
+                yield chunk
+
+        return stream()
+
+
+class FakeCaches:
+    def __init__(self):
+        self.created = 0
+
+    def create(self, model, config):
+        self.created += 1
+        return SimpleNamespace(name=f"cachedContents/{self.created}")
+
+
+def _client():
+    caches = FakeCaches()
+
+    async def acreate(model, config):
+        return caches.create(model, config)
+
+    return SimpleNamespace(
+        models=FakeModels(),
+        caches=caches,
+        aio=SimpleNamespace(
+            models=FakeAsyncModels(), caches=SimpleNamespace(create=acreate)
+        ),
+    )
+
+
+@pytest.fixture
+def prefix_cache(monkeypatch):
+    cache = PromptPrefixCache(ttl=3600)
+    cache.enabled = True
+    monkeypatch.setattr(email_generation, "get_prefix_cache", lambda: cache)
+    return cache
+
+
+def test_stream_retries_inline_when_prefix_is_stale(prefix_cache):
+    client = _client()
+    events = list(
+        email_generation.stream_cold_email(client, PROFILE, "intro", use_cache=False)
+    )
+
+    assert events[-1] == ("result", json.loads(OUTPUT))
+    assert "".join(text for kind, text in events if kind == "delta") == "Hi Ada"
+    first, retry = client.models.configs
+    assert first.cached_content and not retry.cached_content
+    assert retry.system_instruction == email_generation.COLD_EMAIL_INSTRUCTION
+    assert prefix_cache.stats()["active"] == 0
+
+
+def test_async_stream_retries_inline_when_prefix_is_stale(prefix_cache):
+    client = _client()
+
+    async def collect():
+        return [
+            event
+            async for event in email_generation.astream_cold_email(
+                client, PROFILE, "intro", use_cache=False
+            )
+        ]
+
+    events = asyncio.run(collect())
+
+    assert events[-1] == ("result", json.loads(OUTPUT))
+    first, retry = client.aio.models.configs
+    assert first.cached_content and not retry.cached_content
+
+
+class SlowCaches:
+    """Creates or refuses cached contents after a delay, counting calls"""
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def create(self, model, config):
+        with self.lock:
+            self.calls += 1
+        time.sleep(0.2)
+        if self.fail:
+            raise ValueError("Cached content is too small")
+        return SimpleNamespace(name="cachedContents/shared")
+
+
+@pytest.mark.parametrize("fail", [False, True])
+def test_concurrent_callers_create_one_prefix(fail):
+    cache = PromptPrefixCache(ttl=3600)
+    cache.enabled = True
+    client = SimpleNamespace(caches=SlowCaches(fail=fail))
+    barrier = threading.Barrier(8)
+
+    def config():
+        barrier.wait()
+        return cache.config_for(client, "model", "instruction")
+
+    with ThreadPoolExecutor(8) as pool:
+        configs = list(pool.map(lambda _: config(), range(8)))
+
+    assert client.caches.calls == 1
+    # Callers that did not create the prefix sent the instruction inline
+    assert all(c.cached_content or c.system_instruction for c in configs)
+    later = cache.config_for(client, "model", "instruction")
+    assert client.caches.calls == 1
+    assert bool(later.cached_content) is not fail
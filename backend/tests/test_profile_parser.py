@@ -0,0 +1,112 @@
+"""
+Pin parse_profile output on recorded pages
+
+A parser change that alters any of these fields fails here; if the change
+is intended, update the expected profile with it.
+"""
+
+import os
+
+from API_services.profile_parser import parse_profile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(BACKEND_DIR, "tests", "fixtures")
+
+
+def _read(path: str) -> str:
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def _recorded_profile() -> str:
+    # The page the offline benchmarks serve, filled in the same way
+    page = _read(os.path.join(BACKEND_DIR, "benchmarks", "recorded_profile.html"))
+    return page.replace("{name}", "Ada Lovelace").replace("{company}", "Ada Labs")
+
+
+def test_recorded_profile():
+    assert parse_profile(_recorded_profile()) == {
+        "name": "Ada Lovelace",
+        "about": "Building Ada Labs to help small teams ship faster. Previously led "
+        "platform engineering at a Series B startup.",
+        "experiences": [
+            {
+                "title": "Co-founder & CEO",
+                "company": "Ada Labs",
+                "date_range": "Jan 2024 - Present",
+                "description": "",
+            },
+            {
+                "title": "Engineering Manager",
+                "company": "Acme Cloud",
+                "date_range": "Mar 2019 - Dec 2023",
+                "description": "",
+            },
+        ],
+        "educations": [
+            {
+                "institution": "Stanford University",
+                "degree": "BS, Computer Science",
+                "date_range": "2012 - 2016",
+            }
+        ],
+        "skills": [],
+        "accomplishments": [],
+    }
+
+
+def test_grouped_roles_and_hidden_text():
+    profile = parse_profile(_read(os.path.join(FIXTURES, "profile_grouped.html")))
+
+    assert profile["name"] == "Grace Hopper"
+    # The screen-reader copy is not repeated
+    assert profile["about"] == (
+        "Compiler pioneer. I build tools that let people talk to machines in "
+        "plain words."
+    )
+    assert profile["experiences"] == [
+        {
+            "title": "Rear Admiral",
+            "company": "US Navy",
+            "date_range": "Nov 1985 - Aug 1986",
+            "description": "Directed the Navy's data automation programs.",
+        },
+        {
+            "title": "Commodore",
+            "company": "US Navy",
+            "date_range": "Dec 1983 - Nov 1985",
+            "description": "",
+        },
+        {
+            "title": "Senior Mathematician",
+            "company": "Eckert-Mauchly Computer Corporation",
+            "date_range": "1949 - 1952",
+            "description": "Led the team behind the A-0 compiler.",
+        },
+    ]
+    assert profile["educations"] == [
+        {
+            "institution": "Yale University",
+            "degree": "PhD, Mathematics",
+            "date_range": "1930 - 1934",
+        }
+    ]
+    assert profile["skills"] == ["Compilers", "COBOL"]
+
+
+def test_details_page_replaces_short_list():
+    main = _read(os.path.join(FIXTURES, "profile_grouped.html"))
+    details = {"skills": _read(os.path.join(FIXTURES, "details_skills.html"))}
+
+    profile = parse_profile(main, details)
+
+    assert profile["skills"] == ["Compilers", "COBOL", "Mathematics"]
+    # Sections without a details page keep the profile page's list
+    assert len(profile["experiences"]) == 3
+
+
+def test_missing_details_page_is_ignored():
+    main = _read(os.path.join(FIXTURES, "profile_grouped.html"))
+    not_found = "<html><body><h1>Page not found</h1></body></html>"
+
+    assert parse_profile(main, {"experience": not_found}) == parse_profile(main)
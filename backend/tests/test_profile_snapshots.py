@@ -0,0 +1,44 @@
+import os
+import time
+
+from API_services import profile_snapshots
+
+
+def _write(directory, captured_ns: int, size: int) -> str:
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{captured_ns}.json.gz")
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    return path
+
+
+def test_prune_removes_expired_then_oldest(tmp_path, monkeypatch):
+    monkeypatch.setattr(profile_snapshots, "SNAPSHOT_DIR", str(tmp_path))
+    now_ns = time.time_ns()
+    day_ns = 24 * 3600 * 10**9
+    expired = _write(tmp_path / "a", now_ns - 40 * day_ns, 10)
+    oldest = _write(tmp_path / "b", now_ns - 3 * day_ns, 100)
+    older = _write(tmp_path / "b", now_ns - 2 * day_ns, 100)
+    newest = _write(tmp_path / "c", now_ns - day_ns, 100)
+
+    removed = profile_snapshots.prune_snapshots(max_bytes=250, max_age=30 * 24 * 3600)
+
+    assert removed == 2
+    assert not os.path.exists(expired) and not os.path.exists(oldest)
+    assert os.path.exists(older) and os.path.exists(newest)
+    # Emptied profile directories go too
+    assert not os.path.exists(tmp_path / "a")
+
+
+def test_save_keeps_recent_snapshots_per_profile(tmp_path, monkeypatch):
+    monkeypatch.setattr(profile_snapshots, "SNAPSHOT_DIR", str(tmp_path))
+    monkeypatch.setattr(profile_snapshots, "SNAPSHOTS_ENABLED", True)
+    monkeypatch.setattr(profile_snapshots, "SNAPSHOT_KEEP", 2)
+    url = "https://www.linkedin.com/in/someone"
+
+    for _ in range(3):
+        profile_snapshots.save_snapshot(url, {"main": "<html></html>"}, {})
+
+    paths = profile_snapshots.snapshot_paths(url)
+    assert len(paths) == 2
+    assert profile_snapshots.load_snapshot(paths[0])["url"] == url
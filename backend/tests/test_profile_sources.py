@@ -0,0 +1,44 @@
+import pytest
+
+from API_services import pipelines, profile_sources
+from API_services.circuit_breaker import CLOSED, OPEN, CircuitBreaker
+
+
+@pytest.fixture
+def apify_only(monkeypatch):
+    breaker = CircuitBreaker("apify", window=10, min_calls=3, error_rate=0.5)
+    monkeypatch.setitem(profile_sources._breakers, "apify", breaker)
+    monkeypatch.setenv("SCRAPE_SOURCES", "apify")
+    monkeypatch.delenv("SCRAPE_HEDGE_AFTER", raising=False)
+    return breaker
+
+
+def _serve(monkeypatch, result):
+    monkeypatch.setitem(profile_sources._SOURCES, "apify", lambda url: dict(result))
+
+
+def test_client_errors_leave_breaker_closed(apify_only, monkeypatch):
+    _serve(monkeypatch, {"error": "Profile not returned by APIFY Actor", "status": 404})
+    for _ in range(5):
+        result = profile_sources.fetch_profile("linkedin.com/in/nobody", refresh=True)
+        assert result["error"] == "Profile not returned by APIFY Actor"
+    assert apify_only.state == CLOSED
+
+
+@pytest.mark.parametrize("status", [None, 429, 503])
+def test_upstream_errors_open_breaker(apify_only, monkeypatch, status):
+    _serve(monkeypatch, {"error": "APIFY Actor call failed", "status": status})
+    for _ in range(3):
+        profile_sources.fetch_profile("linkedin.com/in/ada", refresh=True)
+    assert apify_only.state == OPEN
+
+
+def test_pipeline_does_not_generate_from_an_error(apify_only, monkeypatch):
+    _serve(monkeypatch, {"error": "No API token found", "status": 401})
+
+    def generate(*args, **kwargs):
+        raise AssertionError("generated an email from a failed scrape")
+
+    monkeypatch.setattr(pipelines, "generate_cold_email", generate)
+    with pytest.raises(pipelines.PipelineError, match="No API token found"):
+        pipelines.cold_email_pipeline(None, "linkedin.com/in/ada", "hi", refresh=True)
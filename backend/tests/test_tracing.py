@@ -0,0 +1,37 @@
+import json
+import os
+import threading
+
+from API_services import tracing
+
+
+def test_jsonl_export_writes_off_the_caller_thread(tmp_path, monkeypatch):
+    path = tmp_path / "traces.jsonl"
+    exporter = tracing._JsonlExporter(str(path))
+    writers = []
+    handle = exporter._handler.handle
+
+    def record_writer(record):
+        writers.append(threading.current_thread().name)
+        return handle(record)
+
+    monkeypatch.setattr(exporter._handler, "handle", record_writer)
+
+    for i in range(3):
+        span = tracing.Span(f"stage-{i}", "a" * 32, None, {"n": i})
+        span.end_ns = span.start_ns
+        exporter.export(span)
+    exporter.flush()
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line["name"] for line in lines] == ["stage-0", "stage-1", "stage-2"]
+    assert set(writers) == {"jsonl-exporter"}
+
+
+def test_process_trace_file_sits_beside_the_shared_one(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_FILE", str(tmp_path / "traces.jsonl"))
+    monkeypatch.setattr(tracing, "_exporter", None)
+
+    tracing.use_process_trace_file("farm-1-0")
+
+    assert tracing.TRACE_FILE == os.path.join(tmp_path, "traces.farm-1-0.jsonl")
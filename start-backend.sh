@@ -17,5 +17,11 @@ echo "Installing dependencies..."
 pip install -r requirements.txt
 
 # Start the backend service
-echo "Starting backend service on port 8000..."
-python app.py --port=8000 
\ No newline at end of file
+# Set WORKLY_ASGI=1 to serve the asyncio app (asgi.py) instead of Flask
+if [ "$WORKLY_ASGI" = "1" ]; then
+    echo "Starting ASGI backend service on port 8000..."
+    hypercorn asgi:app --bind 0.0.0.0:8000
+else
+    echo "Starting backend service on port 8000..."
+    python app.py --port=8000
+fi 
\ No newline at end of file